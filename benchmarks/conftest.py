@@ -0,0 +1,109 @@
+"""
+Conftest
+Synthetic data sets of several sizes for the benchmarks
+"""
+import pytest
+from dicomgenerator.factory import CTDatasetFactory
+from pydicom import Dataset
+from pydicom.dataset import FileMetaDataset
+from pydicom.sequence import Sequence
+from pydicom.uid import ExplicitVRLittleEndian, generate_uid
+
+pytest.importorskip('pytest_benchmark')
+
+SEQUENCE_DEPTH = 5
+SEQUENCE_WIDTH = 3
+PRIVATE_BLOCKS = 50
+PRIVATE_ELEMENTS = 20
+FRAMES = 64
+CINE_FRAMES = 100
+
+
+def a_ct_dataset(**kwargs) -> Dataset:
+    """CT data set with file meta, as read from a file."""
+    dataset = CTDatasetFactory(**kwargs)
+    dataset.file_meta = FileMetaDataset()
+    dataset.file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
+    dataset.preamble = b'\0' * 128
+    dataset.is_little_endian, dataset.is_implicit_VR = True, False
+    return dataset
+
+
+def few_tags() -> Dataset:
+    """A handful of tags, no pixel data."""
+    dataset = a_ct_dataset()
+    keep = {'PatientID', 'PatientName', 'StudyInstanceUID', 'SeriesInstanceUID', 'SOPInstanceUID',
+            'SOPClassUID', 'StudyDate', 'Modality'}
+    for element in list(dataset):
+        if element.keyword not in keep:
+            del dataset[element.tag]
+    return dataset
+
+
+def nested_item(depth: int) -> Dataset:
+    item = Dataset()
+    item.ReferencedSOPInstanceUID = generate_uid()
+    item.StudyDate = '20200101'
+    item.AcquisitionDateTime = '20200101120000'
+    item.PersonName = 'Doe^John'
+    if depth > 1:
+        item.ContentSequence = Sequence([nested_item(depth - 1) for _ in range(SEQUENCE_WIDTH)])
+    return item
+
+
+def deep_sequences() -> Dataset:
+    """CT with a content tree of SEQUENCE_WIDTH ** SEQUENCE_DEPTH items with dates and UIDs."""
+    dataset = a_ct_dataset()
+    dataset.ContentSequence = Sequence([nested_item(SEQUENCE_DEPTH)])
+    return dataset
+
+
+def many_private_blocks() -> Dataset:
+    """CT with PRIVATE_BLOCKS private creators of PRIVATE_ELEMENTS elements each."""
+    dataset = a_ct_dataset()
+    for number in range(PRIVATE_BLOCKS):
+        block = dataset.private_block(0x0009 + 2 * (number // 200), f"CREATOR {number}", create=True)
+        for element in range(PRIVATE_ELEMENTS):
+            block.add_new(element, 'LO', f"value {number} {element}")
+    return dataset
+
+
+def multi_frame() -> Dataset:
+    """CT with FRAMES frames of 512 x 512 16 bit pixels (32 MB)."""
+    dataset = a_ct_dataset(Rows=512, Columns=512)
+    dataset.NumberOfFrames = FRAMES
+    dataset.PixelData = b'\0' * (512 * 512 * 2 * FRAMES)
+    return dataset
+
+
+def cine_loop() -> Dataset:
+    """Ultrasound cine loop of CINE_FRAMES frames of 480 x 640 RGB pixels (92 MB)."""
+    dataset = a_ct_dataset(Rows=480, Columns=640)
+    dataset.Modality = 'US'
+    dataset.SamplesPerPixel = 3
+    dataset.PhotometricInterpretation = 'RGB'
+    dataset.PlanarConfiguration = 0
+    dataset.BitsAllocated, dataset.BitsStored, dataset.HighBit = 8, 8, 7
+    dataset.NumberOfFrames = CINE_FRAMES
+    dataset.PixelData = b'\x80' * (480 * 640 * 3 * CINE_FRAMES)
+    return dataset
+
+
+DATASETS = {
+    'few_tags': few_tags,
+    'ct': a_ct_dataset,
+    'deep_sequences': deep_sequences,
+    'many_private_blocks': many_private_blocks,
+    'multi_frame': multi_frame,
+}
+
+
+@pytest.fixture(scope='session')
+def a_cine_loop() -> Dataset:
+    return cine_loop()
+
+
+@pytest.fixture(scope='session', params=list(DATASETS))
+def a_synthetic_dataset(request) -> Dataset:
+    """Each of the synthetic data sets, built once per session (copy before changing it)."""
+    return DATASETS[request.param]()
@@ -0,0 +1,112 @@
+"""
+Benchmarks of the de-identification hot paths
+
+Run with: python -m pytest benchmarks
+Reports the latency per instance (Mean), the throughput (OPS, instances per second)
+and the peak memory of one call (extra info peak_memory_kb, see --benchmark-json).
+"""
+import tracemalloc
+from copy import deepcopy
+
+import pytest
+
+from src.dicomdeidentifier.batch import deidentify_batch
+from src.dicomdeidentifier.deidentify_dicom import DeidentifyDataset, LookupID, remove_pixel_data
+from src.dicomdeidentifier.pixels import PixelLocation, PixelProcessor, Region
+from src.dicomdeidentifier.series import deidentify_series
+from src.dicomdeidentifier.streaming import deidentify_file_streaming
+from .conftest import DATASETS
+
+ROUNDS = 20
+
+
+def a_deidentifier() -> DeidentifyDataset:
+    return DeidentifyDataset(LookupID(time_shift=10, filename='benchmark.dcm'))
+
+
+def peak_memory_kb(function, dataset) -> float:
+    """Peak memory allocated during one call, in KB."""
+    tracemalloc.start()
+    try:
+        function(dataset)
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def run(benchmark, function, dataset, copy=True):
+    """Benchmark function on (a fresh copy of) the data set and record its peak memory."""
+    if copy:
+        benchmark.extra_info['peak_memory_kb'] = peak_memory_kb(function, deepcopy(dataset))
+        return benchmark.pedantic(function, setup=lambda: ((deepcopy(dataset),), {}), rounds=ROUNDS)
+    benchmark.extra_info['peak_memory_kb'] = peak_memory_kb(function, dataset)
+    return benchmark(function, dataset)
+
+
+def test_get_deid_dataset(benchmark, a_synthetic_dataset):
+    deid_ds, _ = run(benchmark, lambda ds: a_deidentifier().get_deid_dataset(ds), a_synthetic_dataset)
+    assert deid_ds.PatientIdentityRemoved == 'YES'
+
+
+def test_deidentify_dates(benchmark, a_synthetic_dataset):
+    run(benchmark, a_deidentifier().deidentify_dates, a_synthetic_dataset)
+
+
+def test_add_deid_uids(benchmark, a_synthetic_dataset):
+    run(benchmark, a_deidentifier().add_deid_uids, a_synthetic_dataset)
+
+
+def test_get_date_elements(benchmark, a_synthetic_dataset):
+    elements = run(benchmark, DeidentifyDataset.get_date_elements, a_synthetic_dataset, copy=False)
+    assert elements
+
+
+def test_remove_pixel_data(benchmark, a_synthetic_dataset):
+    run(benchmark, remove_pixel_data, a_synthetic_dataset)
+
+
+def a_ct_series(instances: int = 50) -> list:
+    template = DATASETS['ct']()
+    series = []
+    for number in range(instances):
+        ds = deepcopy(template)
+        ds.SOPInstanceUID = f'{template.SeriesInstanceUID}.{number}'
+        ds.InstanceNumber = number
+        ds.ImagePositionPatient = [0, 0, number]
+        series.append(ds)
+    return series
+
+
+@pytest.mark.parametrize('mode', ['full', 'series'])
+def test_deidentify_ct_series(benchmark, mode):
+    """Fifty instances of a CT series, one by one (full) or with the series template (series)."""
+    def deidentify(datasets):
+        if mode == 'series':
+            return list(deidentify_series(datasets, uid_key=b'benchmark'))
+        return list(deidentify_batch(datasets))
+
+    series = a_ct_series()
+    results = benchmark.pedantic(deidentify, args=(series,), rounds=5)
+    assert len(results) == len(series)
+
+
+CINE_REGIONS = [PixelLocation(regions=(Region(0, 0, 640, 40), Region(500, 40, 140, 60)), modality='US')]
+
+
+def test_blank_cine_loop(benchmark, a_cine_loop):
+    """Blank the burned-in annotations of a cine loop in memory, frame by frame."""
+    processor = PixelProcessor(CINE_REGIONS)
+    assert run(benchmark, processor.process, a_cine_loop)
+
+
+def test_blank_cine_loop_streaming(benchmark, a_cine_loop, tmp_path):
+    """Blank a cine loop file while copying it (peak memory about one frame)."""
+    source, destination = str(tmp_path / 'cine.dcm'), str(tmp_path / 'deid.dcm')
+    a_cine_loop.save_as(source, write_like_original=False)
+    processor = PixelProcessor(CINE_REGIONS)
+
+    def deidentify(path):
+        return deidentify_file_streaming(path, destination, pixel_processor=processor)
+
+    benchmark.extra_info['peak_memory_kb'] = peak_memory_kb(deidentify, source)
+    benchmark.pedantic(deidentify, args=(source,), rounds=5)
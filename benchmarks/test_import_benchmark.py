@@ -0,0 +1,17 @@
+"""
+Benchmark of the import time of the de-identifier
+
+Run with: python -m pytest benchmarks
+Reports the time to import the package in a new interpreter (Mean) and the
+self import time of the package modules (extra info package_import_ms,
+pydicom itself is not counted). The budget is checked in tests/test_import_time.py.
+"""
+from tests.test_import_time import package_import_seconds
+
+ROUNDS = 5
+
+
+def test_import_package(benchmark):
+    module = 'src.dicomdeidentifier.deidentify_dicom'
+    seconds = benchmark.pedantic(package_import_seconds, args=(module,), rounds=ROUNDS)
+    benchmark.extra_info['package_import_ms'] = seconds * 1000
@@ -0,0 +1,190 @@
+"""
+Asyncio pipeline for de-identifying received instances (e.g. from a C-STORE handler).
+
+Received data sets are put in a bounded queue; workers de-identify them in an
+executor (CPU offload) and write them to a sink. When the queue is full, putting
+waits, which gives backpressure toward the receiver, while the receiving side
+never waits for the de-identification itself.
+
+Sinks: DirectorySink writes files, StoreSCUSink sends the de-identified data sets
+to a C-STORE SCP, e.g. a local stand-in SCP (needs the optional pynetdicom package).
+"""
+import asyncio
+import os
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Callable, List, Optional, Protocol, Tuple
+
+from pydicom import FileDataset
+from pydicom.dataset import Dataset
+
+from .deidentify_dicom import DeidentifyDataset, LookupID
+from .pipeline import DerivedLookupFactory
+from .uids import factory_key
+
+
+class Sink(Protocol):
+    """Destination of de-identified data sets."""
+
+    async def write(self, ds: FileDataset, lookup: LookupID) -> None:
+        ...
+
+
+class DirectorySink:
+    """Writes the de-identified data sets to <directory>/<SOP instance UID>.dcm."""
+
+    def __init__(self, directory: str, executor: Optional[Executor] = None):
+        self.directory = directory
+        self.executor = executor
+        os.makedirs(directory, exist_ok=True)
+
+    async def write(self, ds: FileDataset, lookup: LookupID) -> None:
+        path = os.path.join(self.directory, f"{lookup.deid_sop_uid}.dcm")
+        await asyncio.get_running_loop().run_in_executor(self.executor, ds.save_as, path)
+
+
+class StoreSCUSinkError(Exception):
+    pass
+
+
+class StoreSCUSink:
+    """
+    Sends the de-identified data sets to a C-STORE SCP (needs pynetdicom).
+
+    One association is kept open and re-established when it is lost;
+    sending is done in one background thread.
+    """
+
+    def __init__(self, address: str, port: int, ae_title: str = 'DEIDENTIFIER', called_ae_title: str = 'ANY-SCP'):
+        try:
+            from pynetdicom import AE, StoragePresentationContexts
+        except ImportError as e:
+            raise ImportError("StoreSCUSink needs pynetdicom: pip install pynetdicom") from e
+
+        self.ae = AE(ae_title=ae_title)
+        self.ae.requested_contexts = StoragePresentationContexts
+        self.address = address
+        self.port = port
+        self.called_ae_title = called_ae_title
+        self.association = None
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+    def _send(self, ds: FileDataset) -> None:
+        if self.association is None or not self.association.is_established:
+            self.association = self.ae.associate(self.address, self.port, ae_title=self.called_ae_title)
+            if not self.association.is_established:
+                raise StoreSCUSinkError(f"No association with {self.called_ae_title}@{self.address}:{self.port}")
+        status = self.association.send_c_store(ds)
+        if not status or status.Status != 0x0000:
+            raise StoreSCUSinkError(f"C-STORE failed for {ds.SOPInstanceUID}: {status}")
+
+    async def write(self, ds: FileDataset, lookup: LookupID) -> None:
+        await asyncio.get_running_loop().run_in_executor(self.executor, self._send, ds)
+
+    def close(self) -> None:
+        if self.association is not None and self.association.is_established:
+            self.association.release()
+        self.executor.shutdown()
+
+
+def deidentify(ds: Dataset, lookup_factory: Callable[[Dataset], LookupID]) -> Tuple[FileDataset, LookupID]:
+    """De-identify one data set (runs in the executor, must be picklable for process pools)."""
+    return DeidentifyDataset(lookup_factory(ds), uid_key=factory_key(lookup_factory)).get_deid_dataset(ds, copy=False)
+
+
+class DeidentifyPipeline:
+    """
+    Bounded queue of received data sets, de-identified by workers and written to a sink.
+
+    Use as async context manager (or call start and stop):
+
+        async with DeidentifyPipeline(DirectorySink('out')) as pipeline:
+            await pipeline.put(ds)
+    """
+
+    def __init__(self, sink: Sink,
+                 lookup_factory: Optional[Callable[[Dataset], LookupID]] = None,
+                 maxsize: int = 64,
+                 workers: int = 4,
+                 executor: Optional[Executor] = None,
+                 on_error: Optional[Callable[[Dataset, Exception], None]] = None):
+        """
+        :param sink:            destination of the de-identified data sets
+        :param lookup_factory:  creates the look-up for a received data set (default: a DerivedLookupFactory
+                                with a random key, so the instances of a study keep the same ids)
+        :param maxsize:         size of the queue (putting waits when it is full)
+        :param workers:         number of concurrent de-identifications
+        :param executor:        executor for the de-identification (default: the loop's thread pool),
+                                with a process pool the look-up factory must be picklable
+        :param on_error:        called with data set and exception if an instance fails
+                                (exceptions of on_error go to the loop's exception handler)
+        """
+        self.sink = sink
+        self.lookup_factory = lookup_factory if lookup_factory is not None else DerivedLookupFactory()
+        self.maxsize = maxsize
+        self.workers = workers
+        self.executor = executor
+        self.on_error = on_error
+        self.processed = 0
+        self.failed = 0
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=self.maxsize)
+        self._tasks = [asyncio.ensure_future(self._work()) for _ in range(self.workers)]
+
+    async def put(self, ds: Dataset) -> None:
+        """Queue a data set, waits while the queue is full."""
+        await self.queue.put(ds)
+
+    def put_threadsafe(self, ds: Dataset, timeout: Optional[float] = None) -> None:
+        """
+        Queue a data set from another thread (e.g. a pynetdicom event handler),
+        blocks the thread while the queue is full.
+        """
+        asyncio.run_coroutine_threadsafe(self.put(ds), self.loop).result(timeout)
+
+    async def _work(self) -> None:
+        while True:
+            ds = await self.queue.get()
+            try:
+                deid_ds, lookup = await self.loop.run_in_executor(self.executor, deidentify, ds,
+                                                                  self.lookup_factory)
+                await self.sink.write(deid_ds, lookup)
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                self._report(ds, e)
+            finally:
+                self.queue.task_done()
+
+    def _report(self, ds: Dataset, error: Exception) -> None:
+        """Call on_error; its own errors go to the loop's exception handler, the worker keeps running."""
+        if self.on_error is None:
+            return
+        try:
+            self.on_error(ds, error)
+        except Exception as e:
+            self.loop.call_exception_handler({'message': 'on_error callback of the de-identify pipeline failed',
+                                              'exception': e})
+
+    async def join(self) -> None:
+        """Wait until all queued data sets are done."""
+        await self.queue.join()
+
+    async def stop(self) -> None:
+        """Finish the queued data sets and stop the workers."""
+        await self.join()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.stop()
@@ -0,0 +1,95 @@
+"""
+Batch de-identification.
+
+De-identifies a stream of data sets with shared state: all instances of the same
+original patient, study and series get the same de-identified ids, without the
+caller computing them beforehand. Results are yielded lazily, so memory stays
+flat for large studies.
+"""
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
+import uuid
+
+from pydicom import FileDataset
+from pydicom.dataset import Dataset
+from pydicom.uid import generate_uid
+
+from .deidentify_dicom import DeidentifyDataset, LookupID
+from .timeshift import TimeShiftProvider
+from .uids import factory_key
+
+
+def default_lookup_factory(ds: Dataset) -> LookupID:
+    """Empty look-up with the filename of the data set (if any)."""
+    return LookupID(filename=getattr(ds, 'filename', None))
+
+
+class UIDMappingConflictError(Exception):
+    pass
+
+
+@dataclass
+class UIDMapping:
+    """Original to de-identified patient ids, study and series UIDs."""
+    patients: Dict[str, str] = field(default_factory=dict)
+    studies: Dict[str, str] = field(default_factory=dict)
+    series: Dict[str, str] = field(default_factory=dict)
+
+    def fill(self, lookup: LookupID, ds: Dataset) -> LookupID:
+        """
+        Fill the missing de-identified ids of the look-up from the mapping.
+
+        Ids given in the look-up are kept and added to the mapping,
+        ids not yet in the mapping are created. A given id which differs from
+        the id already mapped for the original raises a UIDMappingConflictError.
+        Must be called before the data set is de-identified (needs the original ids).
+        """
+        lookup.deid_patient_id = self._get(self.patients, ds.get('PatientID'),
+                                           lookup.deid_patient_id, lambda: str(uuid.uuid4()))
+        lookup.deid_study_uid = self._get(self.studies, ds.get('StudyInstanceUID'),
+                                          lookup.deid_study_uid, lambda: str(generate_uid(prefix=None)))
+        lookup.deid_series_uid = self._get(self.series, ds.get('SeriesInstanceUID'),
+                                           lookup.deid_series_uid, lambda: str(generate_uid(prefix=None)))
+        return lookup
+
+    @staticmethod
+    def _get(mapping: Dict[str, str], original, deid_value: Optional[str], create: Callable[[], str]):
+        if not original:
+            return deid_value  # nothing to map, de-identifier creates a new one
+        original = str(original)
+        if deid_value is not None:
+            mapped = mapping.setdefault(original, deid_value)
+            if mapped != deid_value:
+                raise UIDMappingConflictError(f"{original} is already mapped to {mapped}, not to {deid_value}")
+            return mapped
+        if original not in mapping:
+            mapping[original] = create()
+        return mapping[original]
+
+
+def deidentify_batch(datasets: Iterable[Dataset],
+                     lookup_factory: Callable[[Dataset], LookupID] = default_lookup_factory,
+                     mapping: Optional[UIDMapping] = None,
+                     copy: bool = True,
+                     time_shift_provider: Optional[TimeShiftProvider] = None,
+                     ) -> Iterator[Tuple[FileDataset, LookupID]]:
+    """
+    De-identify data sets one by one (lazily).
+
+    :param datasets:        data sets to de-identify (e.g. a generator reading files)
+    :param lookup_factory:  creates the look-up for a data set (filename, time shift, predefined ids)
+    :param mapping:         shared id mapping (e.g. to continue a previous batch),
+                            a new one if not given
+    :param copy:            False to de-identify the data sets themselves (in place), when
+                            they are not needed anymore (see DeidentifyDataset.get_deid_dataset)
+    :param time_shift_provider: time shift per patient for look-ups without one (see timeshift)
+    :return:                de-identified file data set and look-up per data set
+    """
+    if mapping is None:
+        mapping = UIDMapping()
+
+    for ds in datasets:
+        lookup = mapping.fill(lookup_factory(ds), ds)
+        deidentifier = DeidentifyDataset(lookup, time_shift_provider=time_shift_provider,
+                                         uid_key=factory_key(lookup_factory))
+        yield deidentifier.get_deid_dataset(ds, copy=copy)
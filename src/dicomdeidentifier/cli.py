@@ -0,0 +1,243 @@
+"""
+Command line interface: dicom-deidentify SRC DST.
+
+De-identifies all files of the source tree to the same relative paths in the
+destination tree with a process pool (see pipeline), and prints the throughput
+and the estimated time left. The directory and file names are copied as they
+are: if they contain patient information (e.g. a folder per patient name), use
+a source tree with neutral names.
+
+Every finished file is appended to a checkpoint manifest (one JSON line per
+file). Running the same command again skips the files which were done, so an
+interrupted run resumes where it stopped; failed files are retried. The ids are
+derived from the original ids with a key (see uids), which is kept next to the
+manifest (<manifest>.key, readable only by the owner) unless given, so that the
+resumed run gives the same ids. A given key which differs from the stored key of
+the run to resume is refused.
+
+The manifest lists the original paths and the key derives the ids from the
+original ids, so both are kept outside the destination tree: by default in the
+parent directory of the source tree (or in --state-dir). A manifest or key inside
+the destination tree is refused.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Iterable, List, Optional, Set, TextIO
+
+from .pipeline import DerivedLookupFactory, FileResult, deidentify_directory, iter_files
+from .pixels import PixelProcessor, load_pixel_locations
+from .precheck import POLICIES, REPROCESS
+from .timeshift import KeyedTimeShift
+
+MANIFEST_NAME = '.dicom-deidentify-{src}-{dst}.jsonl'
+PROGRESS_INTERVAL = 2.0
+
+
+class Manifest:
+    """Append-only checkpoint of the finished files (relative source paths)."""
+
+    def __init__(self, path: str, src: str):
+        self.path = path
+        self.src = src
+        self.done: Set[str] = set()
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as fp:
+                for line in fp:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # last line of an interrupted run
+                    if entry.get('error') is None:
+                        self.done.add(entry['source'])
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.fp: TextIO = open(path, 'a', encoding='utf-8')
+
+    def relative(self, source: str) -> str:
+        return os.path.relpath(source, self.src)
+
+    def todo(self, files: Iterable[str]) -> List[str]:
+        """The files which are not done yet."""
+        return [source for source in files if self.relative(source) not in self.done]
+
+    def add(self, result: FileResult) -> None:
+        entry = {'source': self.relative(result.source),
+                 'sop_instance_uid': result.lookup.deid_sop_uid if result.lookup else None,
+                 'error': result.error,
+                 'skipped': result.skipped}
+        self.fp.write(json.dumps(entry) + '\n')
+        self.fp.flush()
+        if result.error is None:
+            self.done.add(entry['source'])
+
+    def close(self) -> None:
+        self.fp.close()
+
+
+def load_key(path: str) -> bytes:
+    """The key of a previous run, or a new random key (stored, readable only by the owner)."""
+    if os.path.exists(path):
+        with open(path, 'rb') as fp:
+            return bytes.fromhex(fp.read().decode().strip())
+    key = os.urandom(32)
+    handle = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(handle, 'w') as fp:
+        fp.write(key.hex())
+    return key
+
+
+def hex_key(value: str) -> bytes:
+    """Key from a hex string (argument type of --uid-key)."""
+    try:
+        return bytes.fromhex(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not a hex key: {value!r}") from None
+
+
+def default_manifest(src: str, dst: str, state_dir: Optional[str] = None) -> str:
+    """Manifest of a run from src to dst in the state directory (default: the parent directory of src)."""
+    src, dst = os.path.abspath(src), os.path.abspath(dst)
+    name = MANIFEST_NAME.format(src=os.path.basename(src), dst=os.path.basename(dst))
+    return os.path.join(state_dir or os.path.dirname(src), name)
+
+
+def is_inside(path: str, directory: str) -> bool:
+    """True if the path is the directory or inside it."""
+    path, directory = os.path.realpath(path), os.path.realpath(directory)
+    return os.path.commonpath([path, directory]) == directory
+
+
+def format_duration(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}"
+
+
+class Progress:
+    """Throughput and estimated time left."""
+
+    def __init__(self, total: int, total_bytes: int, stream: Optional[TextIO] = sys.stderr,
+                 interval: float = PROGRESS_INTERVAL):
+        self.total = total
+        self.total_bytes = total_bytes
+        self.stream = stream
+        self.interval = interval
+        self.done = 0
+        self.failed = 0
+        self.skipped = 0
+        self.bytes = 0
+        self.start = time.monotonic()
+        self.last = 0.0
+
+    def update(self, result: FileResult, size: int) -> None:
+        self.done += 1
+        self.failed += result.error is not None
+        self.skipped += result.skipped
+        self.bytes += size
+        now = time.monotonic()
+        if self.stream is not None and (now - self.last >= self.interval or self.done == self.total):
+            self.last = now
+            self.stream.write('\r' + self.format(now - self.start))
+            self.stream.flush()
+
+    def format(self, elapsed: float) -> str:
+        files_per_second = self.done / elapsed if elapsed > 0 else 0.0
+        bytes_per_second = self.bytes / elapsed if elapsed > 0 else 0.0
+        if bytes_per_second > 0:
+            eta = format_duration((self.total_bytes - self.bytes) / bytes_per_second)
+        else:
+            eta = '?'
+        return (f"{self.done}/{self.total} files ({self.failed} failed, {self.skipped} skipped), "
+                f"{files_per_second:.1f} files/s, {bytes_per_second / 1e6:.1f} MB/s, ETA {eta}")
+
+
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='dicom-deidentify',
+                                     description="De-identify all DICOM files of a directory tree.")
+    parser.add_argument('src', help="source directory")
+    parser.add_argument('dst', help="destination directory (same relative paths, the names are not de-identified)")
+    parser.add_argument('-w', '--workers', type=int, default=None,
+                        help="number of worker processes (default: cpu count, 0: no worker processes)")
+    parser.add_argument('--time-shift', type=int, default=None,
+                        help="days to shift the dates (default: dates and times are removed)")
+    parser.add_argument('--time-shift-range', type=int, nargs=2, metavar=('MIN', 'MAX'),
+                        help="shift the dates per patient by days in [MIN, MAX] without 0, "
+                             "derived from the PatientID with the uid key")
+    parser.add_argument('--deid-patient-id', help="de-identified patient id for all files")
+    parser.add_argument('--deid-study-uid', help="de-identified study instance UID for all files")
+    parser.add_argument('--deid-series-uid', help="de-identified series instance UID for all files")
+    parser.add_argument('--uid-key', type=hex_key, help="key (hex) to derive the de-identified ids "
+                                                        "(default: key of the previous run or a new one, "
+                                                        "see --manifest)")
+    parser.add_argument('--state-dir', help="directory of the manifest and the key, outside DST "
+                                            "(default: the parent directory of SRC)")
+    parser.add_argument('--manifest', help=f"checkpoint manifest, outside DST "
+                                           f"(default: STATE_DIR/{MANIFEST_NAME.format(src='SRC', dst='DST')})")
+    parser.add_argument('--no-resume', action='store_true', help="process all files, ignore the manifest")
+    parser.add_argument('--streaming', action='store_true',
+                        help="read only the headers and copy the pixel data (less memory for large files)")
+    parser.add_argument('--pixel-locations', metavar='JSON',
+                        help="blank the burned-in annotations at these pixel locations (see pixels)")
+    parser.add_argument('--already-deidentified', choices=POLICIES, default=REPROCESS,
+                        help="files which are already de-identified: copy them (skip), copy them if their "
+                             "header passes the rules (verify) or de-identify them again (reprocess, default)")
+    parser.add_argument('--chunksize', type=int, default=16, help="files per worker task")
+    parser.add_argument('-q', '--quiet', action='store_true', help="no progress output")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the command, returns the exit code (1 if any file failed)."""
+    parser = get_parser()
+    args = parser.parse_args(argv)
+    manifest_path = args.manifest or default_manifest(args.src, args.dst, args.state_dir)
+    if is_inside(manifest_path, args.dst):
+        parser.error(f"the manifest {manifest_path} (and its key) must not be inside DST, "
+                     f"use --state-dir or --manifest")
+    key_path = manifest_path + '.key'
+    if args.no_resume and os.path.exists(manifest_path):
+        os.remove(manifest_path)
+    elif args.uid_key and os.path.exists(manifest_path) and os.path.exists(key_path) \
+            and load_key(key_path) != args.uid_key:
+        parser.error(f"--uid-key differs from the key {key_path} of the run to resume, "
+                     f"the resumed files would get other ids (use --no-resume to start over)")
+    manifest = Manifest(manifest_path, args.src)
+
+    key = args.uid_key or load_key(key_path)
+    time_shift_provider = KeyedTimeShift(key, *args.time_shift_range) if args.time_shift_range else None
+    lookup_factory = DerivedLookupFactory(time_shift=args.time_shift, key=key,
+                                          deid_patient_id=args.deid_patient_id,
+                                          deid_study_uid=args.deid_study_uid,
+                                          deid_series_uid=args.deid_series_uid,
+                                          time_shift_provider=time_shift_provider)
+
+    pixel_processor = PixelProcessor(load_pixel_locations(args.pixel_locations)) if args.pixel_locations else None
+    own_files = {os.path.abspath(manifest_path), os.path.abspath(key_path)}
+    files = [source for source in manifest.todo(iter_files(args.src)) if os.path.abspath(source) not in own_files]
+    progress = Progress(len(files), sum(os.path.getsize(source) for source in files),
+                        stream=None if args.quiet else sys.stderr)
+    if not args.quiet and manifest.done:
+        sys.stderr.write(f"resuming: {len(manifest.done)} files done before\n")
+
+    try:
+        for result in deidentify_directory(args.src, args.dst, workers=args.workers, lookup_factory=lookup_factory,
+                                           ordered=False, chunksize=args.chunksize, files=files,
+                                           streaming=args.streaming, pixel_processor=pixel_processor,
+                                           precheck_policy=args.already_deidentified):
+            manifest.add(result)
+            progress.update(result, os.path.getsize(result.source))
+    except KeyboardInterrupt:
+        sys.stderr.write("\ninterrupted, run the same command again to resume\n")
+        return 130
+    finally:
+        manifest.close()
+
+    if not args.quiet:
+        sys.stderr.write('\n')
+    return 1 if progress.failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
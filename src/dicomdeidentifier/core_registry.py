@@ -0,0 +1,54 @@
+"""
+Registry of compiled rule sets.
+
+Compiling the rule sets for every data set is expensive: idiscore merges all
+rule sets of a profile on every call of core.deidentify. The compiled rule sets
+(see dispatch) are built once per rule set combination and shared by all
+DeidentifyDataset instances. The registry is thread-safe.
+
+If a custom rule set is changed or swapped at runtime, call invalidate_cores.
+"""
+import threading
+from typing import TYPE_CHECKING, Dict, Tuple
+
+from .dispatch import CompiledRuleSet, compile_rule_sets
+
+if TYPE_CHECKING:
+    from idiscore.rules import RuleSet
+
+_lock = threading.Lock()
+_compiled: Dict[Tuple[int, ...], Tuple[Tuple['RuleSet', ...], CompiledRuleSet]] = {}
+
+
+def get_compiled_rules(*rule_sets: 'RuleSet') -> CompiledRuleSet:
+    """
+    Get the shared compiled rule set for the given rule sets (later rule sets overrule previous).
+
+    The rule set objects are the key: the same combination in the same order
+    returns the same compiled rule set.
+    """
+    key = tuple(id(rule_set) for rule_set in rule_sets)
+    entry = _compiled.get(key)
+    if entry is None:
+        with _lock:
+            entry = _compiled.get(key)
+            if entry is None:
+                entry = (rule_sets, compile_rule_sets(*rule_sets))
+                _compiled[key] = entry
+    return entry[1]
+
+
+def invalidate_cores(*rule_sets: 'RuleSet') -> int:
+    """
+    Drop cached compiled rule sets, so that they are rebuilt on next use.
+
+    :param rule_sets:   drop only the compiled rule sets using one of these rule sets
+                        (all if none given)
+    :return:            number of dropped compiled rule sets
+    """
+    ids = {id(rule_set) for rule_set in rule_sets}
+    with _lock:
+        keys = [key for key in _compiled if not ids or ids.intersection(key)]
+        for key in keys:
+            del _compiled[key]
+    return len(keys)
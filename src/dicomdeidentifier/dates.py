@@ -0,0 +1,118 @@
+"""
+Date shifting for DA and DT values.
+
+Dates are converted to day numbers and back with integer arithmetic
+(no strptime/strftime, independent of the locale). The time, fraction and
+timezone offset of DT values are kept, DA values are truncated to the date
+(YYYYMMDD), also if they hold a time, which pydicom rejects. Date ranges (A-B, -B, A-) and multiple
+values are shifted value by value.
+
+Shifted values are cached per (value, shift, VR), since the same StudyDate or
+SeriesDate is repeated in thousands of instances of a study.
+"""
+import re
+from functools import lru_cache
+from typing import List, Optional, Tuple, Union
+
+from pydicom.multival import MultiValue
+
+DATE_VRS = ('DA', 'DT')
+PATIENT_BIRTH_DATE = 0x00100030
+
+# time part of a DT value after YYYYMMDD: HH[MM[SS[.F{1,6}]]][&ZZXX]
+_DT_TIME = re.compile(r'(?:\d{2}(?:\d{2}(?:\d{2}(?:\.\d{1,6})?)?)?)?(?:[+-]\d{4})?')
+
+_DAYS_IN_MONTH = (31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+
+def days_from_civil(year: int, month: int, day: int) -> int:
+    """Number of days since 1970-01-01 (proleptic Gregorian calendar)."""
+    year -= month <= 2
+    era = year // 400
+    year_of_era = year - era * 400
+    day_of_year = (153 * (month + (-3 if month > 2 else 9)) + 2) // 5 + day - 1
+    day_of_era = year_of_era * 365 + year_of_era // 4 - year_of_era // 100 + day_of_year
+    return era * 146097 + day_of_era - 719468
+
+
+def civil_from_days(days: int) -> Tuple[int, int, int]:
+    """Year, month and day of a number of days since 1970-01-01."""
+    days += 719468
+    era = days // 146097
+    day_of_era = days - era * 146097
+    year_of_era = (day_of_era - day_of_era // 1460 + day_of_era // 36524 - day_of_era // 146096) // 365
+    day_of_year = day_of_era - (365 * year_of_era + year_of_era // 4 - year_of_era // 100)
+    month_index = (5 * day_of_year + 2) // 153
+    day = day_of_year - (153 * month_index + 2) // 5 + 1
+    month = month_index + (3 if month_index < 10 else -9)
+    return year_of_era + era * 400 + (month <= 2), month, day
+
+
+def _is_valid_date(year: int, month: int, day: int) -> bool:
+    if not 1 <= month <= 12 or day < 1:
+        return False
+    leap = month == 2 and year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)
+    return day <= _DAYS_IN_MONTH[month - 1] + leap
+
+
+def _shift_date(value: str, shift: int) -> Optional[str]:
+    """Shift a YYYYMMDD date, None if not a valid date."""
+    if len(value) != 8 or not value.isascii() or not value.isdigit():
+        return None
+    year, month, day = int(value[:4]), int(value[4:6]), int(value[6:])
+    if not _is_valid_date(year, month, day):
+        return None
+    year, month, day = civil_from_days(days_from_civil(year, month, day) + shift)
+    if not 1 <= year <= 9999:
+        return None
+    return f"{year:04d}{month:02d}{day:02d}"
+
+
+def _shift_single(value: str, shift: int, vr: str) -> Optional[str]:
+    """Shift a DA or DT value (DT with at least a full date), keep the time part of DT."""
+    date = _shift_date(value[:8], shift)
+    if date is None or not _DT_TIME.fullmatch(value, 8):
+        return None
+    return date if vr == 'DA' else date + value[8:]
+
+
+@lru_cache(maxsize=4096)
+def shift_date(value: str, shift: int, vr: str = 'DT') -> Optional[str]:
+    """
+    Shift a single DA or DT value or a range of them by a number of days.
+
+    :param value:   DICOM date, datetime or range like 20200101-20200131
+    :param shift:   days to shift
+    :param vr:      DA to keep only the date of the shifted values, DT to keep their time
+    :return:        shifted value, None if the value cannot be shifted
+                    (invalid value or partial dates like YYYY or YYYYMM)
+    """
+    value = value.rstrip()
+    shifted = _shift_single(value, shift, vr)
+    if shifted is not None or '-' not in value:
+        return shifted
+
+    # a range, the separator might be any '-' (DT timezone offsets use it, too)
+    for index, character in enumerate(value):
+        if character != '-':
+            continue
+        start, end = value[:index], value[index + 1:]
+        if not start and not end:
+            return None
+        start_shifted = _shift_single(start, shift, vr) if start else ''
+        end_shifted = _shift_single(end, shift, vr) if end else ''
+        if start_shifted is not None and end_shifted is not None:
+            return f"{start_shifted}-{end_shifted}"
+    return None
+
+
+def shift_date_value(value: Union[str, MultiValue, List[str]], shift: int,
+                     vr: str = 'DT') -> Union[None, str, List[str]]:
+    """
+    Shift the value of a DA or DT element (single or multiple values).
+    None if any of the values cannot be shifted.
+    """
+    if isinstance(value, (MultiValue, list)):
+        shifted = [shift_date(str(x), shift, vr) for x in value]
+        return None if None in shifted else shifted
+    return shift_date(str(value), shift, vr)
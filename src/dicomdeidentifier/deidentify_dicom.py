@@ -1,202 +1,311 @@
-"""
-De-identifier:
-
-- remove pixel data
-(can be chosen for export with remove_pixel_data=True in config.ini)
-
-if deidentify=True in config.ini then:
-- time shift
-- basic rules
-- add generated UIDs
-"""
-import uuid
-from dataclasses import dataclass, field
-from datetime import datetime, timedelta
-from typing import Optional
-from idiscore.core import Core, Profile
-from pydicom.uid import generate_uid, validate_value
-from pydicom import FileDataset, Sequence
-from pydicom.dataset import Dataset
-
-from .rule_sets import timeshift_custom_ruleset, no_times_ruleset
-
-
-class NoTimeShiftError(Exception):
-    pass
-
-
-class NoDatesElementFoundError(Exception):
-    pass
-
-
-def remove_pixel_data(content: Dataset) -> str:
-    """
-    Remove pixel data for export with DB. Not yet implemented.
-    """
-    if hasattr(content, 'PixelData'):
-        del content.PixelData
-
-    return content.to_json()
-
-
-@dataclass
-class LookupID:
-    """Look-up for de-identified uid's."""
-    filename: Optional[str] = field(default=None)
-    deid_patient_id: Optional[str] = field(default=None)
-    deid_study_uid: Optional[str] = field(default=None)
-    deid_series_uid: Optional[str] = field(default=None)
-    deid_sop_uid: Optional[str] = field(default=None)
-    time_shift: Optional[int] = field(default=None)
-    private_tags: bool = field(default=False)
-
-
-@dataclass
-class DeidentifyDataset:
-    """
-    De-identifier for de-identifying dicom content with basic profile
-    and custom dates and UIDs.
-    """
-    lookup: LookupID
-
-    @staticmethod
-    def get_date_elements(ds: Dataset) -> dict:
-        """
-        Get all the date data elements of not de-identified dates and make dictionary.
-        :return:
-        """
-        try:
-            return {de: ds.data_element(de).value for de in ds.dir('date')}
-        except TypeError:
-            return {}
-
-    def deidentify_dates(self, ds: Dataset) -> Dataset:
-        """
-        Deidentify the dates from dictionary which collected all the dates in data elements.
-
-        Since you can remove dates entirely (custom rule sets), handle with key error.
-        If you do not have a time shift, then you get a type error.
-        If you have different date time formats, you will get a value error.
-
-        Need to set PatientBirthDate explicitly to None if not removed in rule set.
-        Args:
-        :param ds:      A pydicom dataset with date and datetime tags
-                        (already changed/de-identified in a first step)
-        :return:        modified dataset (date shift)
-        """
-        shift = self.lookup.time_shift
-
-        for element, date in self.get_date_elements(ds).items():
-            try:
-                if shift in (0, None) or date is None:
-                    ds.data_element(element).value = None
-                else:
-                    if element == 'PatientBirthDate':
-                        ds.data_element(element).value = None
-                    else:
-                        if len(date) == 8:
-                            new_time = datetime.strptime(date, '%Y%m%d') + timedelta(days=shift)
-                            ds.data_element(element).value = new_time.strftime('%Y%m%d')
-                        elif len(date.partition('.')[0]) == 14:
-                            date = date.partition('.')[0]
-                            new_time = datetime.strptime(date, '%Y%m%d%H%M%S') \
-                                       + timedelta(days=shift)
-                            ds.data_element(element).value = new_time.strftime('%Y%m%d%H%M%S')
-                        else:
-                            ds.data_element(element).value = None
-            except TypeError:
-                ds.data_element(element).value = None
-        return ds
-
-    def add_deid_uids(self, ds: Dataset) -> Dataset:
-        """
-        Add our UIds to de-identified data elements.
-        """
-        if self.lookup.deid_patient_id is None:
-            ds.PatientID = str(uuid.uuid4())
-        else:
-            ds.PatientID = str(self.lookup.deid_patient_id)
-
-        if self.lookup.deid_study_uid is None:
-            ds.StudyInstanceUID = str(generate_uid(prefix=None))
-        else:
-            validate_value('UI', self.lookup.deid_study_uid, 2)
-            ds.StudyInstanceUID = str(self.lookup.deid_study_uid)
-
-        if self.lookup.deid_series_uid is None:
-            ds.SeriesInstanceUID = str(generate_uid(prefix=None))
-        else:
-            validate_value('UI', self.lookup.deid_series_uid, 2)
-            ds.SeriesInstanceUID = str(self.lookup.deid_series_uid)
-
-        if self.lookup.deid_sop_uid is None:
-            ds.SOPInstanceUID = str(generate_uid(prefix=None))
-            self.lookup.deid_sop_uid = ds.SOPInstanceUID
-        else:
-            validate_value('UI', self.lookup.deid_sop_uid, 2)
-            ds.SOPInstanceUID = str(self.lookup.deid_sop_uid)
-
-        ds.file_meta.MediaStorageSOPInstanceUID = ds.SOPInstanceUID
-        return ds
-
-    def get_deid_dataset(self, ds: Dataset) -> tuple:
-        """
-        Deidentify dicom content with specific rules.
-        Add rule sets if needed in the rule_sets.
-        Timedelta could be set directly in rule set - not done this way - check.
-        Later rules overrule previous.
-
-        Add information to tags, that the patient identity is removed and with what method.
-        """
-        if self.lookup.time_shift in (0, None):
-            profile = Profile(
-                rule_sets=[timeshift_custom_ruleset,
-                           no_times_ruleset,  # delete all times
-                           ])
-            ds_1 = Dataset()
-        else:
-            profile = Profile(
-                rule_sets=[timeshift_custom_ruleset,
-                           ])
-            ds_1 = Dataset()
-            ds_1.CodeValue = '113107'
-
-        core = Core(profile=profile,        # Create an de-identification core
-                    pixel_processor=None    # here you would add the pixel location
-                    )
-
-        deid_content = self.add_deid_uids(ds)  # added de-identified uids to ds
-
-        try:
-            # de-identification with rule set
-            deid_content = core.deidentify(deid_content)
-        except AttributeError:
-            pass
-        except ValueError:
-            pass
-
-        deid_content = self.deidentify_dates(deid_content)  # de-identified dates (not times)
-        x = deid_content
-
-        # remove private tags, because they could have identity information
-        deid_content.remove_private_tags()
-        y = deid_content
-
-        if x is not y:
-            self.lookup.private_tags = True
-
-        deid_content.PatientIdentityRemoved = 'YES'
-        deid_content.DeidentificationMethod = '{Per DICOM PS 3.15 AnnexE. Details in 0012,0064}'
-
-        ds_sq = Dataset()
-        ds_sq.CodeValue = '113100'
-
-        deid_content.DeidentificationMethodCodeSequence = Sequence([ds_sq, ds_1])
-
-        return FileDataset(self.lookup.filename,
-                           deid_content,
-                           ds.preamble,
-                           ds.file_meta,
-                           ds.read_implicit_vr,
-                           ds.read_little_endian
-                           ), self.lookup
+"""
+De-identifier:
+
+- remove pixel data
+(can be chosen for export with remove_pixel_data=True in config.ini)
+
+if deidentify=True in config.ini then:
+- time shift
+- basic rules
+- add generated UIDs
+"""
+import uuid
+from copy import deepcopy
+from dataclasses import dataclass, field, fields
+from typing import List, Optional, Tuple
+from pydicom.uid import generate_uid, validate_value
+from pydicom import FileDataset, Sequence
+from pydicom.dataelem import DataElement
+from pydicom.dataset import Dataset
+from pydicom.tag import Tag
+
+from .core_registry import get_compiled_rules
+from .dates import DATE_VRS, PATIENT_BIRTH_DATE, shift_date_value
+from .dispatch import CompiledRuleSet
+from .metrics import MetricsCollector, timed
+from .pixels import PixelProcessor, mark_clean_pixels
+from .precheck import SKIP, precheck as precheck_file
+from .private_tags import PrivateTagPolicy
+from .store import LookupStore
+from .timeshift import TimeShiftProvider
+from . import rule_sets
+from .traversal import Traversal
+from .uids import keyed_id, keyed_uid
+
+INSTANCE_UID_KEYWORDS = ('StudyInstanceUID', 'SeriesInstanceUID', 'SOPInstanceUID')
+
+
+class NoTimeShiftError(Exception):
+    pass
+
+
+class NoDatesElementFoundError(Exception):
+    pass
+
+
+def remove_pixel_data(content: Dataset) -> str:
+    """
+    Remove pixel data for export with DB.
+    For bulk export of many data sets use the exporters in export (NDJSON, Parquet).
+    """
+    if hasattr(content, 'PixelData'):
+        del content.PixelData
+
+    return content.to_json()
+
+
+def get_active_rule_sets(time_shift: Optional[int]) -> tuple:
+    """
+    Rule sets for a time shift: without a time shift, all times are deleted, too.
+    """
+    if time_shift in (0, None):
+        return (rule_sets.timeshift_custom_ruleset,
+                rule_sets.no_times_ruleset,  # delete all times
+                )
+    return (rule_sets.timeshift_custom_ruleset,)
+
+
+def slotted(cls):
+    """
+    Recreate a dataclass with __slots__ instead of a __dict__ per instance
+    (like dataclass(slots=True) of python 3.10+).
+    """
+    names = tuple(f.name for f in fields(cls))
+    namespace = {key: value for key, value in cls.__dict__.items()
+                 if key not in names and key not in ('__dict__', '__weakref__')}
+    namespace['__slots__'] = names
+    return type(cls)(cls.__name__, cls.__bases__, namespace)
+
+
+@slotted
+@dataclass
+class LookupID:
+    """Look-up for de-identified uid's (slotted, for millions of instances see lookup_table)."""
+    filename: Optional[str] = field(default=None)
+    deid_patient_id: Optional[str] = field(default=None)
+    deid_study_uid: Optional[str] = field(default=None)
+    deid_series_uid: Optional[str] = field(default=None)
+    deid_sop_uid: Optional[str] = field(default=None)
+    time_shift: Optional[int] = field(default=None)
+    private_tags: bool = field(default=False)
+    private_tags_removed: int = field(default=0)
+
+
+@dataclass
+class DeidentifyDataset:
+    """
+    De-identifier for de-identifying dicom content with basic profile
+    and custom dates and UIDs.
+
+    With a uid_key, missing de-identified ids are derived from the original ids
+    (keyed hash, see uids) instead of being random: same original, same new id.
+    With a metrics collector, get_deid_dataset records durations and counters (see metrics).
+    All private tags are removed, except the safe ones of the private policy (see private_tags).
+    With a store, the missing ids and time shift of the look-up are taken from the store (see store).
+    With a time shift provider, a missing time shift is the shift of the patient (see timeshift).
+    With a pixel processor, burned-in annotations are blanked in the pixel data (see pixels).
+    Rule sets replace the default rule sets for the time shift (e.g. a tuned rule set, see profiling).
+    Files which are already de-identified can be found with precheck, reading only their header.
+    """
+    lookup: LookupID
+    uid_key: Optional[bytes] = field(default=None)
+    metrics: Optional[MetricsCollector] = field(default=None)
+    private_policy: PrivateTagPolicy = field(default_factory=PrivateTagPolicy)
+    store: Optional[LookupStore] = field(default=None)
+    time_shift_provider: Optional[TimeShiftProvider] = field(default=None)
+    pixel_processor: Optional[PixelProcessor] = field(default=None)
+    rule_sets: Optional[tuple] = field(default=None)
+
+    @staticmethod
+    def get_date_elements(ds: Dataset, vrs: Tuple[str, ...] = DATE_VRS) -> List[DataElement]:
+        """
+        Get all the date data elements of not de-identified dates, also in sequences.
+
+        The elements are found by VR in a single walk (pass ('DA', 'DT', 'TM') to get
+        the times, too) and returned as references, so they can be changed in place.
+        :return:    list of data elements
+        """
+        return [element for element in ds.iterall() if element.VR in vrs]
+
+    def deidentify_dates(self, ds: Dataset) -> Dataset:
+        """
+        Deidentify the dates of all date and datetime data elements (also in sequences).
+
+        Since you can remove dates entirely (custom rule sets), handle with key error.
+        If you do not have a time shift, then you get a type error.
+        If you have different date time formats, you will get a value error.
+
+        Need to set PatientBirthDate explicitly to None if not removed in rule set.
+        Dates are shifted with the dates module: time, fraction and timezone of
+        datetimes are kept, dates are truncated to YYYYMMDD, ranges and multiple values are shifted, too.
+        Values which cannot be shifted are set to None.
+        Args:
+        :param ds:      A pydicom dataset with date and datetime tags
+                        (already changed/de-identified in a first step)
+        :return:        modified dataset (date shift)
+        """
+        shift = self.lookup.time_shift
+
+        for element in self.get_date_elements(ds):
+            try:
+                if shift in (0, None) or element.value is None or element.tag == PATIENT_BIRTH_DATE:
+                    element.value = None
+                else:
+                    element.value = shift_date_value(element.value, shift, element.VR)
+            except TypeError:
+                element.value = None
+        return ds
+
+    def new_uid(self, original: Optional[str]) -> str:
+        """
+        Keyed UID of the original UID if there is a uid_key, otherwise a random UID.
+        """
+        if self.uid_key is not None and original:
+            return keyed_uid(original, self.uid_key)
+        return str(generate_uid(prefix=None))
+
+    def add_deid_uids(self, ds: Dataset) -> Dataset:
+        """
+        Add our UIds to de-identified data elements.
+        """
+        if self.lookup.deid_patient_id is None:
+            if self.uid_key is not None and ds.get('PatientID'):
+                ds.PatientID = keyed_id(ds.PatientID, self.uid_key)
+            else:
+                ds.PatientID = str(uuid.uuid4())
+        else:
+            ds.PatientID = str(self.lookup.deid_patient_id)
+
+        if self.lookup.deid_study_uid is None:
+            ds.StudyInstanceUID = self.new_uid(ds.get('StudyInstanceUID'))
+        else:
+            validate_value('UI', self.lookup.deid_study_uid, 2)
+            ds.StudyInstanceUID = str(self.lookup.deid_study_uid)
+
+        if self.lookup.deid_series_uid is None:
+            ds.SeriesInstanceUID = self.new_uid(ds.get('SeriesInstanceUID'))
+        else:
+            validate_value('UI', self.lookup.deid_series_uid, 2)
+            ds.SeriesInstanceUID = str(self.lookup.deid_series_uid)
+
+        if self.lookup.deid_sop_uid is None:
+            ds.SOPInstanceUID = self.new_uid(ds.get('SOPInstanceUID'))
+            self.lookup.deid_sop_uid = ds.SOPInstanceUID
+        else:
+            validate_value('UI', self.lookup.deid_sop_uid, 2)
+            ds.SOPInstanceUID = str(self.lookup.deid_sop_uid)
+
+        ds.file_meta.MediaStorageSOPInstanceUID = ds.SOPInstanceUID
+        return ds
+
+    @property
+    def compiled_rules(self) -> CompiledRuleSet:
+        """Compiled rules of the de-identification: the rule sets, or the rule sets of the time shift."""
+        return get_compiled_rules(*(self.rule_sets or get_active_rule_sets(self.lookup.time_shift)))
+
+    def precheck(self, source, policy: str = SKIP) -> bool:
+        """
+        True if the file (path or binary file object) is already de-identified and
+        does not need to be de-identified again with the policy (SKIP, VERIFY or
+        REPROCESS, see precheck). Reads only the header up to (0012,0064),
+        VERIFY the header without pixel data, with the rules of this de-identification.
+        """
+        return precheck_file(source, policy, self.compiled_rules, self.private_policy)
+
+    def get_deid_dataset(self, ds: Dataset, copy: bool = True) -> tuple:
+        """
+        Deidentify dicom content with specific rules.
+        Add rule sets if needed in the rule_sets.
+        Timedelta could be set directly in rule set - not done this way - check.
+        Later rules overrule previous.
+        The rule sets are compiled only once (see core_registry and dispatch).
+
+        The rules, the date shift, the UID remapping (also of references in sequences)
+        and the private tag policy are applied in one walk (see traversal).
+        With metrics, the stages are timed and counted (see metrics).
+
+        With copy=False the data set is de-identified in place: a FileDataset is itself
+        returned, another data set is wrapped without copying.
+        Use it when the input is not needed anymore (e.g. read from a file).
+        :param ds:      data set to de-identify
+        :param copy:    False to de-identify the data set itself
+        :return:        de-identified FileDataset and look-up
+
+        Add information to tags, that the patient identity is removed and with what method.
+        """
+        metrics = self.metrics
+        with timed(metrics, 'total'):
+            deid_content = deepcopy(ds) if copy else ds  # pixel data (bytes) is not copied
+
+            with timed(metrics, 'uids'):
+                if self.lookup.time_shift is None and self.time_shift_provider is not None:
+                    self.lookup.time_shift = self.time_shift_provider.get(deid_content.get('PatientID'))
+                if self.store is not None:
+                    self.store.fill(self.lookup, deid_content, self.uid_key)  # stored time shift wins
+                originals = [deid_content.get(keyword) for keyword in INSTANCE_UID_KEYWORDS]
+                deid_content = self.add_deid_uids(deid_content)  # added de-identified uids to ds
+                uid_map = {}
+                for keyword, original in zip(INSTANCE_UID_KEYWORDS, originals):
+                    uid_map[deid_content[keyword].value] = deid_content[keyword].value
+                    if original:
+                        uid_map[original] = deid_content[keyword].value
+
+            active_rule_sets = self.rule_sets or get_active_rule_sets(self.lookup.time_shift)
+            ds_1 = Dataset()
+            if self.lookup.time_shift not in (0, None):
+                ds_1.CodeValue = '113107'
+
+            clean_pixels = False
+            if self.pixel_processor is not None:
+                with timed(metrics, 'pixels'):  # before the walk, needs the original header
+                    clean_pixels = self.pixel_processor.process(deid_content)
+
+            with timed(metrics, 'walk'):
+                # rules, dates (not times), uids and private tags (could have identity information)
+                traversal = Traversal(get_compiled_rules(*active_rule_sets), self.lookup.time_shift, uid_map,
+                                      self.uid_key, self.private_policy)
+                traversal.walk(deid_content)
+
+            self.lookup.private_tags_removed = traversal.private_removed
+            self.lookup.private_tags = traversal.private_removed > 0
+            if metrics is not None:
+                self.count_walk(traversal)
+
+            deid_content.PatientIdentityRemoved = 'YES'
+            deid_content.DeidentificationMethod = '{Per DICOM PS 3.15 AnnexE. Details in 0012,0064}'
+
+            ds_sq = Dataset()
+            ds_sq.CodeValue = '113100'
+
+            method_codes = [ds_sq, ds_1]
+            if self.private_policy.retains_private:
+                ds_private = Dataset()
+                ds_private.CodeValue = '113111'  # Retain Safe Private Option
+                method_codes.append(ds_private)
+            deid_content.DeidentificationMethodCodeSequence = Sequence(method_codes)
+            if clean_pixels:
+                mark_clean_pixels(deid_content)
+
+            with timed(metrics, 'file_dataset'):
+                if isinstance(deid_content, FileDataset):
+                    deid_content.filename = self.lookup.filename
+                    deid_ds = deid_content
+                else:
+                    # shares the elements of deid_content, they are not copied
+                    deid_ds = FileDataset(self.lookup.filename,
+                                          deid_content,
+                                          deid_content.preamble,
+                                          deid_content.file_meta,
+                                          deid_content.read_implicit_vr,
+                                          deid_content.read_little_endian
+                                          )
+        return deid_ds, self.lookup
+
+    def count_walk(self, traversal: Traversal) -> None:
+        """Report the counts of the walk to the metrics: elements removed per rule (tag and operation)."""
+        self.metrics.count('elements_touched', traversal.elements)
+        for tag, number in traversal.removed.items():
+            self.metrics.count('elements_removed', number, rule=f"{Tag(tag)} {traversal.compiled.get_operator(tag)}")
+        self.metrics.count('private_tags_removed', traversal.private_removed)
+        for error, number in traversal.errors.items():
+            self.metrics.count('swallowed_errors', number, error=error)
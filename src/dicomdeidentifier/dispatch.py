@@ -0,0 +1,163 @@
+"""
+Compiled rule sets.
+
+idiscore looks up the rule of every element by converting its tag to a string
+key and scanning the repeating group rules. A compiled rule set maps the integer
+tag directly to the operator (plus a short list of masks for repeating groups),
+so that a data set can be de-identified in one walk with an O(1) lookup per element.
+
+Duplicate and conflicting rules within a rule set are reported at compile time.
+"""
+import warnings
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from pydicom.dataset import Dataset
+
+if TYPE_CHECKING:
+    from idiscore.operators import Operator
+    from idiscore.rules import Rule, RuleSet
+
+PIXEL_DATA_TAG = 0x7FE00010
+
+
+class RuleConflictWarning(UserWarning):
+    pass
+
+
+@dataclass
+class RuleConflict:
+    """Tag with more than one rule in the same rule set."""
+    tag: str
+    rule_set: str
+    operations: List[str]
+
+    @property
+    def is_conflicting(self) -> bool:
+        """True if the rules disagree (not only duplicated)."""
+        return len(set(self.operations)) > 1
+
+    def __str__(self):
+        kind = 'conflicting' if self.is_conflicting else 'duplicate'
+        return f"{kind} rules for {self.tag} in {self.rule_set}: {', '.join(self.operations)}"
+
+
+@dataclass
+class CompiledRuleSet:
+    """
+    Operator per integer tag, and (mask, static component, operator, rule key) for
+    repeating groups, the most specific first (same precedence as idiscore).
+    The rules which are in effect are kept by key.
+    """
+    single: Dict[int, 'Operator'] = field(default_factory=dict)
+    groups: List[Tuple[int, int, 'Operator', str]] = field(default_factory=list)
+    rules: Dict[str, 'Rule'] = field(default_factory=dict)
+    keys: Dict[int, str] = field(default_factory=dict)
+    conflicts: List[RuleConflict] = field(default_factory=list)
+
+    def get_operator(self, tag: int) -> Optional['Operator']:
+        """Operator for the given tag, or None if no rule matches."""
+        operator = self.single.get(tag)
+        if operator is None:
+            for mask, static, group_operator, _ in self.groups:
+                if tag & mask == static:
+                    return group_operator
+        return operator
+
+    def get_rule_key(self, tag: int) -> Optional[str]:
+        """Key of the rule which gives the operator for the given tag, or None if no rule matches."""
+        key = self.keys.get(tag)
+        if key is None:
+            for mask, static, _, group_key in self.groups:
+                if tag & mask == static:
+                    return group_key
+        return key
+
+
+def find_conflicts(rule_set: 'RuleSet') -> List[RuleConflict]:
+    """
+    Find tags with more than one rule in the declared rules of a rule set.
+
+    Rule sets not created with DeclaredRuleSet have already lost their duplicates.
+    """
+    operations: Dict[str, List[str]] = {}
+    for rule in getattr(rule_set, 'declared_rules', rule_set.rules):
+        operations.setdefault(rule.identifier.key(), []).append(str(rule.operation))
+    return [RuleConflict(tag=key, rule_set=rule_set.name, operations=ops)
+            for key, ops in operations.items() if len(ops) > 1]
+
+
+def compile_rule_sets(*rule_sets: 'RuleSet') -> CompiledRuleSet:
+    """
+    Compile rule sets to a dispatch table. Later rule sets overrule previous.
+
+    Duplicate or conflicting rules are reported with a RuleConflictWarning
+    and kept in the conflicts of the compiled rule set.
+    """
+    from idiscore.identifiers import RepeatingGroup, SingleTag
+
+    compiled = CompiledRuleSet()
+    groups: Dict[str, Tuple[int, int, int, 'Operator']] = {}
+
+    for rule_set in rule_sets:
+        for conflict in find_conflicts(rule_set):
+            compiled.conflicts.append(conflict)
+            warnings.warn(str(conflict), RuleConflictWarning)
+
+        # the rules of a rule set are already collapsed (last rule for a tag wins)
+        for rule in rule_set.rules:
+            identifier = rule.identifier
+            key = identifier.key()
+            if isinstance(identifier, SingleTag):
+                compiled.single[int(identifier.tag)] = rule.operation
+                compiled.keys[int(identifier.tag)] = key
+            elif isinstance(identifier, RepeatingGroup):
+                groups[key] = (identifier.number_of_matchable_tags(),
+                               identifier.tag.as_mask(),
+                               identifier.tag.static_component(),
+                               rule.operation)
+            else:
+                raise ValueError(f"Cannot compile rule {rule}: unsupported identifier")
+            compiled.rules[key] = rule
+
+    compiled.groups = [(mask, static, operator, key) for key, (_, mask, static, operator)
+                       in sorted(groups.items(), key=lambda item: item[1][0])]
+    return compiled
+
+
+def deidentify_compiled(ds: Dataset, compiled: CompiledRuleSet) -> Dataset:
+    """
+    Apply a compiled rule set to the data set in place, recursing into sequences.
+
+    Like idiscore's core.deidentify without copying the data set: pixel data is
+    not touched. Unlike idiscore, the rule of a sequence is applied, too: the
+    items of a sequence are recursed only if it is kept or has no rule.
+    """
+    from idiscore.operators import ElementShouldBeRemoved, Empty, Keep, Remove
+
+    removed = []
+    for element in ds:
+        tag = element.tag
+        if tag == PIXEL_DATA_TAG:
+            continue
+        operator = compiled.get_operator(tag)
+        if operator is None or type(operator) is Keep:
+            if element.VR == 'SQ':
+                for item in element.value:
+                    deidentify_compiled(item, compiled)
+            continue
+
+        operator_type = type(operator)
+        if operator_type is Remove:
+            removed.append(tag)
+        elif operator_type is Empty:
+            element.value = None
+        else:
+            try:
+                ds[tag] = operator.apply(element, ds)
+            except ElementShouldBeRemoved:
+                removed.append(tag)
+
+    for tag in removed:
+        del ds[tag]
+    return ds
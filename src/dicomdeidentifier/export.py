@@ -0,0 +1,145 @@
+"""
+Metadata export of de-identified data sets.
+
+The headers of many data sets are collected as rows with a stable column schema
+and written in bulk (one row group or block of lines per row_group_size data sets),
+as NDJSON to a file handle or as Parquet (needs the optional pyarrow package).
+
+The default columns are common header keywords which survive the time-shift
+rule set unchanged (no rule, or Keep): removed, emptied or replaced (dummy)
+values are not worth exporting.
+"""
+import json
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, List, Optional, Sequence, TextIO
+
+from pydicom.datadict import tag_for_keyword
+from pydicom.dataset import Dataset
+from pydicom.multival import MultiValue
+
+from .core_registry import get_compiled_rules
+from . import rule_sets
+
+EXPORT_CANDIDATES = (
+    'PatientID', 'PatientSex', 'PatientAge', 'PatientSize', 'PatientWeight',
+    'StudyInstanceUID', 'SeriesInstanceUID', 'SOPInstanceUID', 'SOPClassUID',
+    'StudyDate', 'SeriesDate', 'AcquisitionDate', 'ContentDate', 'AcquisitionDateTime',
+    'Modality', 'Manufacturer', 'ManufacturerModelName', 'BodyPartExamined',
+    'StudyDescription', 'SeriesDescription', 'ProtocolName', 'StudyID',
+    'SeriesNumber', 'InstanceNumber', 'AcquisitionNumber', 'ImageType',
+    'Rows', 'Columns', 'NumberOfFrames', 'BitsAllocated', 'PhotometricInterpretation',
+    'PixelSpacing', 'SliceThickness', 'SpacingBetweenSlices', 'SliceLocation',
+    'ImagePositionPatient', 'ImageOrientationPatient', 'FrameOfReferenceUID',
+    'KVP', 'ConvolutionKernel', 'MagneticFieldStrength', 'EchoTime', 'RepetitionTime',
+    'PatientIdentityRemoved', 'DeidentificationMethod',
+)
+
+ROW_GROUP_SIZE = 1000
+
+
+def default_columns(candidates: Sequence[str] = EXPORT_CANDIDATES) -> List[str]:
+    """The candidate keywords which the time-shift rule set keeps unchanged."""
+    from idiscore.operators import Keep
+
+    compiled = get_compiled_rules(rule_sets.timeshift_custom_ruleset)
+    columns = []
+    for keyword in candidates:
+        operator = compiled.get_operator(tag_for_keyword(keyword))
+        if operator is None or type(operator) is Keep:
+            columns.append(keyword)
+    return columns
+
+
+def column_value(ds: Dataset, keyword: str) -> Optional[str]:
+    """
+    The value of an element as string (multiple values joined by backslash),
+    None if missing, empty, a sequence or binary.
+    """
+    if keyword not in ds:
+        return None
+    element = ds[keyword]
+    value = element.value
+    if value is None or value == '' or element.VR == 'SQ' or isinstance(value, bytes):
+        return None
+    if isinstance(value, (MultiValue, list)):
+        return '\\'.join(str(x) for x in value)
+    return str(value)
+
+
+class MetadataExporter(ABC):
+    """
+    Collects rows of data set headers and writes them in bulk.
+    Use as context manager, or call close at the end.
+    """
+
+    def __init__(self, columns: Optional[Sequence[str]] = None, row_group_size: int = ROW_GROUP_SIZE):
+        self.columns = list(columns) if columns is not None else default_columns()
+        self.row_group_size = row_group_size
+        self.rows: List[Dict[str, Optional[str]]] = []
+        self.count = 0
+
+    def add(self, ds: Dataset) -> None:
+        """Add the header of a data set (pixel data is never exported)."""
+        self.rows.append({column: column_value(ds, column) for column in self.columns})
+        self.count += 1
+        if len(self.rows) >= self.row_group_size:
+            self.flush()
+
+    def add_all(self, datasets: Iterable[Dataset]) -> None:
+        for ds in datasets:
+            self.add(ds)
+
+    def flush(self) -> None:
+        """Write the collected rows."""
+        if self.rows:
+            self.write_rows(self.rows)
+            self.rows = []
+
+    @abstractmethod
+    def write_rows(self, rows: List[Dict[str, Optional[str]]]) -> None:
+        """Write a block of rows (one row group)."""
+
+    def close(self) -> None:
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class NDJSONExporter(MetadataExporter):
+    """Writes one JSON object per line to a text file handle (which is not closed)."""
+
+    def __init__(self, fp: TextIO, columns: Optional[Sequence[str]] = None, row_group_size: int = ROW_GROUP_SIZE):
+        super().__init__(columns, row_group_size)
+        self.fp = fp
+
+    def write_rows(self, rows: List[Dict[str, Optional[str]]]) -> None:
+        self.fp.write(''.join(json.dumps(row) + '\n' for row in rows))
+
+
+class ParquetExporter(MetadataExporter):
+    """Writes a Parquet file with one row group per row_group_size data sets (needs pyarrow)."""
+
+    def __init__(self, path: str, columns: Optional[Sequence[str]] = None, row_group_size: int = ROW_GROUP_SIZE):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError as e:
+            raise ImportError("Parquet export needs pyarrow: pip install dicomdeidentifier[parquet]") from e
+
+        super().__init__(columns, row_group_size)
+        self._pyarrow = pyarrow
+        self.schema = pyarrow.schema([(column, pyarrow.string()) for column in self.columns])
+        self.writer = pyarrow.parquet.ParquetWriter(path, self.schema)
+
+    def write_rows(self, rows: List[Dict[str, Optional[str]]]) -> None:
+        table = self._pyarrow.Table.from_pydict(
+            {column: [row[column] for row in rows] for column in self.columns}, schema=self.schema)
+        self.writer.write_table(table)
+
+    def close(self) -> None:
+        super().close()
+        self.writer.close()
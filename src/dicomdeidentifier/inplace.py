@@ -0,0 +1,96 @@
+"""
+In-place de-identification of files.
+
+The file is memory-mapped, the header (everything before the pixel data) is
+de-identified and, if the new header fits in the span of the original header,
+written over it. A smaller header is filled up to the original length with a
+private padding element, so only the header bytes are written and the pixel
+data stays where it is. If the header does not fit, the file is rewritten
+(header plus a copy of the pixel data, see streaming).
+
+As in streaming, elements after the pixel data are dropped.
+"""
+import mmap
+import os
+import shutil
+import tempfile
+from io import BytesIO
+from typing import Callable, Optional, Tuple
+
+from pydicom import dcmread
+from pydicom.dataset import Dataset
+from pydicom.uid import DeflatedExplicitVRLittleEndian
+
+from .deidentify_dicom import DeidentifyDataset, LookupID
+from .private_tags import PADDING_CREATOR, PADDING_GROUP
+from .streaming import StreamingNotSupportedError, copy_range, pixel_data_span
+from .uids import factory_key
+
+
+def encode_header(ds: Dataset) -> bytes:
+    """The file bytes of a data set without pixel data (preamble, file meta and data set)."""
+    buffer = BytesIO()
+    ds.save_as(buffer)
+    return buffer.getvalue()
+
+
+def add_header_padding(ds: Dataset, size: int) -> bool:
+    """
+    Add a private padding block of exactly size bytes to the data set.
+    :return:    False if the size is too small (or odd) for a padding block
+    """
+    overhead = 8 + len(PADDING_CREATOR) + (8 if ds.is_implicit_VR else 12)
+    if size < overhead or size % 2:
+        return False
+    block = ds.private_block(PADDING_GROUP, PADDING_CREATOR, create=True)
+    block.add_new(0x00, 'OB', b'\0' * (size - overhead))
+    return True
+
+
+def deidentify_file_in_place(path: str,
+                             lookup_factory: Optional[Callable[[Dataset], LookupID]] = None,
+                             ) -> Tuple[LookupID, bool]:
+    """
+    De-identify a file in place, writing only the header if possible.
+
+    :param path:            file to de-identify
+    :param lookup_factory:  creates the look-up for the header data set (default: empty look-up)
+    :return:                look-up, and True if the header was patched in place
+                            (False if the file was rewritten)
+    """
+    with open(path, 'r+b') as file:
+        with mmap.mmap(file.fileno(), 0) as mapped:
+            ds = dcmread(mapped, stop_before_pixels=True)
+            if ds.file_meta.get('TransferSyntaxUID') == DeflatedExplicitVRLittleEndian:
+                raise StreamingNotSupportedError(f"Cannot rewrite deflated file {path} in place")
+            start, end = pixel_data_span(mapped, mapped.tell(), ds.is_implicit_VR, ds.is_little_endian)
+
+            lookup = lookup_factory(ds) if lookup_factory else LookupID()
+            if lookup.filename is None:
+                lookup.filename = path
+            deid_ds, lookup = DeidentifyDataset(lookup, uid_key=factory_key(lookup_factory)).get_deid_dataset(ds, copy=False)
+
+            header = encode_header(deid_ds)
+            if len(header) < start and add_header_padding(deid_ds, start - len(header)):
+                header = encode_header(deid_ds)
+            patched = len(header) == start
+            if patched:
+                mapped[:start] = header
+                mapped.flush()
+
+        if patched:
+            file.truncate(end)
+            return lookup, True
+
+        handle, temporary = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.dcm')
+        try:
+            with os.fdopen(handle, 'wb') as destination:
+                destination.write(header)
+                copy_range(file, destination, start, end - start)
+            shutil.copymode(path, temporary)  # mkstemp creates the file with mode 0600
+        except BaseException:
+            os.unlink(temporary)
+            raise
+
+    os.replace(temporary, path)
+    return lookup, False
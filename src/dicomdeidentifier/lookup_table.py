@@ -0,0 +1,67 @@
+"""
+Look-up table for large batches.
+
+Keeps the look-ups of many instances (e.g. for the audit log of a batch run) as
+one list per field instead of one object per instance. The patient ids, study
+and series UIDs repeat for all instances of a series, they are interned, so
+each distinct value is stored once. The table is written to CSV or to Parquet
+(needs the optional pyarrow package).
+"""
+import csv
+import sys
+from dataclasses import fields
+from typing import Dict, Iterable, Iterator, List, TextIO
+
+from .deidentify_dicom import LookupID
+
+COLUMNS = tuple(f.name for f in fields(LookupID))
+INTERNED_COLUMNS = ('deid_patient_id', 'deid_study_uid', 'deid_series_uid')
+
+
+class LookupTable:
+    """Column-wise table of look-ups."""
+
+    def __init__(self, lookups: Iterable[LookupID] = ()):
+        self.columns: Dict[str, List] = {name: [] for name in COLUMNS}
+        self.extend(lookups)
+
+    def append(self, lookup: LookupID) -> None:
+        for name, column in self.columns.items():
+            value = getattr(lookup, name)
+            if name in INTERNED_COLUMNS and value is not None:
+                value = sys.intern(str(value))
+            column.append(value)
+
+    def extend(self, lookups: Iterable[LookupID]) -> None:
+        for lookup in lookups:
+            self.append(lookup)
+
+    def __len__(self) -> int:
+        return len(self.columns['filename'])
+
+    def __getitem__(self, index: int) -> LookupID:
+        return LookupID(**{name: column[index] for name, column in self.columns.items()})
+
+    def __iter__(self) -> Iterator[LookupID]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def to_csv(self, fp: TextIO) -> None:
+        """Write the table with a header line to a text file handle (opened with newline='')."""
+        writer = csv.writer(fp)
+        writer.writerow(COLUMNS)
+        writer.writerows(zip(*(self.columns[name] for name in COLUMNS)))
+
+    def to_parquet(self, path: str) -> None:
+        """Write the table to a Parquet file (needs pyarrow)."""
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError as e:
+            raise ImportError("Parquet export needs pyarrow: pip install dicomdeidentifier[parquet]") from e
+
+        types = {'time_shift': pyarrow.int32(), 'private_tags': pyarrow.bool_(),
+                 'private_tags_removed': pyarrow.int64()}
+        schema = pyarrow.schema([(name, types.get(name, pyarrow.string())) for name in COLUMNS])
+        table = pyarrow.Table.from_pydict(self.columns, schema=schema)
+        pyarrow.parquet.write_table(table, path)
@@ -0,0 +1,137 @@
+"""
+Metrics of the de-identification.
+
+DeidentifyDataset(lookup, metrics=collector) records the duration of every stage
+of get_deid_dataset (uids, walk, file_dataset, total) and counters: elements
+touched, elements removed per rule, private tags removed and swallowed errors.
+Without a collector (the default) nothing is measured or counted.
+
+Collectors: InMemoryCollector keeps count, sum and maximum per stage and the
+counter values, PrometheusCollector renders them in the Prometheus text format.
+Any object with observe and count methods can be used (e.g. to forward to statsd).
+"""
+import threading
+import time
+from collections import defaultdict
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from typing import ContextManager, Dict, List, Optional, Protocol, Tuple
+
+NULL_CONTEXT = nullcontext()
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class MetricsCollector(Protocol):
+    """Receiver of the metrics."""
+
+    def observe(self, stage: str, seconds: float) -> None:
+        """Duration of a stage."""
+
+    def count(self, name: str, value: int = 1, **labels: str) -> None:
+        """Increment a counter, optionally with labels."""
+
+
+class StageTimer:
+    """Context manager which reports the duration of a stage to a collector."""
+    __slots__ = ('collector', 'stage', 'start')
+
+    def __init__(self, collector: MetricsCollector, stage: str):
+        self.collector = collector
+        self.stage = stage
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.collector.observe(self.stage, time.perf_counter() - self.start)
+
+
+def timed(collector: Optional[MetricsCollector], stage: str) -> ContextManager:
+    """Timer of a stage, a shared no-op context if there is no collector."""
+    if collector is None:
+        return NULL_CONTEXT
+    return StageTimer(collector, stage)
+
+
+@dataclass
+class StageStatistics:
+    """Count, sum and maximum of the durations of a stage, in seconds."""
+    count: int = field(default=0)
+    sum: float = field(default=0.0)
+    max: float = field(default=0.0)
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+
+
+class InMemoryCollector:
+    """Collects the metrics in memory (thread-safe)."""
+
+    def __init__(self):
+        self.stages: Dict[str, StageStatistics] = defaultdict(StageStatistics)
+        self.counters: Dict[Tuple[str, Labels], int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            statistics = self.stages[stage]
+            statistics.count += 1
+            statistics.sum += seconds
+            statistics.max = max(statistics.max, seconds)
+
+    def count(self, name: str, value: int = 1, **labels: str) -> None:
+        with self._lock:
+            self.counters[name, tuple(sorted(labels.items()))] += value
+
+    def get_count(self, name: str, **labels: str) -> int:
+        """Value of a counter; without labels, the sum over all its labels."""
+        if labels:
+            return self.counters.get((name, tuple(sorted(labels.items()))), 0)
+        return sum(value for (counter, _), value in self.counters.items() if counter == name)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.stages.clear()
+            self.counters.clear()
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ''
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + '}'
+
+
+class PrometheusCollector(InMemoryCollector):
+    """Collects the metrics in memory and renders them in the Prometheus text exposition format."""
+
+    def __init__(self, prefix: str = 'dicom_deidentify'):
+        super().__init__()
+        self.prefix = prefix
+
+    def render(self) -> str:
+        with self._lock:
+            stages = {stage: StageStatistics(s.count, s.sum, s.max) for stage, s in self.stages.items()}
+            counters = dict(self.counters)
+
+        lines: List[str] = []
+        if stages:
+            name = f'{self.prefix}_stage_seconds'
+            lines.append(f'# HELP {name} Duration of the de-identification stages.')
+            lines.append(f'# TYPE {name} summary')
+            for stage, statistics in sorted(stages.items()):
+                labels = _format_labels((('stage', stage),))
+                lines.append(f'{name}_sum{labels} {statistics.sum!r}')
+                lines.append(f'{name}_count{labels} {statistics.count}')
+
+        for counter in sorted({counter for counter, _ in counters}):
+            name = f'{self.prefix}_{counter}_total'
+            lines.append(f'# TYPE {name} counter')
+            for (other, labels), value in sorted(counters.items()):
+                if other == counter:
+                    lines.append(f'{name}{_format_labels(labels)} {value}')
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,251 @@
+"""
+File pipeline: de-identify all DICOM files of a directory tree with a process pool.
+
+Each worker process has its own shared compiled rules (see core_registry). The look-up
+factory is deterministic (de-identified ids derived from the original ids with
+a key, see uids), so all workers give the same ids for the same patient,
+study and series without any coordination between processes.
+Files are sent to the workers in chunks, to keep the overhead per file small.
+"""
+import os
+import shutil
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+from pydicom import dcmread
+from pydicom.dataset import Dataset
+
+from .deidentify_dicom import DeidentifyDataset, LookupID, slotted
+from .pixels import PixelProcessor, has_clean_pixels, mark_clean_pixels
+from .precheck import SKIP, VERIFY, precheck, verify_header
+from .streaming import deidentify_file_streaming
+from .timeshift import TimeShiftProvider
+from .uids import factory_key, keyed_id, keyed_uid
+
+
+@slotted
+@dataclass
+class FileResult:
+    """
+    Result of de-identifying one file (error is set if it failed, skipped if it was already
+    de-identified and copied, see copy_deidentified).
+    """
+    source: str
+    destination: str
+    lookup: Optional[LookupID] = None
+    error: Optional[str] = None
+    skipped: bool = False
+
+
+@dataclass
+class DerivedLookupFactory:
+    """
+    Look-up factory deriving the de-identified ids from the original ids.
+
+    The ids are keyed hashes (random key per run if not given), so the same
+    original id gives the same de-identified id in every worker process.
+    Give the key to get the same ids in re-runs.
+    Given de-identified patient id, study or series UID are used for all data sets.
+    Without a time shift, the time shift provider gives the shift per patient (see timeshift).
+    Needs to be picklable to be sent to the workers.
+    """
+    time_shift: Optional[int] = None
+    key: bytes = field(default_factory=lambda: os.urandom(32))
+    deid_patient_id: Optional[str] = None
+    deid_study_uid: Optional[str] = None
+    deid_series_uid: Optional[str] = None
+    time_shift_provider: Optional[TimeShiftProvider] = None
+
+    def __call__(self, ds: Dataset) -> LookupID:
+        lookup = LookupID(time_shift=self.time_shift, deid_patient_id=self.deid_patient_id,
+                          deid_study_uid=self.deid_study_uid, deid_series_uid=self.deid_series_uid)
+        if lookup.deid_patient_id is None and ds.get('PatientID'):
+            lookup.deid_patient_id = keyed_id(ds.PatientID, self.key)
+        if lookup.deid_study_uid is None and ds.get('StudyInstanceUID'):
+            lookup.deid_study_uid = keyed_uid(ds.StudyInstanceUID, self.key)
+        if lookup.deid_series_uid is None and ds.get('SeriesInstanceUID'):
+            lookup.deid_series_uid = keyed_uid(ds.SeriesInstanceUID, self.key)
+        if lookup.time_shift is None and self.time_shift_provider is not None:
+            lookup.time_shift = self.time_shift_provider.get(ds.get('PatientID'))
+        if ds.get('SOPInstanceUID'):
+            lookup.deid_sop_uid = keyed_uid(ds.SOPInstanceUID, self.key)
+        return lookup
+
+
+def copy_deidentified(source: str, destination: str, policy: str,
+                      lookup_factory: Callable[[Dataset], LookupID],
+                      pixel_processor: Optional[PixelProcessor] = None,
+                      rule_sets: Optional[tuple] = None) -> bool:
+    """
+    Copy the file if it is already de-identified (see precheck), False if it needs to be de-identified.
+
+    VERIFY checks the header with the rules the file would be de-identified with (the rule sets,
+    or the rule sets of the time shift of its look-up). If a pixel location matches a file without
+    the Clean Pixel Data Option, its burned-in annotations are blanked in the copy (the header is kept).
+    """
+    if not precheck(source, SKIP if policy == VERIFY else policy):
+        return False
+    header = None
+    if policy == VERIFY:
+        header = dcmread(source, stop_before_pixels=True)
+        deidentifier = DeidentifyDataset(lookup_factory(header), rule_sets=rule_sets, uid_key=factory_key(lookup_factory))
+        if verify_header(header, deidentifier.compiled_rules, deidentifier.private_policy):
+            return False
+
+    if pixel_processor is not None:
+        if header is None:
+            header = dcmread(source, stop_before_pixels=True)
+        if pixel_processor.regions(header) and not has_clean_pixels(header):
+            ds = dcmread(source)
+            if pixel_processor.process(ds):
+                mark_clean_pixels(ds)
+            ds.save_as(destination)
+            return True
+    shutil.copyfile(source, destination)
+    return True
+
+
+def deidentify_file(source: str, destination: str,
+                    lookup_factory: Callable[[Dataset], LookupID],
+                    streaming: bool = False,
+                    pixel_processor: Optional[PixelProcessor] = None,
+                    precheck_policy: Optional[str] = None,
+                    rule_sets: Optional[tuple] = None) -> FileResult:
+    """
+    Read, de-identify and write a single file.
+    With streaming, only the header is read and the pixel data is copied (see streaming).
+    With a pixel processor, burned-in annotations are blanked (see pixels).
+    With a pre-check policy, files which are already de-identified are copied (see copy_deidentified).
+    Rule sets replace the rule sets of the time shift (see DeidentifyDataset).
+    Errors are returned in the result, so that one bad file does not stop a run.
+    """
+    try:
+        os.makedirs(os.path.dirname(destination) or '.', exist_ok=True)
+        if precheck_policy is not None and copy_deidentified(source, destination, precheck_policy, lookup_factory,
+                                                             pixel_processor, rule_sets):
+            return FileResult(source, destination, skipped=True)
+        if streaming:
+            lookup = deidentify_file_streaming(source, destination, lookup_factory,
+                                               pixel_processor=pixel_processor, rule_sets=rule_sets)
+        else:
+            ds = dcmread(source)
+            lookup = lookup_factory(ds)
+            if lookup.filename is None:
+                lookup.filename = destination
+            deidentifier = DeidentifyDataset(lookup, pixel_processor=pixel_processor, rule_sets=rule_sets,
+                                             uid_key=factory_key(lookup_factory))
+            deid_ds, lookup = deidentifier.get_deid_dataset(ds, copy=False)
+            deid_ds.save_as(destination)
+    except Exception as e:
+        return FileResult(source, destination, error=f"{type(e).__name__}: {e}")
+    return FileResult(source, destination, lookup)
+
+
+def _deidentify_chunk(chunk: List[Tuple[str, str]],
+                      lookup_factory: Callable[[Dataset], LookupID],
+                      streaming: bool,
+                      pixel_processor: Optional[PixelProcessor] = None,
+                      precheck_policy: Optional[str] = None,
+                      rule_sets: Optional[tuple] = None) -> List[FileResult]:
+    """Worker task: de-identify a chunk of (source, destination) files."""
+    return [deidentify_file(source, destination, lookup_factory, streaming, pixel_processor, precheck_policy,
+                            rule_sets)
+            for source, destination in chunk]
+
+
+def iter_files(src: str) -> Iterator[str]:
+    """All files in the directory tree (sorted, DICOM files often have no extension)."""
+    for root, dirs, files in os.walk(src):
+        dirs.sort()
+        for name in sorted(files):
+            yield os.path.join(root, name)
+
+
+def _chunks(pairs: Iterable[Tuple[str, str]], chunksize: int) -> Iterator[List[Tuple[str, str]]]:
+    chunk = []
+    for pair in pairs:
+        chunk.append(pair)
+        if len(chunk) >= chunksize:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _run_chunks(executor: Executor, chunks: Iterable[List[Tuple[str, str]]],
+                lookup_factory: Callable[[Dataset], LookupID], streaming: bool,
+                ordered: bool, max_pending: int,
+                pixel_processor: Optional[PixelProcessor] = None,
+                precheck_policy: Optional[str] = None,
+                rule_sets: Optional[tuple] = None) -> Iterator[FileResult]:
+    """Submit chunks with at most max_pending chunks in flight and yield the results."""
+    pending: deque = deque()
+
+    def next_done() -> Future:
+        if ordered:
+            return pending.popleft()
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        future = done.pop()
+        pending.remove(future)
+        return future
+
+    for chunk in chunks:
+        pending.append(executor.submit(_deidentify_chunk, chunk, lookup_factory, streaming, pixel_processor,
+                                       precheck_policy, rule_sets))
+        if len(pending) >= max_pending:
+            yield from next_done().result()
+    while pending:
+        yield from next_done().result()
+
+
+def deidentify_directory(src: str, dst: str,
+                         workers: Optional[int] = None,
+                         lookup_factory: Optional[Callable[[Dataset], LookupID]] = None,
+                         ordered: bool = True,
+                         chunksize: int = 16,
+                         files: Optional[Iterable[str]] = None,
+                         streaming: bool = False,
+                         pixel_processor: Optional[PixelProcessor] = None,
+                         precheck_policy: Optional[str] = None,
+                         rule_sets: Optional[tuple] = None,
+                         ) -> Iterator[FileResult]:
+    """
+    De-identify all files of src and write them to the same relative path in dst.
+
+    :param src:             source directory
+    :param dst:             destination directory
+    :param workers:         number of worker processes (default: cpu count),
+                            0 to run in this process
+    :param lookup_factory:  creates the look-up for a data set, must be picklable
+                            (default: DerivedLookupFactory without time shift)
+    :param ordered:         yield results in file order (otherwise as they are done)
+    :param chunksize:       number of files per worker task
+    :param files:           files to de-identify (default: all files of src)
+    :param streaming:       read only the headers and copy the pixel data (see streaming)
+    :param pixel_processor: blanks burned-in annotations (see pixels), must be picklable
+    :param precheck_policy: copy already de-identified files (SKIP, VERIFY, see copy_deidentified)
+    :param rule_sets:       rule sets instead of the rule sets of the time shift (e.g. a tuned rule set),
+                            also to verify with, must be picklable
+    :return:                result per file (lazily, consume to run the pipeline)
+    """
+    if lookup_factory is None:
+        lookup_factory = DerivedLookupFactory()
+    if files is None:
+        files = iter_files(src)
+    pairs = ((source, str(Path(dst) / Path(source).relative_to(src))) for source in files)
+    chunks = _chunks(pairs, chunksize)
+
+    if workers == 0:
+        for chunk in chunks:
+            yield from _deidentify_chunk(chunk, lookup_factory, streaming, pixel_processor, precheck_policy,
+                                         rule_sets)
+        return
+
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from _run_chunks(executor, chunks, lookup_factory, streaming, ordered, max_pending=2 * workers,
+                               pixel_processor=pixel_processor, precheck_policy=precheck_policy,
+                               rule_sets=rule_sets)
@@ -0,0 +1,260 @@
+"""
+Pixel de-identification: blanking of burned-in annotations.
+
+Ultrasound, secondary capture and other images can have patient information
+burned into the pixels. A pixel location rule set (PixelLocation) gives the
+regions to blank for images of a modality, manufacturer, model and size.
+The PixelProcessor blanks the regions of the first matching location with
+NumPy slicing, frame by frame, so that only one frame is decoded at a time:
+
+- native pixel data is blanked in place in the bytes of each frame,
+- RLE Lossless pixel data is decoded, blanked and encoded one frame at a time,
+- other compressed transfer syntaxes cannot be re-encoded without loss,
+  a PixelScrubError is raised.
+
+DeidentifyDataset(lookup, pixel_processor=processor) blanks the pixel data and
+adds the Clean Pixel Data Option (113101) to the De-identification Method Code
+Sequence. The streaming de-identification blanks native pixel data while it is
+copied from the source to the destination file (see streaming).
+"""
+import io
+import json
+from dataclasses import dataclass, field
+from typing import BinaryIO, Iterator, List, Optional, Sequence, Tuple
+
+from pydicom import Sequence as DicomSequence
+from pydicom.dataset import Dataset, FileMetaDataset
+from pydicom.uid import RLELossless
+
+SUBSAMPLED = ('YBR_FULL_422', 'YBR_PARTIAL_422', 'YBR_PARTIAL_420')
+CLEAN_PIXEL_DATA_CODE = '113101'
+
+
+class PixelScrubError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class Region:
+    """Rectangle in pixels, from the top left corner of the image."""
+    x: int
+    y: int
+    width: int
+    height: int
+
+
+@dataclass
+class PixelLocation:
+    """
+    Regions to blank in the images which match all given criteria (None matches all).
+
+    :param regions:         rectangles to blank
+    :param modality:        Modality, e.g. 'US'
+    :param manufacturer:    Manufacturer (case insensitive)
+    :param model:           ManufacturerModelName (case insensitive)
+    :param rows:            Rows of the image
+    :param columns:         Columns of the image
+    """
+    regions: Tuple[Region, ...]
+    modality: Optional[str] = field(default=None)
+    manufacturer: Optional[str] = field(default=None)
+    model: Optional[str] = field(default=None)
+    rows: Optional[int] = field(default=None)
+    columns: Optional[int] = field(default=None)
+
+    def matches(self, ds: Dataset) -> bool:
+        criteria = ((self.modality, 'Modality', False), (self.manufacturer, 'Manufacturer', True),
+                    (self.model, 'ManufacturerModelName', True), (self.rows, 'Rows', False),
+                    (self.columns, 'Columns', False))
+        for expected, keyword, ignore_case in criteria:
+            if expected is None:
+                continue
+            value = ds.get(keyword)
+            if value is None:
+                return False
+            if ignore_case:
+                if str(value).strip().lower() != str(expected).strip().lower():
+                    return False
+            elif value != expected:
+                return False
+        return True
+
+
+def load_pixel_locations(path: str) -> List[PixelLocation]:
+    """
+    Pixel locations from a JSON file: a list of objects with the criteria of PixelLocation and
+    regions as a list of [x, y, width, height].
+    """
+    with open(path, encoding='utf-8') as fp:
+        entries = json.load(fp)
+    return [PixelLocation(regions=tuple(Region(*region) for region in entry.pop('regions')), **entry)
+            for entry in entries]
+
+
+@dataclass(frozen=True)
+class FrameFormat:
+    """Layout of the frames of the pixel data."""
+    rows: int
+    columns: int
+    samples: int
+    bits_allocated: int
+    bits_stored: int
+    signed: bool
+    photometric: str
+    planar: bool
+    frames: int
+    fill: int
+
+    @classmethod
+    def from_dataset(cls, ds: Dataset) -> 'FrameFormat':
+        bits_allocated = ds.BitsAllocated
+        bits_stored = ds.get('BitsStored', bits_allocated)
+        photometric = ds.get('PhotometricInterpretation', 'MONOCHROME2')
+        if bits_allocated % 8:
+            raise PixelScrubError(f"Cannot blank pixel data with {bits_allocated} bits allocated")
+        if photometric in SUBSAMPLED:
+            raise PixelScrubError(f"Cannot blank subsampled {photometric} pixel data")
+        signed = ds.get('PixelRepresentation', 0) == 1
+        fill = 0
+        if photometric == 'MONOCHROME1':  # 0 is white
+            fill = (1 << (bits_stored - 1)) - 1 if signed else (1 << bits_stored) - 1
+        return cls(ds.Rows, ds.Columns, ds.get('SamplesPerPixel', 1), bits_allocated, bits_stored, signed,
+                   photometric, ds.get('PlanarConfiguration', 0) == 1, int(ds.get('NumberOfFrames') or 1), fill)
+
+    @property
+    def frame_size(self) -> int:
+        return self.rows * self.columns * self.samples * self.bits_allocated // 8
+
+    def dtype(self, little_endian: bool = True) -> str:
+        return f"{'<' if little_endian else '>'}{'i' if self.signed else 'u'}{self.bits_allocated // 8}"
+
+    def frame_array(self, buffer, offset: int = 0, little_endian: bool = True, planar: Optional[bool] = None):
+        """Frame at offset of the buffer as array (a view, writable if the buffer is)."""
+        try:
+            import numpy
+        except ImportError as e:
+            raise ImportError("Pixel blanking needs numpy: pip install dicomdeidentifier[pixels]") from e
+
+        arr = numpy.frombuffer(buffer, self.dtype(little_endian), self.rows * self.columns * self.samples, offset)
+        if self.samples == 1:
+            return arr.reshape(self.rows, self.columns)
+        if self.planar if planar is None else planar:
+            return arr.reshape(self.samples, self.rows, self.columns)
+        return arr.reshape(self.rows, self.columns, self.samples)
+
+    def frame_dataset(self, pixel_data: bytes, transfer_syntax: str = RLELossless) -> Dataset:
+        """Data set of a single (encapsulated) frame, to decode it with pixel_array."""
+        ds = Dataset()
+        ds.file_meta = FileMetaDataset()
+        ds.file_meta.TransferSyntaxUID = transfer_syntax
+        ds.is_little_endian, ds.is_implicit_VR = True, False
+        ds.Rows, ds.Columns, ds.SamplesPerPixel = self.rows, self.columns, self.samples
+        ds.BitsAllocated, ds.BitsStored, ds.HighBit = self.bits_allocated, self.bits_stored, self.bits_stored - 1
+        ds.PixelRepresentation = int(self.signed)
+        ds.PhotometricInterpretation = self.photometric
+        if self.samples > 1:
+            ds.PlanarConfiguration = int(self.planar)
+        ds.NumberOfFrames = 1
+        ds.PixelData = pixel_data
+        return ds
+
+    def blank(self, arr, regions: Sequence[Region], planar: Optional[bool] = None) -> None:
+        """Set the regions of a frame array to the fill value."""
+        planar = self.planar if planar is None else planar
+        for region in regions:
+            rows = slice(max(region.y, 0), min(region.y + region.height, self.rows))
+            columns = slice(max(region.x, 0), min(region.x + region.width, self.columns))
+            if self.samples > 1 and planar:
+                arr[:, rows, columns] = self.fill
+            else:
+                arr[rows, columns] = self.fill
+
+
+def mark_clean_pixels(ds: Dataset) -> None:
+    """Add the Clean Pixel Data Option to the De-identification Method Code Sequence."""
+    code = Dataset()
+    code.CodeValue = CLEAN_PIXEL_DATA_CODE
+    codes = list(ds.get('DeidentificationMethodCodeSequence', []))
+    codes.append(code)
+    ds.DeidentificationMethodCodeSequence = DicomSequence(codes)
+    ds.BurnedInAnnotation = 'NO'
+
+
+def has_clean_pixels(ds: Dataset) -> bool:
+    """True if the Clean Pixel Data Option is in the De-identification Method Code Sequence."""
+    return any(code.get('CodeValue') == CLEAN_PIXEL_DATA_CODE
+               for code in ds.get('DeidentificationMethodCodeSequence', []))
+
+
+@dataclass
+class PixelProcessor:
+    """
+    Blanks the regions of the first matching pixel location (see module).
+
+    :param locations:   pixel location rule set
+    """
+    locations: Sequence[PixelLocation] = field(default_factory=list)
+
+    def regions(self, ds: Dataset) -> Tuple[Region, ...]:
+        """Regions to blank in the data set (of the original header), empty if no location matches."""
+        for location in self.locations:
+            if location.matches(ds):
+                return location.regions
+        return ()
+
+    def process(self, ds: Dataset) -> bool:
+        """Blank the pixel data of the data set in place, True if regions were blanked."""
+        regions = self.regions(ds)
+        if not regions or 'PixelData' not in ds:
+            return False
+        frame_format = FrameFormat.from_dataset(ds)
+        transfer_syntax = getattr(ds, 'file_meta', Dataset()).get('TransferSyntaxUID')
+        if transfer_syntax is None or not transfer_syntax.is_compressed:
+            little_endian = getattr(ds, 'is_little_endian', None) is not False
+            ds.PixelData = self.blank_native(ds.PixelData, frame_format, regions, little_endian)
+        elif transfer_syntax == RLELossless:
+            ds.PixelData = self.blank_rle(ds.PixelData, frame_format, regions)
+        else:
+            raise PixelScrubError(f"Cannot blank pixel data compressed with {transfer_syntax.name}")
+        return True
+
+    @classmethod
+    def blank_native(cls, data: bytes, frame_format: FrameFormat, regions: Sequence[Region],
+                     little_endian: bool = True) -> bytes:
+        """
+        Blank native pixel data frame by frame. Only one frame is copied at a time: the blanked frames are
+        written to a BytesIO, whose value is returned without a further copy of the whole pixel data.
+        """
+        blanked = io.BytesIO()
+        for frame in cls.iter_blanked_frames(io.BytesIO(data), frame_format, regions, little_endian):
+            blanked.write(frame)
+        blanked.write(data[frame_format.frames * frame_format.frame_size:])  # padding
+        return blanked.getvalue()
+
+    @staticmethod
+    def blank_rle(data: bytes, frame_format: FrameFormat, regions: Sequence[Region]) -> bytes:
+        """Decode, blank and encode RLE Lossless pixel data one frame at a time."""
+        from pydicom.encaps import encapsulate, generate_pixel_data_frame
+        from pydicom.encoders import RLELosslessEncoder
+
+        encoded = []
+        for frame in generate_pixel_data_frame(data, frame_format.frames):
+            arr = frame_format.frame_dataset(encapsulate([frame])).pixel_array
+            frame_format.blank(arr, regions, planar=False)
+            encoded.append(RLELosslessEncoder.encode(
+                arr, encoding_plugin='pydicom', rows=frame_format.rows, columns=frame_format.columns,
+                samples_per_pixel=frame_format.samples, bits_allocated=frame_format.bits_allocated,
+                bits_stored=frame_format.bits_stored, pixel_representation=int(frame_format.signed),
+                photometric_interpretation=frame_format.photometric, number_of_frames=1))
+        return encapsulate(encoded, has_bot=True)
+
+    @staticmethod
+    def iter_blanked_frames(fp: BinaryIO, frame_format: FrameFormat, regions: Sequence[Region],
+                            little_endian: bool = True) -> Iterator[bytearray]:
+        """Read native frames from a file and yield them blanked, one at a time."""
+        for _ in range(frame_format.frames):
+            buffer = bytearray(fp.read(frame_format.frame_size))
+            if len(buffer) < frame_format.frame_size:
+                raise EOFError("Source file ended before the end of the pixel data")
+            frame_format.blank(frame_format.frame_array(buffer, little_endian=little_endian), regions)
+            yield buffer
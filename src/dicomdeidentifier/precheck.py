@@ -0,0 +1,129 @@
+"""
+Pre-check of already de-identified files.
+
+Re-runs and mixed archives have files which are already de-identified
+(PatientIdentityRemoved YES and the Basic Application Confidentiality Profile
+code 113100 in the De-identification Method Code Sequence, as written by
+get_deid_dataset). The pre-check reads only the header up to the
+De-identification Method Code Sequence (0012,0064), keeping only the tags it
+needs, and decides per policy:
+
+- SKIP: already de-identified files are not de-identified again,
+- VERIFY: already de-identified files are not de-identified again if their
+  header (read without pixel data) has no element the rules remove or empty
+  and no private element the private tag policy removes (the header padding of
+  the in-place de-identification is allowed),
+- REPROCESS: all files are de-identified.
+
+Burned-in annotations are not checked here, see copy_deidentified of pipeline.
+"""
+from typing import BinaryIO, List, Optional, Union
+
+from pydicom import dcmread
+from pydicom.dataset import Dataset
+from pydicom.filereader import read_partial
+from pydicom.tag import BaseTag, Tag
+
+from . import rule_sets
+from .core_registry import get_compiled_rules
+from .dispatch import PIXEL_DATA_TAG, CompiledRuleSet
+from .private_tags import PADDING_CREATOR, PADDING_GROUP, PrivateTagPolicy
+
+SKIP = 'skip'
+VERIFY = 'verify'
+REPROCESS = 'reprocess'
+POLICIES = (SKIP, VERIFY, REPROCESS)
+
+BASIC_PROFILE_CODE = '113100'
+DEID_TAGS = [Tag(0x00120062), Tag(0x00120063), Tag(0x00120064)]  # identity removed, method, method codes
+LAST_DEID_TAG = 0x00120064
+
+
+def _past_deid_tags(tag: BaseTag, vr: Optional[str], length: int) -> bool:
+    return tag > LAST_DEID_TAG
+
+
+def read_deid_header(source: Union[str, BinaryIO]) -> Dataset:
+    """
+    The de-identification elements of a file: reading stops after (0012,0064), other elements are not kept.
+    """
+    if isinstance(source, str):
+        with open(source, 'rb') as fp:
+            return read_partial(fp, stop_when=_past_deid_tags, specific_tags=DEID_TAGS)
+    return read_partial(source, stop_when=_past_deid_tags, specific_tags=DEID_TAGS)
+
+
+def is_deidentified(ds: Dataset) -> bool:
+    """True if the data set says it was de-identified with the basic profile (as get_deid_dataset writes)."""
+    if ds.get('PatientIdentityRemoved') != 'YES':
+        return False
+    return any(code.get('CodeValue') == BASIC_PROFILE_CODE for code in ds.get('DeidentificationMethodCodeSequence', []))
+
+
+def verify_header(ds: Dataset, compiled: Optional[CompiledRuleSet] = None,
+                  private_policy: Optional[PrivateTagPolicy] = None) -> List[str]:
+    """
+    Elements of the data set (also in kept sequences) which the rules remove or empty, or which are
+    private tags the private tag policy removes. Empty if the header looks de-identified.
+
+    Rules which replace values (e.g. dummy values) cannot be verified and are not checked.
+    The header padding of the in-place de-identification (see inplace) is no problem.
+    :param compiled:        compiled rules, default: the time-shift rule set
+    :param private_policy:  private tags to keep, default: none
+    """
+    if compiled is None:
+        compiled = get_compiled_rules(rule_sets.timeshift_custom_ruleset)
+    safe = tuple(private_policy.safe) if private_policy is not None else ()
+    private_policy = PrivateTagPolicy(safe + ((PADDING_GROUP, PADDING_CREATOR, None),))
+    problems: List[str] = []
+    _verify(ds, compiled, private_policy, problems)
+    return problems
+
+
+def _verify(ds: Dataset, compiled: CompiledRuleSet, private_policy: PrivateTagPolicy, problems: List[str]) -> None:
+    from idiscore.operators import Empty, Keep, Remove
+
+    creators: dict = {}
+    for element in ds:
+        tag = element.tag
+        if tag == PIXEL_DATA_TAG:
+            continue
+        if tag.is_private:
+            if not private_policy.keep_private(element, creators):
+                problems.append(f"{tag} private")
+            continue
+        operator = compiled.get_operator(tag)
+        operator_type = type(operator)
+        if element.VR == 'SQ' and (operator is None or operator_type is Keep):
+            for item in element.value:
+                _verify(item, compiled, private_policy, problems)
+        elif operator_type is Remove:
+            problems.append(f"{tag} not removed")
+        elif operator_type is Empty and element.value not in (None, '', b'', []):
+            problems.append(f"{tag} not empty")
+
+
+def precheck(source: Union[str, BinaryIO], policy: str = SKIP, compiled: Optional[CompiledRuleSet] = None,
+             private_policy: Optional[PrivateTagPolicy] = None) -> bool:
+    """
+    True if the file does not need to be de-identified (again) with the policy (see module).
+
+    :param source:          file path or binary file object (at the start of the file)
+    :param policy:          SKIP, VERIFY or REPROCESS
+    :param compiled:        compiled rules to verify with, default: the time-shift rule set
+    :param private_policy:  private tags to keep when verifying, default: none
+    """
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown pre-check policy {policy!r}, use one of {', '.join(POLICIES)}")
+    if policy == REPROCESS:
+        return False
+
+    start = source.tell() if not isinstance(source, str) else 0
+    if not is_deidentified(read_deid_header(source)):
+        return False
+    if policy == SKIP:
+        return True
+
+    if not isinstance(source, str):
+        source.seek(start)
+    return not verify_header(dcmread(source, stop_before_pixels=True), compiled, private_policy)
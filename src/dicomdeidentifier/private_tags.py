@@ -0,0 +1,101 @@
+"""
+Private tag policy.
+
+Private tags are removed, except the elements of safelisted private creators
+(Retain Safe Private Option of DICOM PS 3.15, e.g. diffusion parameters).
+The safelist is compiled once into an index of (group, private creator) to the
+kept element offsets, so that a data set is cleaned in a single walk, which
+also counts the removed elements.
+"""
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, Iterable, Optional, Tuple
+
+from pydicom.dataelem import DataElement
+from pydicom.dataset import Dataset
+
+# (group, private creator, element offsets) of the diffusion parameters
+# in the safe private attributes of DICOM PS 3.15 (table E.3.10-1)
+DIFFUSION_SAFE_PRIVATE_TAGS = (
+    (0x0019, 'SIEMENS MR HEADER', (0x0C, 0x0D, 0x0E, 0x27)),  # b-value, directionality, direction, b-matrix
+    (0x0043, 'GEMS_PARM_01', (0x39,)),  # b-value
+    (0x2001, 'Philips Imaging DD 001', (0x03,)),  # diffusion b-factor
+)
+# private block which fills up a smaller de-identified header (see inplace)
+PADDING_GROUP = 0x7FDF
+PADDING_CREATOR = 'DEIDENTIFIER PADDING'
+
+
+@dataclass
+class PrivateTagPolicy:
+    """
+    Private creators, whose elements are kept. All other private elements are removed.
+
+    The safe list holds (group, private creator, element offsets) entries,
+    offsets None to keep all elements of the private creator.
+    Without safe list (the default) all private tags are removed.
+    """
+    safe: Iterable[Tuple[int, str, Optional[Iterable[int]]]] = field(default=())
+    index: Dict[Tuple[int, str], Optional[FrozenSet[int]]] = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.index = {}
+        for group, creator, offsets in self.safe:
+            key = (group, creator.strip())
+            if offsets is None or (key in self.index and self.index[key] is None):
+                self.index[key] = None
+            else:
+                self.index[key] = self.index.get(key, frozenset()) | frozenset(offsets)
+
+    @property
+    def retains_private(self) -> bool:
+        """True if any private element can be kept."""
+        return bool(self.index)
+
+    def is_safe(self, group: int, creator: Optional[str], offset: int) -> bool:
+        """True if the element offset of the private creator in the group is kept."""
+        if creator is None:
+            return False
+        key = (group, creator)
+        if key not in self.index:
+            return False
+        offsets = self.index[key]
+        return offsets is None or offset in offsets
+
+    def keep_private(self, element: DataElement, creators: Dict[Tuple[int, int], str]) -> bool:
+        """
+        True if the private element is kept. Kept private creators are added to creators
+        ((group, block) -> private creator of one data set), since the creators
+        (gggg,0010-00FF) come before their blocks (gggg,1000-FFFF).
+        """
+        tag = element.tag
+        group, number = tag >> 16, tag & 0xFFFF
+        if 0x0010 <= number <= 0x00FF:
+            creator = element.value.strip() if isinstance(element.value, str) else None
+            if creator is not None and (group, creator) in self.index:
+                creators[group, number] = creator
+                return True
+            return False
+        return number >= 0x1000 and self.is_safe(group, creators.get((group, number >> 8)), number & 0xFF)
+
+    def remove_private_tags(self, ds: Dataset) -> int:
+        """
+        Remove the private elements which are not safe, also in sequences.
+
+        Private creators of kept elements are kept, too. A removed private
+        sequence is counted as one element.
+        :return:    number of removed elements
+        """
+        removed = []
+        creators: Dict[Tuple[int, int], str] = {}
+        count = 0
+        for element in ds:
+            if element.tag.is_private and not self.keep_private(element, creators):
+                removed.append(element.tag)
+                continue
+            if element.VR == 'SQ':
+                for item in element.value:
+                    count += self.remove_private_tags(item)
+
+        for tag in removed:
+            del ds[tag]
+        return count + len(removed)
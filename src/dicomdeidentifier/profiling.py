@@ -0,0 +1,174 @@
+"""
+Rule set profiling.
+
+Which rules of the rule sets (see rule_sets) fire on our data, and what does
+their evaluation cost? RuleProfiler walks a batch of data sets (read only, also
+in nested sequences) and counts per rule how often it matches, and per rule kind
+(operator: Remove, Empty, Replace, ...) the elements and the time of the look-up
+in the compiled rule sets (see dispatch) and evaluation. Sequences are counted like other elements; like in the
+de-identification (see traversal), only the items of kept sequences (or without
+a rule) are walked. Tags without a rule are counted, too; private tags are not,
+they are handled by the private tag policy (see private_tags).
+
+The profile gives a report (text or dict) and a tuned rule set: the rules
+ordered by their hits, optionally without the rules that never fired. Pruning is
+only safe if the corpus is representative, since an element of a pruned rule is
+kept as is. DeidentifyDataset(lookup, rule_sets=(tuned,)) uses it.
+"""
+import time
+from collections import Counter
+from copy import copy
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple
+
+from pydicom.dataset import Dataset
+from pydicom.tag import Tag
+
+from .core_registry import get_compiled_rules
+from .deidentify_dicom import get_active_rule_sets
+from .dispatch import PIXEL_DATA_TAG
+
+if TYPE_CHECKING:
+    from idiscore.rules import Rule, RuleSet
+
+NO_RULE = 'no rule'
+
+
+@dataclass
+class KindStatistics:
+    """Elements and seconds of look-up and evaluation of a rule kind."""
+    elements: int = field(default=0)
+    seconds: float = field(default=0.0)
+
+    @property
+    def mean_us(self) -> float:
+        return self.seconds / self.elements * 1e6 if self.elements else 0.0
+
+
+@dataclass
+class RuleProfile:
+    """Counts of a profiling run (see RuleProfiler)."""
+    rules: Dict[str, 'Rule']
+    hits: Counter = field(default_factory=Counter)
+    kinds: Dict[str, KindStatistics] = field(default_factory=dict)
+    unmatched: Counter = field(default_factory=Counter)
+    datasets: int = field(default=0)
+    elements: int = field(default=0)
+    private: int = field(default=0)
+
+    @property
+    def dead_rules(self) -> List[str]:
+        """Keys of the rules which never fired."""
+        return [key for key in self.rules if not self.hits[key]]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'datasets': self.datasets,
+                'elements': self.elements,
+                'private': self.private,
+                'kinds': {kind: {'elements': statistics.elements, 'seconds': statistics.seconds}
+                          for kind, statistics in self.kinds.items()},
+                'hits': {key: self.hits[key] for key in self.rules},
+                'dead_rules': self.dead_rules,
+                'unmatched': {str(Tag(tag)): number for tag, number in self.unmatched.most_common()}}
+
+    def report(self, top: int = 20) -> str:
+        """Text report: rule kinds by time, the most frequent rules, dead rules and tags without a rule."""
+        lines = [f"{self.datasets} data sets, {self.elements} elements, {self.private} private elements",
+                 "", f"{'rule kind':<20}{'elements':>12}{'seconds':>12}{'mean us':>10}"]
+        for kind, statistics in sorted(self.kinds.items(), key=lambda item: -item[1].seconds):
+            lines.append(f"{kind:<20}{statistics.elements:>12}{statistics.seconds:>12.4f}{statistics.mean_us:>10.1f}")
+
+        dead = self.dead_rules
+        lines += ["", f"{len(self.rules)} rules, {len(self.rules) - len(dead)} fired, {len(dead)} dead", "",
+                  "most frequent rules:"]
+        for key, number in self.hits.most_common(top):
+            lines.append(f"  {key:<24}{self.rules[key].operation!s:<12}{number:>10}")
+        lines += ["", "dead rules:"] + [f"  {key:<24}{self.rules[key].operation!s}" for key in dead]
+        lines += ["", "most frequent tags without a rule:"]
+        lines += [f"  {Tag(tag)!s:<24}{number:>10}" for tag, number in self.unmatched.most_common(top)]
+        return '\n'.join(lines) + '\n'
+
+    def tuned_rule_set(self, prune: bool = False, name: Optional[str] = None) -> 'RuleSet':
+        """
+        One rule set with the rules ordered by hits (most frequent first), without the dead rules if prune.
+        """
+        from .rule_definitions import DeclaredRuleSet
+
+        keys = sorted(self.rules, key=lambda key: -self.hits[key])
+        if prune:
+            keys = [key for key in keys if self.hits[key]]
+        return DeclaredRuleSet([self.rules[key] for key in keys], name=name or 'Tuned RuleSet')
+
+
+class RuleProfiler:
+    """
+    Counts the rule hits and times the rule kinds over data sets (see module).
+
+    :param rule_sets:   rule sets to profile (later overrule previous), default: the rule sets of
+                        the de-identification for the time shift
+    :param time_shift:  time shift for the default rule sets
+    """
+
+    def __init__(self, rule_sets: Optional[Tuple['RuleSet', ...]] = None, time_shift: Optional[int] = None):
+        if rule_sets is None:
+            rule_sets = get_active_rule_sets(time_shift)
+        self.compiled = get_compiled_rules(*rule_sets)
+        self.profile = RuleProfile(dict(self.compiled.rules))
+
+    def add(self, ds: Dataset) -> None:
+        """Profile a data set (not changed)."""
+        self.profile.datasets += 1
+        self.walk(ds, ds)
+
+    def walk(self, ds: Dataset, root: Dataset) -> None:
+        from idiscore.operators import ElementShouldBeRemoved, Empty, Keep, Remove
+
+        profile = self.profile
+        for element in ds:
+            tag = element.tag
+            if tag == PIXEL_DATA_TAG:
+                continue
+            profile.elements += 1
+            if tag.is_private:
+                profile.private += 1
+                continue
+
+            start = time.perf_counter()
+            operator = self.compiled.get_operator(tag)
+            if operator is None:
+                kind = NO_RULE
+                profile.unmatched[int(tag)] += 1
+            else:
+                kind = type(operator).__name__
+                profile.hits[self.compiled.get_rule_key(tag)] += 1
+                if type(operator) not in (Keep, Remove, Empty):
+                    try:
+                        operator.apply(copy(element), root)
+                    except (ElementShouldBeRemoved, AttributeError, ValueError):
+                        pass
+            statistics = profile.kinds.get(kind)
+            if statistics is None:
+                statistics = profile.kinds[kind] = KindStatistics()
+            statistics.elements += 1
+            statistics.seconds += time.perf_counter() - start
+
+            # like the de-identification, only the items of kept sequences are walked
+            if element.VR == 'SQ' and (operator is None or type(operator) is Keep):
+                for item in element.value:
+                    self.walk(item, root)
+
+
+def profile_rules(datasets: Iterable[Dataset], rule_sets: Optional[Tuple['RuleSet', ...]] = None,
+                  time_shift: Optional[int] = None) -> RuleProfile:
+    """
+    Profile the rule sets over data sets (see RuleProfiler).
+
+    :param datasets:    data sets to profile (e.g. a generator reading files)
+    :param rule_sets:   rule sets to profile, default: the rule sets of the de-identification
+    :param time_shift:  time shift for the default rule sets
+    :return:            profile with the report and the tuned rule set
+    """
+    profiler = RuleProfiler(rule_sets, time_shift)
+    for ds in datasets:
+        profiler.add(ds)
+    return profiler.profile
@@ -0,0 +1,223 @@
+"""
+Series-level de-identification.
+
+The instances of a series (e.g. thousands of CT slices) have almost the same
+header, only a few elements differ (InstanceNumber, SOPInstanceUID,
+ImagePositionPatient, ...). The first instance of a series is de-identified
+fully (get_deid_dataset) and is the template of the series. The other
+instances are compared element by element with the template: elements equal to
+the template get the de-identified element of the template, only the differing
+elements are de-identified (rules, date shift and UID remapping, see traversal).
+
+An instance is de-identified fully if its look-up differs from the template
+(other de-identified ids or time shift) or if it differs from the template in a
+private element, a sequence or an element with a rule which creates a value
+(e.g. a dummy value), since these need the whole data set.
+Elements replaced by a dummy value get the dummy value of the template, the
+same for all instances of the series.
+"""
+from collections import OrderedDict
+from copy import copy, deepcopy
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+from pydicom import FileDataset, Sequence
+from pydicom.dataelem import DataElement
+from pydicom.dataset import Dataset
+from pydicom.multival import MultiValue
+
+from .batch import UIDMapping, default_lookup_factory
+from .core_registry import get_compiled_rules
+from .deidentify_dicom import INSTANCE_UID_KEYWORDS, DeidentifyDataset, LookupID, get_active_rule_sets
+from .dispatch import PIXEL_DATA_TAG, CompiledRuleSet
+from .private_tags import PrivateTagPolicy
+from .timeshift import TimeShiftProvider
+from .traversal import Traversal
+
+SOP_INSTANCE_UID_TAG = 0x00080018
+# templates kept (the instances of a series usually come one after the other)
+MAX_PLANS = 16
+
+
+def _copy_element(element: DataElement) -> DataElement:
+    """
+    Copy of a de-identified template element: values of multi-valued elements and the items of
+    sequences are copied (faster than deepcopy, the values themselves are immutable).
+    """
+    copied = copy(element)  # no value conversion, unlike a new DataElement
+    if element.VR == 'SQ':
+        copied.value = Sequence([_copy_dataset(item) for item in element.value])
+    elif isinstance(element.value, MultiValue):
+        copied.value = list(element.value)
+    return copied
+
+
+def _copy_dataset(ds: Dataset) -> Dataset:
+    item = Dataset()
+    for element in ds:
+        item.add(_copy_element(element))
+    return item
+
+
+def _lookup_key(lookup: LookupID) -> tuple:
+    return lookup.deid_patient_id, lookup.deid_study_uid, lookup.deid_series_uid, lookup.time_shift
+
+
+@dataclass
+class SeriesPlan:
+    """
+    Template of a series: original and de-identified elements of its first instance (without pixel data).
+
+    :param lookup_key:          de-identified ids and time shift of the template look-up
+    :param original:            original elements by tag
+    :param deidentified:        de-identified elements by tag
+    :param compiled:            compiled rules of the template
+    :param nested_private_removed: private elements removed in sequences of the template
+    """
+    lookup_key: tuple
+    original: Dict[int, DataElement]
+    deidentified: Dict[int, DataElement]
+    compiled: CompiledRuleSet
+    nested_private_removed: int = field(default=0)
+
+    @classmethod
+    def from_template(cls, ds: Dataset, deid_ds: Dataset, lookup: LookupID) -> 'SeriesPlan':
+        original = {element.tag: element for element in ds if element.tag != PIXEL_DATA_TAG}
+        deidentified = {element.tag: element for element in deid_ds if element.tag != PIXEL_DATA_TAG}
+        top_private_removed = sum(1 for tag in original if tag.is_private and tag not in deidentified)
+        return cls(_lookup_key(lookup), original, deidentified, get_compiled_rules(*get_active_rule_sets(lookup.time_shift)),
+                   lookup.private_tags_removed - top_private_removed)
+
+    def is_simple(self, element: DataElement) -> bool:
+        """True if the element can be de-identified without the data set."""
+        from idiscore.operators import Empty, Keep, Remove
+
+        if element.tag.is_private or element.VR == 'SQ':
+            return False
+        operator = self.compiled.get_operator(element.tag)
+        return operator is None or type(operator) in (Empty, Keep, Remove)
+
+
+@dataclass
+class SeriesDeidentifier:
+    """
+    De-identifies data sets with a template per series (see module).
+
+    The ids of the instances are consistent like in deidentify_batch (shared mapping).
+    Counts the instances de-identified with a template (planned) and fully (full).
+
+    :param lookup_factory:      creates the look-up for a data set
+    :param uid_key:             key to derive the de-identified UIDs (see DeidentifyDataset)
+    :param private_policy:      private tags to keep
+    :param time_shift_provider: time shift per patient for look-ups without one (see timeshift)
+    :param mapping:             shared id mapping, a new one if not given
+    :param max_plans:           number of series templates kept (least recently used are dropped)
+    """
+    lookup_factory: Callable[[Dataset], LookupID] = field(default=default_lookup_factory)
+    uid_key: Optional[bytes] = field(default=None)
+    private_policy: PrivateTagPolicy = field(default_factory=PrivateTagPolicy)
+    time_shift_provider: Optional[TimeShiftProvider] = field(default=None)
+    mapping: UIDMapping = field(default_factory=UIDMapping)
+    max_plans: int = field(default=MAX_PLANS)
+    plans: 'OrderedDict[str, SeriesPlan]' = field(default_factory=OrderedDict)
+    planned: int = field(default=0)
+    full: int = field(default=0)
+
+    def deidentifier(self, lookup: LookupID) -> DeidentifyDataset:
+        return DeidentifyDataset(lookup, uid_key=self.uid_key, private_policy=self.private_policy,
+                                 time_shift_provider=self.time_shift_provider)
+
+    def deidentify(self, ds: Dataset) -> Tuple[FileDataset, LookupID]:
+        """De-identify a data set (not changed), with the template of its series if possible."""
+        lookup = self.mapping.fill(self.lookup_factory(ds), ds)
+        if lookup.time_shift is None and self.time_shift_provider is not None:
+            lookup.time_shift = self.time_shift_provider.get(ds.get('PatientID'))
+        series = ds.get('SeriesInstanceUID')
+        plan = self.plans.get(str(series)) if series else None
+        if plan is not None:
+            self.plans.move_to_end(str(series))
+
+        if plan is not None and plan.lookup_key == _lookup_key(lookup):
+            result = self.apply_plan(plan, ds, lookup)
+            if result is not None:
+                self.planned += 1
+                return result
+
+        self.full += 1
+        deid_ds, lookup = self.deidentifier(lookup).get_deid_dataset(ds)
+        if series and plan is None:
+            self.plans[str(series)] = SeriesPlan.from_template(ds, deid_ds, lookup)
+            if len(self.plans) > self.max_plans:
+                self.plans.popitem(last=False)
+        return deid_ds, lookup
+
+    def apply_plan(self, plan: SeriesPlan, ds: Dataset, lookup: LookupID) -> Optional[Tuple[FileDataset, LookupID]]:
+        """De-identify a data set with the template, None if it differs in an element which is not simple."""
+        differing = Dataset()
+        result = Dataset()
+        private_removed = 0
+        for element in ds:
+            tag = element.tag
+            if tag == PIXEL_DATA_TAG:
+                result.add(element)
+                continue
+            if tag == SOP_INSTANCE_UID_TAG:
+                continue
+            if plan.original.get(tag) == element:
+                deid_element = plan.deidentified.get(tag)
+                if deid_element is not None:
+                    result.add(_copy_element(deid_element))
+                elif tag.is_private:
+                    private_removed += 1
+            elif plan.is_simple(element):
+                differing.add(deepcopy(element))
+            else:
+                return None
+
+        # elements added by the de-identification (ids, de-identification method)
+        for tag, deid_element in plan.deidentified.items():
+            if tag not in plan.original and tag not in result:
+                result.add(_copy_element(deid_element))
+
+        deidentifier = self.deidentifier(lookup)
+        original_sop = ds.get('SOPInstanceUID')
+        if lookup.deid_sop_uid is None:
+            lookup.deid_sop_uid = deidentifier.new_uid(original_sop)
+        result.SOPInstanceUID = lookup.deid_sop_uid
+
+        uid_map = {}
+        for keyword in INSTANCE_UID_KEYWORDS:
+            original, deid_uid = ds.get(keyword), result.get(keyword)
+            if deid_uid:
+                uid_map[deid_uid] = deid_uid
+                if original:
+                    uid_map[original] = deid_uid
+        Traversal(plan.compiled, lookup.time_shift, uid_map, self.uid_key, self.private_policy).walk(differing)
+        for element in differing:
+            result.add(element)
+
+        lookup.private_tags_removed = private_removed + plan.nested_private_removed
+        lookup.private_tags = lookup.private_tags_removed > 0
+
+        file_meta = deepcopy(ds.file_meta)
+        file_meta.MediaStorageSOPInstanceUID = result.SOPInstanceUID
+        deid_ds = FileDataset(lookup.filename, result, getattr(ds, 'preamble', None), file_meta,
+                              getattr(ds, 'is_implicit_VR', True), getattr(ds, 'is_little_endian', True))
+        return deid_ds, lookup
+
+
+def deidentify_series(datasets: Iterable[Dataset],
+                      lookup_factory: Callable[[Dataset], LookupID] = default_lookup_factory,
+                      uid_key: Optional[bytes] = None,
+                      ) -> Iterator[Tuple[FileDataset, LookupID]]:
+    """
+    De-identify data sets one by one (lazily), with a template per series (see module).
+
+    :param datasets:        data sets to de-identify (e.g. the files of a series)
+    :param lookup_factory:  creates the look-up for a data set
+    :param uid_key:         key to derive the de-identified UIDs
+    :return:                de-identified file data set and look-up per data set
+    """
+    deidentifier = SeriesDeidentifier(lookup_factory, uid_key)
+    for ds in datasets:
+        yield deidentifier.deidentify(ds)
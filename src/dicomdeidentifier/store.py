@@ -0,0 +1,196 @@
+"""
+Persistent look-up store.
+
+Keeps the original to de-identified patient ids, study and series UIDs and the
+time shift per patient, so that instances de-identified later (or by another
+run) get the same ids. DeidentifyDataset(lookup, store=store) fills the missing
+ids of the look-up from the store, new ids are created and stored.
+
+The store has an in-memory LRU cache in front of the backend, new entries are
+written in batches (one transaction per batch_size entries), and the first
+instance of a study loads all mappings of the study (and its patient) in one
+query, so there is no database round trip per instance.
+
+SQLiteLookupStore is the default backend. Other backends implement load_study,
+load and save. With several processes writing to the same store, use a uid_key
+(see uids), so that all processes derive the same ids.
+"""
+import sqlite3
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Optional, Tuple
+
+from pydicom.dataset import Dataset
+from pydicom.uid import generate_uid
+
+from .uids import keyed_id, keyed_uid
+
+if TYPE_CHECKING:
+    from .deidentify_dicom import LookupID
+
+PATIENT = 'patient'
+STUDY = 'study'
+SERIES = 'series'
+TIME_SHIFT = 'time_shift'
+
+CACHE_SIZE = 100000
+BATCH_SIZE = 500
+
+# kind, original, de-identified value, original study UID
+Row = Tuple[str, str, str, Optional[str]]
+
+
+class LookupStore(ABC):
+    """
+    Base of the look-up stores: LRU cache, batched writes and study preloading.
+    """
+
+    def __init__(self, cache_size: int = CACHE_SIZE, batch_size: int = BATCH_SIZE):
+        self.cache_size = cache_size
+        self.batch_size = batch_size
+        self.cache: 'OrderedDict[Tuple[str, str], str]' = OrderedDict()
+        self.pending: Dict[Tuple[str, str], Row] = {}
+        self.lock = threading.RLock()
+
+    @abstractmethod
+    def load_study(self, study: str, patient: Optional[str]) -> Iterable[Tuple[str, str, str]]:
+        """(kind, original, de-identified value) of the study, its series and its patient."""
+
+    @abstractmethod
+    def load(self, kind: str, original: str) -> Optional[str]:
+        """The stored de-identified value, None if there is none."""
+
+    @abstractmethod
+    def save(self, rows: List[Row]) -> None:
+        """Store the rows in one transaction, existing entries are kept."""
+
+    def _cache(self, kind: str, original: str, value: str) -> None:
+        self.cache[kind, original] = value
+        self.cache.move_to_end((kind, original))
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def get(self, kind: str, original: str) -> Optional[str]:
+        """De-identified value of an original id (from the cache if possible)."""
+        with self.lock:
+            value = self.cache.get((kind, original))
+            if value is not None:
+                self.cache.move_to_end((kind, original))
+                return value
+            row = self.pending.get((kind, original))
+            value = row[2] if row is not None else self.load(kind, original)
+            if value is not None:
+                self._cache(kind, original, value)
+            return value
+
+    def put(self, kind: str, original: str, value: str, study: Optional[str] = None) -> None:
+        """Store a de-identified value (written with the next batch)."""
+        with self.lock:
+            self._cache(kind, original, value)
+            self.pending.setdefault((kind, original), (kind, original, value, study))
+            if len(self.pending) >= self.batch_size:
+                self.flush()
+
+    def preload(self, study: str, patient: Optional[str] = None) -> None:
+        """Load all mappings of a study and its patient into the cache, in one query."""
+        with self.lock:
+            for kind, original, value in self.load_study(study, patient):
+                self._cache(kind, original, value)
+
+    def flush(self) -> None:
+        """Write the pending entries."""
+        with self.lock:
+            if self.pending:
+                self.save(list(self.pending.values()))
+                self.pending = {}
+
+    def _resolve(self, kind: str, original, value: Optional[str], study: Optional[str],
+                 create: Callable[[str], str]) -> Optional[str]:
+        if not original:
+            return value  # nothing to map, de-identifier creates a new one
+        original = str(original)
+        stored = self.get(kind, original)
+        if stored is not None:
+            return stored
+        if value is None:
+            value = create(original)
+        self.put(kind, original, value, study)
+        return value
+
+    def fill(self, lookup: 'LookupID', ds: Dataset, uid_key: Optional[bytes] = None) -> 'LookupID':
+        """
+        Fill the missing de-identified ids and the time shift of the look-up from the store.
+
+        Stored ids win over ids of the look-up, new ids are created (keyed with a
+        uid_key, random otherwise) and stored, as is a new time shift of the patient.
+        Must be called before the data set is de-identified (needs the original ids).
+        """
+        patient, study = ds.get('PatientID'), ds.get('StudyInstanceUID')
+        study = str(study) if study else None
+        with self.lock:
+            if study and (STUDY, study) not in self.cache:
+                self.preload(study, str(patient) if patient else None)
+
+            lookup.deid_patient_id = self._resolve(
+                PATIENT, patient, lookup.deid_patient_id, study,
+                lambda original: keyed_id(original, uid_key) if uid_key is not None else str(uuid.uuid4()))
+            lookup.deid_study_uid = self._resolve(
+                STUDY, study, lookup.deid_study_uid, study, lambda original: new_uid(original, uid_key))
+            lookup.deid_series_uid = self._resolve(
+                SERIES, ds.get('SeriesInstanceUID'), lookup.deid_series_uid, study,
+                lambda original: new_uid(original, uid_key))
+
+            if patient:
+                stored = self.get(TIME_SHIFT, str(patient))
+                if stored is not None:
+                    lookup.time_shift = int(stored)
+                elif lookup.time_shift is not None:
+                    self.put(TIME_SHIFT, str(patient), str(lookup.time_shift), study)
+        return lookup
+
+    def close(self) -> None:
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def new_uid(original: str, uid_key: Optional[bytes]) -> str:
+    return keyed_uid(original, uid_key) if uid_key is not None else str(generate_uid(prefix=None))
+
+
+class SQLiteLookupStore(LookupStore):
+    """Look-up store in a SQLite database (a file, or ':memory:')."""
+
+    def __init__(self, path: str, cache_size: int = CACHE_SIZE, batch_size: int = BATCH_SIZE):
+        super().__init__(cache_size, batch_size)
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.connection:
+            self.connection.execute('CREATE TABLE IF NOT EXISTS lookup ('
+                                    'kind TEXT NOT NULL, original TEXT NOT NULL, deid TEXT NOT NULL, study TEXT, '
+                                    'PRIMARY KEY (kind, original))')
+            self.connection.execute('CREATE INDEX IF NOT EXISTS lookup_study ON lookup (study)')
+
+    def load_study(self, study: str, patient: Optional[str]) -> Iterable[Tuple[str, str, str]]:
+        return self.connection.execute(
+            'SELECT kind, original, deid FROM lookup WHERE study = ? OR (kind IN (?, ?) AND original = ?)',
+            (study, PATIENT, TIME_SHIFT, patient)).fetchall()
+
+    def load(self, kind: str, original: str) -> Optional[str]:
+        row = self.connection.execute('SELECT deid FROM lookup WHERE kind = ? AND original = ?',
+                                      (kind, original)).fetchone()
+        return row[0] if row else None
+
+    def save(self, rows: List[Row]) -> None:
+        with self.connection:
+            self.connection.executemany('INSERT OR IGNORE INTO lookup (kind, original, deid, study) '
+                                        'VALUES (?, ?, ?, ?)', rows)
+
+    def close(self) -> None:
+        super().close()
+        self.connection.close()
@@ -0,0 +1,173 @@
+"""
+Streaming de-identification of files.
+
+Only the header (everything before the pixel data) is read and de-identified.
+The pixel data element is copied as bytes from the source to the destination
+file in chunks (with os.copy_file_range where available), so the peak memory
+is bounded by the header size, also for large multi-frame images.
+
+Elements after the pixel data (e.g. Data Set Trailing Padding, Digital Signatures)
+are not copied.
+
+With a pixel processor, native pixel data is blanked while it is copied, one
+frame at a time (see pixels).
+"""
+import os
+import struct
+from typing import BinaryIO, Callable, Optional, Sequence, Tuple
+
+from pydicom import dcmread
+from pydicom.dataset import Dataset
+from pydicom.uid import DeflatedExplicitVRLittleEndian
+
+from .deidentify_dicom import DeidentifyDataset, LookupID
+from .pixels import FrameFormat, PixelProcessor, Region, mark_clean_pixels
+from .uids import factory_key
+
+COPY_CHUNK_SIZE = 1024 * 1024
+
+ITEM_TAG = (0xFFFE, 0xE000)
+SEQUENCE_DELIMITER_TAG = (0xFFFE, 0xE0DD)
+UNDEFINED_LENGTH = 0xFFFFFFFF
+
+# explicit VRs with reserved bytes and a 4 byte length
+_LONG_VRS = {b'OB', b'OD', b'OF', b'OL', b'OV', b'OW', b'SQ', b'SV', b'UC', b'UN', b'UR', b'UT', b'UV'}
+
+
+class StreamingNotSupportedError(Exception):
+    pass
+
+
+def pixel_data_span(fp: BinaryIO, offset: int, is_implicit_vr: bool, is_little_endian: bool) -> Tuple[int, int]:
+    """
+    Start and end offset of the pixel data element at offset (start == end if there is none).
+
+    Encapsulated pixel data (undefined length) is walked item by item without reading the fragments.
+    """
+    endian = '<' if is_little_endian else '>'
+    fp.seek(offset)
+    header = fp.read(8)
+    if len(header) < 8:
+        return offset, offset
+
+    if is_implicit_vr:
+        length = struct.unpack(endian + 'L', header[4:])[0]
+        position = offset + 8
+    elif header[4:6] in _LONG_VRS:
+        length = struct.unpack(endian + 'L', fp.read(4))[0]
+        position = offset + 12
+    else:
+        length = struct.unpack(endian + 'H', header[6:])[0]
+        position = offset + 8
+
+    if length != UNDEFINED_LENGTH:
+        return offset, position + length
+
+    while True:
+        fp.seek(position)
+        item = fp.read(8)
+        if len(item) < 8:
+            raise EOFError("Encapsulated pixel data without sequence delimiter")
+        group, element, length = struct.unpack(endian + 'HHL', item)
+        position += 8
+        if (group, element) == SEQUENCE_DELIMITER_TAG:
+            return offset, position
+        if (group, element) != ITEM_TAG:
+            raise ValueError(f"Unexpected tag ({group:04X},{element:04X}) in encapsulated pixel data")
+        position += length
+
+
+def copy_range(source: BinaryIO, destination: BinaryIO, offset: int, count: int,
+               chunk_size: int = COPY_CHUNK_SIZE) -> None:
+    """
+    Append count bytes from offset of source to destination, in chunks.
+    Uses os.copy_file_range (copy in the kernel) if possible.
+    """
+    destination.flush()
+    copy_file_range = getattr(os, 'copy_file_range', None)
+    if copy_file_range is not None:
+        try:
+            source_fd, destination_fd = source.fileno(), destination.fileno()
+            while count > 0:
+                copied = copy_file_range(source_fd, destination_fd, min(count, chunk_size), offset)
+                if copied == 0:
+                    break
+                offset += copied
+                count -= copied
+        except (OSError, ValueError):
+            pass  # not supported for these files, copy the rest below
+        finally:
+            destination.seek(0, os.SEEK_END)
+
+    source.seek(offset)
+    while count > 0:
+        chunk = source.read(min(count, chunk_size))
+        if not chunk:
+            raise EOFError("Source file ended before the end of the pixel data")
+        destination.write(chunk)
+        count -= len(chunk)
+
+
+def copy_blanked(source: BinaryIO, destination: BinaryIO, start: int, end: int, frame_format: FrameFormat,
+                 regions: Sequence[Region], is_implicit_vr: bool, is_little_endian: bool,
+                 chunk_size: int = COPY_CHUNK_SIZE) -> None:
+    """
+    Append the native pixel data element from start to end of source to destination,
+    with the regions blanked frame by frame.
+    """
+    header_size = 8 if is_implicit_vr else 12
+    data_start = start + header_size
+    padding = end - data_start - frame_format.frames * frame_format.frame_size
+    if padding < 0:
+        raise ValueError("Pixel data is shorter than its frames")
+    copy_range(source, destination, start, header_size, chunk_size)
+    source.seek(data_start)
+    for frame in PixelProcessor.iter_blanked_frames(source, frame_format, regions, is_little_endian):
+        destination.write(frame)
+    if padding:
+        copy_range(source, destination, end - padding, padding, chunk_size)
+
+
+def deidentify_file_streaming(source: str, destination: str,
+                              lookup_factory: Optional[Callable[[Dataset], LookupID]] = None,
+                              chunk_size: int = COPY_CHUNK_SIZE,
+                              pixel_processor: Optional[PixelProcessor] = None,
+                              rule_sets: Optional[tuple] = None) -> LookupID:
+    """
+    De-identify the header of source, write it to destination and copy the pixel data bytes.
+
+    The header is written with the encoding of the source, so that the pixel data
+    can be copied as is.
+    :param lookup_factory:  creates the look-up for the header data set (default: empty look-up)
+    :param pixel_processor: blanks burned-in annotations of native pixel data while copying (see pixels)
+    :param rule_sets:       rule sets instead of the rule sets of the time shift (see DeidentifyDataset)
+    :return:                look-up of the de-identified file
+    """
+    with open(source, 'rb') as source_file:
+        ds = dcmread(source_file, stop_before_pixels=True)
+        transfer_syntax = ds.file_meta.get('TransferSyntaxUID')
+        if transfer_syntax == DeflatedExplicitVRLittleEndian:
+            raise StreamingNotSupportedError(f"Cannot stream deflated file {source}")
+        start, end = pixel_data_span(source_file, source_file.tell(), ds.is_implicit_VR, ds.is_little_endian)
+
+        regions = pixel_processor.regions(ds) if pixel_processor is not None and end > start else ()
+        if regions:
+            if transfer_syntax is not None and transfer_syntax.is_compressed:
+                raise StreamingNotSupportedError(f"Cannot blank compressed pixel data while streaming {source}")
+            frame_format = FrameFormat.from_dataset(ds)  # of the original header
+
+        lookup = lookup_factory(ds) if lookup_factory else LookupID()
+        if lookup.filename is None:
+            lookup.filename = destination
+        deidentifier = DeidentifyDataset(lookup, rule_sets=rule_sets, uid_key=factory_key(lookup_factory))
+        deid_ds, lookup = deidentifier.get_deid_dataset(ds, copy=False)
+        if regions:
+            mark_clean_pixels(deid_ds)
+        with open(destination, 'wb') as destination_file:
+            deid_ds.save_as(destination_file)
+            if regions:
+                copy_blanked(source_file, destination_file, start, end, frame_format, regions,
+                             ds.is_implicit_VR, ds.is_little_endian, chunk_size)
+            else:
+                copy_range(source_file, destination_file, start, end - start, chunk_size)
+    return lookup
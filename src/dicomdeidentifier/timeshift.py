@@ -0,0 +1,106 @@
+"""
+Time shift per patient.
+
+All instances of a patient must get the same time shift, otherwise the intervals
+between the studies of the patient change. A time shift provider gives the shift
+of an original PatientID: KeyedTimeShift derives it from the PatientID with a
+secret key (keyed hash into a range of days, 0 is never used since it removes the
+dates), TableTimeShift takes it from a table (e.g. a CSV file of a previous run).
+The keyed hash is domain separated from the keyed ids (see uids), so the shift
+cannot be computed from the de-identified PatientID, also with the same key.
+
+DeidentifyDataset(lookup, time_shift_provider=provider) sets the time shift of a
+look-up without one. The shift of a patient is resolved once and kept in an LRU
+cache, so batch and parallel runs (each worker derives the same shifts with the
+same key) need no query per instance.
+"""
+import csv
+import hashlib
+import hmac
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Mapping, Optional
+
+CACHE_SIZE = 100000
+MIN_DAYS = -365
+MAX_DAYS = 365
+# prefix of the hashed message, separates the shifts from the keyed ids of the same key
+TIME_SHIFT_DOMAIN = b'time-shift\0'
+
+
+class TimeShiftProvider(ABC):
+    """Base of the time shift providers: LRU cache of the shifts per patient."""
+
+    def __init__(self, cache_size: int = CACHE_SIZE):
+        self.cache_size = cache_size
+        self.cache: 'OrderedDict[str, Optional[int]]' = OrderedDict()
+
+    @abstractmethod
+    def shift(self, patient_id: str) -> Optional[int]:
+        """Time shift in days of the patient, None if there is none (dates are removed)."""
+
+    def get(self, patient_id) -> Optional[int]:
+        """Time shift of the patient (from the cache if possible), None without a patient id."""
+        if not patient_id:
+            return None
+        patient_id = str(patient_id)
+        if patient_id in self.cache:
+            self.cache.move_to_end(patient_id)
+            return self.cache[patient_id]
+        value = self.shift(patient_id)
+        self.cache[patient_id] = value
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return value
+
+
+class KeyedTimeShift(TimeShiftProvider):
+    """
+    Time shift from a keyed hash (HMAC-SHA-256) of TIME_SHIFT_DOMAIN and the PatientID,
+    in [minimum, maximum] days without 0.
+    """
+
+    def __init__(self, key: bytes, minimum: int = MIN_DAYS, maximum: int = MAX_DAYS, cache_size: int = CACHE_SIZE):
+        super().__init__(cache_size)
+        self.key = key
+        self.minimum = minimum
+        self.maximum = maximum
+        self.has_zero = minimum <= 0 <= maximum
+        self.size = maximum - minimum + 1 - self.has_zero
+        if self.size < 1:
+            raise ValueError(f"no time shift in [{minimum}, {maximum}] days without 0")
+
+    def shift(self, patient_id: str) -> int:
+        digest = hmac.new(self.key, TIME_SHIFT_DOMAIN + patient_id.encode('utf-8'), hashlib.sha256).digest()
+        value = self.minimum + int.from_bytes(digest[:8], 'big') % self.size
+        if self.has_zero and value >= 0:
+            value += 1  # skip 0
+        return value
+
+
+class TableTimeShift(TimeShiftProvider):
+    """
+    Time shift from a table of PatientID to days; patients not in the table get the shift of
+    the default provider (or None, dates are removed).
+    """
+
+    def __init__(self, shifts: Mapping[str, int], default: Optional[TimeShiftProvider] = None,
+                 cache_size: int = CACHE_SIZE):
+        super().__init__(cache_size)
+        self.shifts = shifts
+        self.default = default
+
+    def shift(self, patient_id: str) -> Optional[int]:
+        value = self.shifts.get(patient_id)
+        if value is None and self.default is not None:
+            return self.default.get(patient_id)
+        return value
+
+    @classmethod
+    def from_csv(cls, path: str, default: Optional[TimeShiftProvider] = None) -> 'TableTimeShift':
+        """
+        Table from a CSV file with the columns patient_id and time_shift.
+        """
+        with open(path, newline='', encoding='utf-8') as fp:
+            shifts = {row['patient_id']: int(row['time_shift']) for row in csv.DictReader(fp)}
+        return cls(shifts, default)
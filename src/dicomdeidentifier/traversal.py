@@ -0,0 +1,143 @@
+"""
+De-identification in one walk.
+
+The rules, the date shifts, the UID remapping and the private tag policy are
+applied to every element in a single depth-first walk of the data set
+(also in nested sequences), instead of one walk per stage. The rule of a
+sequence is applied first: its items are walked only if it is kept (or has no
+rule), a removed, emptied or replaced sequence takes its items with it.
+
+Instance UIDs which the rules keep are remapped, also inside sequences
+(e.g. StudyInstanceUID of a referenced study): the UIDs of the data set itself
+to its de-identified UIDs, other UIDs to keyed UIDs (with a uid key, see uids)
+or to random UIDs (the same within the data set). Only the elements of
+instances and their references (INSTANCE_UID_TAGS) get new UIDs; the UIDs of
+other elements (SOP classes, also private ones, transfer syntaxes, coding
+schemes, ...) are kept, unless they are UIDs of the data set itself.
+"""
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+
+from pydicom.datadict import DicomDictionary
+from pydicom.dataset import Dataset
+from pydicom.multival import MultiValue
+from pydicom.uid import generate_uid
+
+from .dates import DATE_VRS, PATIENT_BIRTH_DATE, shift_date_value
+from .dispatch import PIXEL_DATA_TAG, CompiledRuleSet
+from .private_tags import PrivateTagPolicy
+from .uids import keyed_uid
+
+OTHER_INSTANCE_UID_KEYWORDS = ('ConcatenationUID', 'DimensionOrganizationUID', 'IrradiationEventUID',
+                               'RadiopharmaceuticalAdministrationEventUID', 'StorageMediaFileSetUID',
+                               'TransactionUID', 'UID', 'ObservationUID', 'TrackingUID', 'TargetUID',
+                               'SpecimenUID', 'FiducialUID', 'ReferencedFiducialUID', 'DoseReferenceUID',
+                               'ReferencedDoseReferenceUID', 'DigitalSignatureUID', 'MultiplexGroupUID')
+# UI elements which identify an instance (or refer to one), matched by keyword
+INSTANCE_UID_TAGS = frozenset(
+    tag for tag, (vr, _, _, _, keyword) in DicomDictionary.items()
+    if vr == 'UI' and ('InstanceUID' in keyword or 'FrameOfReferenceUID' in keyword
+                       or keyword in OTHER_INSTANCE_UID_KEYWORDS))
+
+
+@dataclass
+class Traversal:
+    """
+    One walk de-identification of a data set in place, with the counts of what was done.
+
+    :param compiled:        compiled rules (see dispatch)
+    :param time_shift:      days to shift the dates, dates are emptied if 0 or None
+    :param uid_map:         original to de-identified UIDs (the UIDs of the data set),
+                            extended with the other remapped UIDs
+    :param uid_key:         key to derive the other UIDs, random UIDs if None
+    :param private_policy:  private tags to keep
+    """
+    compiled: CompiledRuleSet
+    time_shift: Optional[int] = field(default=None)
+    uid_map: Dict[str, str] = field(default_factory=dict)
+    uid_key: Optional[bytes] = field(default=None)
+    private_policy: PrivateTagPolicy = field(default_factory=PrivateTagPolicy)
+    elements: int = field(default=0)
+    removed: Counter = field(default_factory=Counter)
+    private_removed: int = field(default=0)
+    errors: Counter = field(default_factory=Counter)
+
+    def remap_uid(self, uid: str, instance: bool = True) -> str:
+        """De-identified UID; UIDs which are not instance UIDs are kept if they are not in the UID map."""
+        if not uid:
+            return uid
+        deid_uid = self.uid_map.get(uid)
+        if deid_uid is None:
+            if not instance:
+                return uid
+            deid_uid = keyed_uid(uid, self.uid_key) if self.uid_key is not None else str(generate_uid(prefix=None))
+            self.uid_map[uid] = deid_uid
+        return deid_uid
+
+    def shift_date(self, tag: int, value, vr: str = 'DT'):
+        if self.time_shift in (0, None) or value is None or tag == PATIENT_BIRTH_DATE:
+            return None
+        try:
+            return shift_date_value(value, self.time_shift, vr)
+        except TypeError:
+            return None
+
+    def walk(self, ds: Dataset) -> Dataset:
+        """De-identify the data set in place, recursing into sequences."""
+        from idiscore.operators import ElementShouldBeRemoved, Empty, Keep, Remove
+
+        removed = []
+        creators: Dict[Tuple[int, int], str] = {}
+        for element in ds:
+            self.elements += 1
+            tag = element.tag
+            if tag == PIXEL_DATA_TAG:
+                continue
+            if tag.is_private and not self.private_policy.keep_private(element, creators):
+                removed.append(tag)
+                self.private_removed += 1
+                continue
+            vr = element.VR
+            operator = self.compiled.get_operator(tag)
+            if vr == 'SQ' and (operator is None or type(operator) is Keep):
+                for item in element.value:
+                    self.walk(item)
+                continue
+
+            if operator is not None:
+                operator_type = type(operator)
+                if operator_type is Remove:
+                    removed.append(tag)
+                    self.removed[tag] += 1
+                    continue
+                if operator_type is Empty:
+                    element.value = None
+                elif operator_type is not Keep:
+                    try:
+                        ds[tag] = element = operator.apply(element, ds)
+                    except ElementShouldBeRemoved:
+                        removed.append(tag)
+                        self.removed[tag] += 1
+                        continue
+                    except (AttributeError, ValueError) as e:
+                        # the value cannot be de-identified, remove it instead
+                        removed.append(tag)
+                        self.errors[type(e).__name__] += 1
+                        continue
+                if vr == 'SQ':
+                    continue
+
+            if vr in DATE_VRS:
+                element.value = self.shift_date(tag, element.value, vr)
+            elif vr == 'UI' and (operator is None or type(operator) is Keep) and element.value:
+                value = element.value
+                instance = tag in INSTANCE_UID_TAGS
+                if isinstance(value, (MultiValue, list)):
+                    element.value = [self.remap_uid(uid, instance) for uid in value]
+                else:
+                    element.value = self.remap_uid(value, instance)
+
+        for tag in removed:
+            del ds[tag]
+        return ds
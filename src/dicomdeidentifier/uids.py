@@ -0,0 +1,40 @@
+"""
+Keyed de-identified ids.
+
+The de-identified id is an HMAC (SHA-256) of the original id with a secret key:
+the same original id and key always give the same de-identified id, so no
+look-up table is needed to keep studies and series together (also for parallel
+workers and re-runs). Without the key, the original id cannot be recovered.
+"""
+import hashlib
+import hmac
+from typing import Optional
+
+UID_ROOT = '2.25'
+
+
+def _digest(original: str, key: bytes) -> bytes:
+    return hmac.new(key, str(original).encode('utf-8'), hashlib.sha256).digest()
+
+
+def keyed_uid(original: str, key: bytes) -> str:
+    """
+    UID of form 2.25.<128 bit int> for the original UID (max 44 characters).
+    """
+    return f"{UID_ROOT}.{int.from_bytes(_digest(original, key)[:16], 'big')}"
+
+
+def factory_key(lookup_factory) -> Optional[bytes]:
+    """
+    Key of a look-up factory which derives the ids with a key (e.g. pipeline.DerivedLookupFactory),
+    None for other factories. Used as uid_key, so that the UIDs which do not come from the look-up
+    (e.g. references in sequences) are derived with the same key.
+    """
+    return getattr(lookup_factory, 'key', None)
+
+
+def keyed_id(original: str, key: bytes) -> str:
+    """
+    Id (32 hex characters) for an original id like PatientID.
+    """
+    return _digest(original, key)[:16].hex()
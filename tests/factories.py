@@ -1,25 +1,45 @@
-"""
-Factory Dataset
-"""
-from pydicom.dataset import Dataset
-from pydicom.tag import Tag
-
-
-def quick_dataset(*_, **kwargs) -> Dataset:
-    """A dataset with keyword args as tagname - value pairs
-    For example:
-    >>> ds = quick_dataset(PatientName='Jane', StudyDescription='Test')
-    >>> ds.PatientName
-    'Jane'
-    >>> ds.StudyDescription
-    'Test'
-    Raises
-    ------
-    ValueError
-        If any input key is not a valid DICOM keyword
-    """
-    dataset = Dataset()
-    for tagname, value in kwargs.items():
-        Tag(tagname)  # assert valid dicom keyword. pydicom will not do this.
-        dataset.__setattr__(tagname, value)
-    return dataset
+"""
+Factory Dataset
+"""
+from dicomgenerator.factory import CTDatasetFactory
+from pydicom.dataset import Dataset, FileMetaDataset
+from pydicom.tag import Tag
+from pydicom.uid import ExplicitVRBigEndian, ExplicitVRLittleEndian, ImplicitVRLittleEndian
+
+
+def quick_dataset(*_, **kwargs) -> Dataset:
+    """A dataset with keyword args as tagname - value pairs
+    For example:
+    >>> ds = quick_dataset(PatientName='Jane', StudyDescription='Test')
+    >>> ds.PatientName
+    'Jane'
+    >>> ds.StudyDescription
+    'Test'
+    Raises
+    ------
+    ValueError
+        If any input key is not a valid DICOM keyword
+    """
+    dataset = Dataset()
+    for tagname, value in kwargs.items():
+        Tag(tagname)  # assert valid dicom keyword. pydicom will not do this.
+        dataset.__setattr__(tagname, value)
+    return dataset
+
+
+def write_ct_file(path, transfer_syntax=ExplicitVRLittleEndian, pixel_data=None):
+    """Write a CT file with the given transfer syntax (and pixel data) and trailing padding."""
+    ds = CTDatasetFactory(PatientName='Martha', StudyDate='20200101')
+    ds.file_meta = FileMetaDataset()
+    ds.file_meta.TransferSyntaxUID = transfer_syntax
+    ds.file_meta.MediaStorageSOPClassUID = ds.SOPClassUID
+    ds.file_meta.MediaStorageSOPInstanceUID = ds.SOPInstanceUID
+    ds.is_little_endian = transfer_syntax != ExplicitVRBigEndian
+    ds.is_implicit_VR = transfer_syntax == ImplicitVRLittleEndian
+    if pixel_data is not None:
+        ds.PixelData = pixel_data
+        ds[0x7FE00010].VR = 'OB'
+        ds[0x7FE00010].is_undefined_length = True
+    ds.add_new(0xFFFCFFFC, 'OB', b'\0' * 4)  # Data Set Trailing Padding
+    ds.save_as(str(path), write_like_original=False)
+    return ds
@@ -0,0 +1,161 @@
+"""
+Test asyncio pipeline module
+"""
+import asyncio
+import os
+
+import pytest
+from pydicom import dcmread
+from pydicom.dataset import FileMetaDataset
+from pydicom.uid import ExplicitVRLittleEndian
+
+from src.dicomdeidentifier.async_pipeline import DeidentifyPipeline, DirectorySink, StoreSCUSink
+from src.dicomdeidentifier.deidentify_dicom import LookupID
+from tests.factories import quick_dataset
+
+
+def a_received_dataset(number: int):
+    """A data set as received by a C-STORE SCP."""
+    ds = quick_dataset(PatientID='patient', SOPClassUID='1.2.840.10008.5.1.4.1.1.7',
+                       SOPInstanceUID=f'1.2.3.{number}', StudyDate='20200101')
+    ds.file_meta = FileMetaDataset()
+    ds.file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
+    ds.file_meta.MediaStorageSOPClassUID = ds.SOPClassUID
+    ds.preamble = b'\0' * 128
+    ds.is_little_endian, ds.is_implicit_VR = True, False
+    return ds
+
+
+class SlowSink:
+    """Sink which waits until it is released."""
+
+    def __init__(self):
+        self.release = asyncio.Event()
+        self.written = []
+        self.datasets = []
+
+    async def write(self, ds, lookup):
+        await self.release.wait()
+        self.written.append(lookup.deid_sop_uid)
+        self.datasets.append(ds)
+
+
+def test_pipeline_writes_to_directory(tmp_path):
+    """Test all queued data sets are de-identified and written."""
+    async def run():
+        sink = DirectorySink(str(tmp_path))
+        async with DeidentifyPipeline(sink, lambda ds: LookupID(time_shift=1), workers=2) as pipeline:
+            for number in range(5):
+                await pipeline.put(a_received_dataset(number))
+        return pipeline
+
+    pipeline = asyncio.run(run())
+    assert pipeline.processed == 5
+    files = os.listdir(tmp_path)
+    assert len(files) == 5
+    ds = dcmread(str(tmp_path / files[0]))
+    assert ds.StudyDate == '20200102'
+    assert ds.PatientIdentityRemoved == 'YES'
+
+
+def test_pipeline_keeps_study_and_series_together():
+    """Test the instances of a series keep the same de-identified study and series UIDs by default."""
+    async def run():
+        sink = SlowSink()
+        sink.release.set()
+        async with DeidentifyPipeline(sink, workers=2) as pipeline:
+            for number in range(2):
+                ds = a_received_dataset(number)
+                ds.StudyInstanceUID, ds.SeriesInstanceUID = '1.2.3', '1.2.3.4'
+                await pipeline.put(ds)
+        return sink
+
+    datasets = asyncio.run(run()).datasets
+    assert len(datasets) == 2
+    assert datasets[0].StudyInstanceUID == datasets[1].StudyInstanceUID != '1.2.3'
+    assert datasets[0].SeriesInstanceUID == datasets[1].SeriesInstanceUID != '1.2.3.4'
+    assert datasets[0].PatientID == datasets[1].PatientID != 'patient'
+
+
+def test_pipeline_backpressure():
+    """Test putting waits while the queue is full."""
+    async def run():
+        sink = SlowSink()
+        async with DeidentifyPipeline(sink, maxsize=1, workers=1) as pipeline:
+            await pipeline.put(a_received_dataset(0))  # taken by the worker
+            await asyncio.sleep(0.1)
+            await pipeline.put(a_received_dataset(1))  # fills the queue
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(pipeline.put(a_received_dataset(2)), 0.1)
+            sink.release.set()
+        return sink
+
+    assert len(asyncio.run(run()).written) == 2
+
+
+def test_pipeline_put_threadsafe_and_errors(tmp_path):
+    """Test putting from another thread, failing data sets are counted."""
+    errors = []
+
+    async def run():
+        pipeline = DeidentifyPipeline(DirectorySink(str(tmp_path)), on_error=lambda ds, e: errors.append(e))
+        await pipeline.start()
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, pipeline.put_threadsafe, a_received_dataset(0))
+        await pipeline.put(quick_dataset(PatientID='no file meta'))
+        await pipeline.stop()
+        return pipeline
+
+    pipeline = asyncio.run(run())
+    assert (pipeline.processed, pipeline.failed) == (1, 1)
+    assert len(errors) == 1
+
+
+def test_pipeline_survives_failing_on_error(tmp_path):
+    """Test an exception of the on_error callback goes to the loop's handler and the worker keeps running."""
+    def on_error(ds, e):
+        raise RuntimeError('callback failed')
+
+    async def run():
+        handled = []
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: handled.append(context['exception']))
+        async with DeidentifyPipeline(DirectorySink(str(tmp_path)), workers=1, on_error=on_error) as pipeline:
+            await pipeline.put(quick_dataset(PatientID='no file meta'))
+            await pipeline.put(a_received_dataset(0))
+        return pipeline, handled
+
+    pipeline, handled = asyncio.run(asyncio.wait_for(run(), 5))
+    assert (pipeline.processed, pipeline.failed) == (1, 1)
+    assert [str(e) for e in handled] == ['callback failed']
+
+
+def test_store_scu_sink_sends_to_local_scp(tmp_path):
+    """Test de-identified data sets are sent to a local stand-in C-STORE SCP."""
+    pynetdicom = pytest.importorskip('pynetdicom')
+    received = []
+
+    def handle_store(event):
+        received.append(event.dataset.SOPInstanceUID)
+        return 0x0000
+
+    ae = pynetdicom.AE()
+    ae.supported_contexts = pynetdicom.AllStoragePresentationContexts
+    scp = ae.start_server(('127.0.0.1', 0), block=False,
+                          evt_handlers=[(pynetdicom.evt.EVT_C_STORE, handle_store)])
+    port = scp.server_address[1]
+
+    async def run():
+        sink = StoreSCUSink('127.0.0.1', port)
+        async with DeidentifyPipeline(sink) as pipeline:
+            for number in range(3):
+                await pipeline.put(a_received_dataset(number))
+        sink.close()
+        return pipeline
+
+    try:
+        pipeline = asyncio.run(run())
+    finally:
+        scp.shutdown()
+    assert pipeline.processed == 3
+    assert len(received) == 3
+    assert '1.2.3.0' not in received
@@ -0,0 +1,81 @@
+"""
+Test batch de-identification module
+"""
+import types
+
+import pytest
+from pydicom import Dataset
+
+from src.dicomdeidentifier.batch import UIDMapping, UIDMappingConflictError, deidentify_batch
+from src.dicomdeidentifier.deidentify_dicom import LookupID
+from tests.factories import quick_dataset
+
+
+def a_series(study_uid: str, series_uid: str, size: int):
+    """Instances of one series."""
+    for number in range(size):
+        ds = quick_dataset(PatientID='patient', StudyInstanceUID=study_uid, SeriesInstanceUID=series_uid,
+                           SOPInstanceUID=f'1.2.3.{number}', StudyDate='20200101')
+        ds.file_meta = Dataset()
+        ds.preamble = b'\0' * 128
+        yield ds
+
+
+def test_deidentify_batch_same_uids_per_series():
+    """Test instances of one series get the same series uid, and all the same study uid."""
+    datasets = list(a_series('1.2.1', '1.2.1.1', 3)) + list(a_series('1.2.1', '1.2.1.2', 2))
+    results = list(deidentify_batch(datasets, lambda ds: LookupID(time_shift=1, filename='a_filename')))
+
+    assert len(results) == 5
+    assert len({ds.StudyInstanceUID for ds, _ in results}) == 1
+    assert len({ds.PatientID for ds, _ in results}) == 1
+    assert len({ds.SeriesInstanceUID for ds, _ in results[:3]}) == 1
+    assert results[0][0].SeriesInstanceUID != results[3][0].SeriesInstanceUID
+    assert len({lookup.deid_sop_uid for _, lookup in results}) == 5
+    assert results[0][0].StudyInstanceUID != '1.2.1'
+    assert results[0][0].StudyDate == '20200102'
+
+
+def test_deidentify_batch_without_copy():
+    """Test the data sets are de-identified in place with copy=False."""
+    datasets = list(a_series('1.2.1', '1.2.1.1', 2))
+    results = list(deidentify_batch(datasets, lambda ds: LookupID(time_shift=1), copy=False))
+    assert results[0][0]['StudyDate'] is datasets[0]['StudyDate']
+    assert datasets[0].StudyDate == '20200102'
+
+
+def test_deidentify_batch_is_lazy():
+    """Test results are yielded one by one."""
+    results = deidentify_batch(a_series('1.2.1', '1.2.1.1', 100000))
+    assert isinstance(results, types.GeneratorType)
+    ds, lookup = next(results)
+    assert ds.SOPInstanceUID == lookup.deid_sop_uid
+
+
+def test_uid_mapping_keeps_given_uids():
+    """Test given de-identified uids are used for following instances."""
+    mapping = UIDMapping()
+    ds = quick_dataset(PatientID='patient', StudyInstanceUID='1.2.1', SeriesInstanceUID='1.2.1.1')
+    first = mapping.fill(LookupID(deid_study_uid='2.25.1'), ds)
+    second = mapping.fill(LookupID(), ds)
+    assert first.deid_study_uid == second.deid_study_uid == '2.25.1'
+    assert first.deid_series_uid == second.deid_series_uid is not None
+    assert mapping.studies == {'1.2.1': '2.25.1'}
+
+
+def test_uid_mapping_raises_on_conflicting_given_uids():
+    """Test a given uid is not overridden by the uid already mapped for the original."""
+    mapping = UIDMapping()
+    ds = quick_dataset(PatientID='patient', StudyInstanceUID='1.2.1', SeriesInstanceUID='1.2.1.1')
+    mapping.fill(LookupID(deid_study_uid='2.25.1'), ds)
+    assert mapping.fill(LookupID(deid_study_uid='2.25.1'), ds).deid_study_uid == '2.25.1'
+    with pytest.raises(UIDMappingConflictError):
+        mapping.fill(LookupID(deid_study_uid='2.25.2'), ds)
+
+
+def test_uid_mapping_without_original_uids():
+    """Test nothing is mapped without original uids."""
+    mapping = UIDMapping()
+    lookup = mapping.fill(LookupID(), Dataset())
+    assert lookup.deid_study_uid is None
+    assert mapping.studies == {}
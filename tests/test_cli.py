@@ -0,0 +1,110 @@
+"""
+Test command line module
+"""
+import json
+import os
+
+from pydicom import dcmread
+
+import pytest
+
+from src.dicomdeidentifier.cli import Progress, default_manifest, main
+from src.dicomdeidentifier.pipeline import FileResult
+
+
+def read_manifest(src, dst):
+    with open(default_manifest(str(src), str(dst))) as fp:
+        return [json.loads(line) for line in fp]
+
+
+def test_main_writes_manifest_and_resumes(a_dicom_directory, tmp_path):
+    """Test done files are skipped when the command runs again, failed files are retried."""
+    dst = tmp_path / 'dst'
+    args = [str(a_dicom_directory), str(dst), '--workers', '0', '--time-shift', '2', '--quiet']
+
+    assert main(args) == 1  # readme.txt is no DICOM file
+    entries = read_manifest(a_dicom_directory, dst)
+    assert len(entries) == 7
+    assert [entry['source'] for entry in entries if entry['error']] == ['readme.txt']
+    assert dcmread(str(dst / 'series_0' / '0.dcm')).StudyDate == '20200103'
+    manifest = default_manifest(str(a_dicom_directory), str(dst))
+    assert os.path.dirname(manifest) == str(tmp_path)
+    assert os.stat(manifest + '.key').st_mode & 0o777 == 0o600
+    assert [path.name for path in dst.iterdir() if path.is_file()] == []
+
+    assert main(args) == 1
+    assert [entry['source'] for entry in read_manifest(a_dicom_directory, dst)[7:]] == ['readme.txt']
+
+
+def test_main_reuses_key(a_dicom_directory, tmp_path):
+    """Test a run without resume gives the same ids with the stored key."""
+    dst = tmp_path / 'dst'
+    args = [str(a_dicom_directory), str(dst), '--workers', '0', '--quiet']
+    main(args)
+    first = dcmread(str(dst / 'series_1' / '2.dcm'))
+
+    main(args + ['--no-resume'])
+    second = dcmread(str(dst / 'series_1' / '2.dcm'))
+    assert second.StudyInstanceUID == first.StudyInstanceUID
+    assert second.PatientID == first.PatientID
+
+    main(args + ['--no-resume', '--deid-patient-id', 'subject-1', '--uid-key', '00' * 16])
+    third = dcmread(str(dst / 'series_1' / '2.dcm'))
+    assert third.PatientID == 'subject-1'
+    assert third.StudyInstanceUID != first.StudyInstanceUID
+
+
+def test_main_refuses_other_key_on_resume(a_dicom_directory, tmp_path, capsys):
+    """Test resuming with a --uid-key other than the stored key exits, the stored key is accepted."""
+    dst = tmp_path / 'dst'
+    args = [str(a_dicom_directory), str(dst), '--workers', '0', '--quiet']
+    main(args)
+    with open(default_manifest(str(a_dicom_directory), str(dst)) + '.key') as fp:
+        stored = fp.read()
+
+    with pytest.raises(SystemExit) as exit_info:
+        main(args + ['--uid-key', '00' * 16])
+    assert exit_info.value.code == 2
+    assert '--uid-key differs' in capsys.readouterr().err
+    assert len(read_manifest(a_dicom_directory, dst)) == 7
+
+    assert main(args + ['--uid-key', stored]) == 1  # readme.txt is no DICOM file
+
+
+def test_progress_format():
+    """Test throughput and estimated time left."""
+    progress = Progress(total=4, total_bytes=4000000, stream=None)
+    progress.update(FileResult('a', 'b', None, None), 1000000)
+    assert progress.format(2.0) == '1/4 files (0 failed, 0 skipped), 0.5 files/s, 0.5 MB/s, ETA 0:00:06'
+
+
+def test_main_time_shift_range(a_dicom_directory, tmp_path):
+    """Test all files of a patient get the same keyed time shift in the range."""
+    dst = tmp_path / 'dst'
+    main([str(a_dicom_directory), str(dst), '--workers', '0', '--quiet', '--time-shift-range', '3', '3'])
+    assert {dcmread(str(path)).StudyDate for path in dst.glob('series_*/*.dcm')} == {'20200104'}
+
+
+def test_main_already_deidentified(a_dicom_directory, tmp_path):
+    """Test de-identified output given as input is copied with skip."""
+    deid, again = tmp_path / 'deid', tmp_path / 'again'
+    main([str(a_dicom_directory), str(deid), '--workers', '0', '--quiet'])
+    assert main([str(deid), str(again), '--workers', '0', '--quiet', '--already-deidentified', 'skip']) == 0
+    assert all(entry['skipped'] for entry in read_manifest(deid, again))
+    assert (again / 'series_0' / '0.dcm').read_bytes() == (deid / 'series_0' / '0.dcm').read_bytes()
+
+
+def test_main_refuses_state_inside_dst_and_bad_key(a_dicom_directory, tmp_path, capsys):
+    """Test the manifest and key are not written into DST, and an invalid key exits without a traceback."""
+    dst = tmp_path / 'dst'
+    for args in (['--manifest', str(dst / 'manifest.jsonl')], ['--state-dir', str(dst / 'state')],
+                 ['--uid-key', 'not hex']):
+        with pytest.raises(SystemExit) as exit_info:
+            main([str(a_dicom_directory), str(dst), '--workers', '0', '--quiet'] + args)
+        assert exit_info.value.code == 2
+    assert 'not a hex key' in capsys.readouterr().err
+    assert not dst.exists()
+
+    assert main([str(a_dicom_directory), str(dst), '--workers', '0', '--quiet',
+                 '--state-dir', str(tmp_path / 'state')]) == 1
+    assert os.path.exists(default_manifest(str(a_dicom_directory), str(dst), str(tmp_path / 'state')) + '.key')
@@ -0,0 +1,45 @@
+"""
+Test core registry module
+"""
+import threading
+
+from idiscore.nema import RuleSet, Rule
+from idiscore.identifiers import SingleTag
+from idiscore.operators import Remove
+
+from src.dicomdeidentifier.core_registry import get_compiled_rules, invalidate_cores
+from src.dicomdeidentifier.rule_sets import timeshift_custom_ruleset, no_times_ruleset
+
+
+def test_get_compiled_rules_returns_same_rules_for_same_rule_sets():
+    """Test rules are compiled once per rule set combination."""
+    compiled = get_compiled_rules(timeshift_custom_ruleset, no_times_ruleset)
+    assert get_compiled_rules(timeshift_custom_ruleset, no_times_ruleset) is compiled
+    assert get_compiled_rules(timeshift_custom_ruleset) is not compiled
+    assert get_compiled_rules(no_times_ruleset, timeshift_custom_ruleset) is not compiled
+
+
+def test_get_compiled_rules_is_thread_safe():
+    """Test concurrent calls get the same compiled rules."""
+    rule_set = RuleSet(name="threads", rules=[Rule(SingleTag("00100010"), Remove())])
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(get_compiled_rules(rule_set))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len({id(compiled) for compiled in results}) == 1
+
+
+def test_invalidate_cores():
+    """Test invalidated compiled rules are rebuilt, others are kept."""
+    rule_set = RuleSet(name="swapped", rules=[Rule(SingleTag("00100010"), Remove())])
+    compiled = get_compiled_rules(rule_set)
+    kept = get_compiled_rules(timeshift_custom_ruleset)
+
+    assert invalidate_cores(rule_set) == 1
+    assert get_compiled_rules(rule_set) is not compiled
+    assert get_compiled_rules(timeshift_custom_ruleset) is kept
+
+    assert invalidate_cores() >= 2
+    assert get_compiled_rules(timeshift_custom_ruleset) is not kept
@@ -0,0 +1,67 @@
+"""
+Test date shifting module
+"""
+from datetime import date, timedelta
+
+import pytest
+from pydicom.multival import MultiValue
+
+from src.dicomdeidentifier.dates import civil_from_days, days_from_civil, shift_date, shift_date_value
+
+
+@pytest.mark.parametrize("day", [date(1, 1, 1), date(1600, 2, 29), date(1970, 1, 1),
+                                 date(2000, 2, 29), date(2100, 3, 1), date(9999, 12, 31)])
+def test_days_from_civil_same_as_datetime(day):
+    """Test day numbers are the same as ordinals of datetime."""
+    days = days_from_civil(day.year, day.month, day.day)
+    assert days == day.toordinal() - date(1970, 1, 1).toordinal()
+    assert civil_from_days(days) == (day.year, day.month, day.day)
+
+
+@pytest.mark.parametrize("shift", [-800, -30, -1, 1, 16, 365, 1000])
+def test_shift_date_same_as_timedelta(shift):
+    """Test shifted dates are the same as with timedelta."""
+    for day in (date(2019, 2, 2), date(2020, 2, 28), date(1999, 12, 31)):
+        expected = (day + timedelta(days=shift)).strftime('%Y%m%d')
+        assert shift_date(day.strftime('%Y%m%d'), shift) == expected
+
+
+@pytest.mark.parametrize("value, expected", [("20200228", "20200301"),
+                                             ("202002281230", "202003011230"),
+                                             ("20200228123000.123456", "20200301123000.123456"),
+                                             ("20200228123000.1+0100", "20200301123000.1+0100"),
+                                             ("20200228-0500", "20200301-0500"),
+                                             ("20200101-20200228", "20200103-20200301"),
+                                             ("-20200228", "-20200301"),
+                                             ("20200228-", "20200301-"),
+                                             ("20200228120000-0500-20200229", "20200301120000-0500-20200302"),
+                                             ("20200228 ", "20200301"),
+                                             ])
+def test_shift_date_keeps_time_and_ranges(value, expected):
+    """Test time, fraction and timezone are kept and ranges are shifted."""
+    assert shift_date(value, 2) == expected
+
+
+@pytest.mark.parametrize("value", ["", "-", "2020", "202002", "20200230", "20201301", "2020022", "2020a228",
+                                   "20200228123000.1234567", "20200228123", "19730825121212120000",
+                                   "20200101-20200132"])
+def test_shift_date_invalid_values(value):
+    """Test invalid or partial values cannot be shifted."""
+    assert shift_date(value, 2) is None
+
+
+def test_shift_date_value_multiple_values():
+    """Test multiple values are shifted, None if one of them is invalid."""
+    assert shift_date_value(MultiValue(str, ["20200101", "20200102"]), 1) == ["20200102", "20200103"]
+    assert shift_date_value(["20200101", "2020"], 1) is None
+    assert shift_date_value("20200101", 1) == "20200102"
+
+
+@pytest.mark.parametrize("value, expected", [("20200228", "20200301"),
+                                             ("20200228121212.120000", "20200301"),
+                                             ("20200101-20200228120000", "20200103-20200301"),
+                                             ])
+def test_shift_date_truncates_da_values(value, expected):
+    """Test shifted DA values keep only the date, also if they hold a time."""
+    assert shift_date(value, 2, 'DA') == expected
+    assert shift_date_value([value], 2, 'DA') == [expected]
@@ -1,190 +1,264 @@
-"""
-Test De-identify dicom data module
-"""
-import pytest
-from pydicom import Dataset
-
-from src.dicomdeidentifier.deidentify_dicom import DeidentifyDataset, LookupID
-from tests.factories import quick_dataset
-
-
-def test_can_get_date_elements(datetime_dataset):
-    """Test can get date or datetime elements."""
-    assert DeidentifyDataset.get_date_elements(
-        datetime_dataset) == {'AcquisitionDate': '19800501',
-                              'AcquisitionDateTime': '19800501163601',
-                              'PatientBirthDate': '19800501',
-                              'SeriesDate': '19730825121212.120000',
-                              'StudyDate': '20190202'}
-
-
-def test_date_elements_return_empty_dict(a_dataset):
-    """Test returns empty dict if no date element."""
-    assert DeidentifyDataset.get_date_elements(a_dataset) == {}
-
-
-def test_deidentify_dates_dates_none_with_timeshift_none(datetime_dataset):
-    """Test returns None if no time shift available."""
-    lookup = LookupID()
-    deid_ds = DeidentifyDataset(lookup).deidentify_dates(datetime_dataset)
-    assert deid_ds.data_element('PatientBirthDate').value is None
-    assert deid_ds.data_element('StudyDate').value is None
-    assert deid_ds.SeriesDate is None
-    assert deid_ds.AcquisitionDateTime is None
-    assert deid_ds.AcquisitionTime is not None
-
-
-def test_deidentify_dates_patient_birthdate_none_with_timeshift(datetime_dataset):
-    """Test returns None for Patient Birth Date element (time shift not None)."""
-    lookup = LookupID(time_shift=13)
-    deid_ds = DeidentifyDataset(lookup).deidentify_dates(datetime_dataset)
-    assert deid_ds.data_element('PatientBirthDate').value is None
-    assert deid_ds.PatientBirthDate is None
-    assert deid_ds.data_element('StudyDate').value is not None
-
-    datetime_dataset.PatientBirthDate = "19730825121212.120000"
-    deid_ds = DeidentifyDataset(lookup).deidentify_dates(datetime_dataset)
-    assert deid_ds.PatientBirthDate is None
-
-
-@pytest.mark.parametrize("ds", [quick_dataset(SeriesDate=""),
-                                quick_dataset(SeriesDate=None),
-                                ],
-                         )
-def test_deidentify_dates_where_date_none_with_timeshift(ds):
-    """Test returns None if date is None or empty with time shift."""
-    lookup = LookupID(time_shift=13)
-    deid_ds = DeidentifyDataset(lookup).deidentify_dates(ds)
-    assert deid_ds.SeriesDate is None
-
-
-def test_deidentify_dates_with_positive_timeshift(datetime_dataset):
-    """Test returns date element shifted by time shift."""
-    lookup = LookupID(time_shift=16)
-    deid_ds = DeidentifyDataset(lookup).deidentify_dates(datetime_dataset)
-    assert deid_ds.data_element('SeriesDate').value == '19730910121212'
-    assert deid_ds.StudyDate == '20190218'
-    assert deid_ds.AcquisitionDateTime == '19800517163601'
-    assert deid_ds.AcquisitionDate == '19800517'
-    assert deid_ds.PatientBirthDate is None
-
-
-def test_deidentify_dates_with_negative_timeshift(datetime_dataset):
-    """Test deidentify dates without date shift. Same string will be returned."""
-    lookup = LookupID(time_shift=-30)
-    deid_ds = DeidentifyDataset(lookup).deidentify_dates(datetime_dataset)
-    assert deid_ds.data_element('SeriesDate').value == '19730726121212'
-    assert deid_ds.StudyDate == '20190103'
-    assert deid_ds.AcquisitionDateTime == '19800401163601'
-    assert deid_ds.AcquisitionDate == '19800401'
-    assert deid_ds.PatientBirthDate is None
-
-
-@pytest.mark.parametrize("ds", [quick_dataset(SeriesDate="1973082", AcquisitionDateTime="19730825121212120000"),
-                                quick_dataset(SeriesDate="197382", AcquisitionDateTime="1973085121212120000"),
-                                quick_dataset(SeriesDate="19732", AcquisitionDateTime="197308512212120000"),
-                                ],
-                         )
-def test_deidentify_dates_with_wrong_date_length(ds):
-    """Test returns None if wrong date or datetime length."""
-    lookup = LookupID(time_shift=30)
-    deid_ds = DeidentifyDataset(lookup).deidentify_dates(ds)
-    assert deid_ds.data_element('SeriesDate').value is None
-    assert deid_ds.AcquisitionDateTime is None
-
-
-def test_deidentify_dates_with_wrong_time_shift_type(datetime_dataset):
-    """Test returns None if wrong date or datetime length."""
-    lookup = LookupID(time_shift='e')
-    deid_ds = DeidentifyDataset(lookup).deidentify_dates(datetime_dataset)
-    assert deid_ds.data_element('SeriesDate').value is None
-    assert deid_ds.AcquisitionDateTime is None
-
-
-@pytest.mark.parametrize("ds",
-                         [quick_dataset(SOPInstanceUID='1.2.840.10008.5.1.4.1.1.11.1',
-                                        StudyInstanceUID='2.25.22070338010590029158579',
-                                        SeriesInstanceUID='2.25.22070338010590029158579'),
-                          quick_dataset(PatientID=1),
-                          quick_dataset(SeriesDescription="Annotation"),
-                          quick_dataset(SOPInstanceUID="1.2.840.10008.5.1.4.1.1.11.1",
-                                        StudyInstanceUID="not_annotation"),
-                          ],
-                         )
-def test_add_deid_uids(a_lookup, ds):
-    """Test add de-identified uids are ok."""
-    ds.file_meta = Dataset()
-    ds.file_meta.MediaStorageSOPInstanceUID = 'a_UID'
-    ds_uid = DeidentifyDataset(a_lookup).add_deid_uids(ds)
-    assert ds_uid.PatientID == 'a_patient_id'
-    assert ds_uid.StudyInstanceUID == '1.25.220703380105900291585793573'
-    assert ds_uid.SeriesInstanceUID == '2.25.22070338010590029158579357354431'
-    assert ds_uid.SOPInstanceUID != '1.2.840.10008.5.1.4.1.1.11.1'
-    assert ds_uid.SOPInstanceUID == a_lookup.deid_sop_uid
-
-
-@pytest.mark.parametrize("ds",
-                         [quick_dataset(SOPClassUID="1.2.840.10008.5.1.4.1.1.11.1",
-                                        StudyInstanceUID="1.2.33333333333",
-                                        SeriesInstanceUID="1.3.44444444444"),
-                          quick_dataset(PatientID=1),
-                          quick_dataset(SeriesDescription="Annotation"),
-                          quick_dataset(SOPClassUID="1.2.840.10008.5.1.4.1.1.11.1",
-                                        StudyInstanceUID="not_annotation"),
-                          ],
-                         )
-def test_add_deid_uids_with_wrong_types_throw_error(wrong_type_lookup, ds):
-    """Test add de-identified uids are ok."""
-    ds.file_meta = Dataset()
-    ds.file_meta.MediaStorageSOPInstanceUID = 'a_UID'
-
-    with pytest.raises(ValueError):
-        DeidentifyDataset(wrong_type_lookup).add_deid_uids(ds)
-
-
-def test_get_deid_dataset_good(datetime_dataset, a_lookup):
-    """Test get de-identified file data set."""
-    datetime_dataset.file_meta = Dataset()
-    datetime_dataset.preamble = 'b'
-    datetime_dataset.file_meta.MediaStorageSOPInstanceUID = 'a_UID'
-    file_ds, lookup = DeidentifyDataset(a_lookup).get_deid_dataset(datetime_dataset)
-    assert lookup.deid_sop_uid is not None
-    assert file_ds.file_meta.MediaStorageSOPInstanceUID is not None
-    assert file_ds.SOPInstanceUID == lookup.deid_sop_uid
-    assert file_ds.file_meta.MediaStorageSOPInstanceUID == lookup.deid_sop_uid
-    assert file_ds.SeriesDate == '19730826121212'
-    assert file_ds.AcquisitionTime == '163601'
-
-
-@pytest.mark.parametrize("lookup", [LookupID(time_shift=0, filename='a_filename'),
-                                    LookupID(time_shift=None, filename='a_filename')
-                                    ],
-                         )
-def test_get_deid_dataset_no_timeshift(datetime_dataset, lookup):
-    """Test set file data set deletes all times from data set."""
-    datetime_dataset.file_meta = Dataset()
-    datetime_dataset.preamble = 'b'
-    file_ds, lookup = DeidentifyDataset(lookup).get_deid_dataset(datetime_dataset)
-    assert file_ds.SeriesDate is None
-
-    with pytest.raises(AttributeError):
-        print(file_ds.AcquisitionTime)
-
-
-def test_quick_dataset():
-    test = quick_dataset(PatientID=123, PatientName="Jack", StudyDescription="Test")
-    assert test.PatientID == 123
-    assert test.PatientName == "Jack"
-    assert test.StudyDescription == "Test"
-
-    with pytest.raises(ValueError):
-        quick_dataset(unknown_tag="should fail")
-
-
-def test_set_new_data_element_by_name():
-    """Dataset: set new data_element by name."""
-    ds = Dataset()
-    ds.TreatmentMachineName = "unit #1"
-    data_element = ds[0x300a, 0x00b2]
-    assert "unit #1" == data_element.value
-    assert "SH" == data_element.VR
+"""
+Test De-identify dicom data module
+"""
+from copy import deepcopy
+
+import pytest
+from pydicom import Dataset, FileDataset
+
+from src.dicomdeidentifier.deidentify_dicom import DeidentifyDataset, LookupID
+from tests.factories import quick_dataset
+
+
+def test_can_get_date_elements(datetime_dataset):
+    """Test can get date or datetime elements."""
+    elements = DeidentifyDataset.get_date_elements(datetime_dataset)
+    assert {element.keyword: element.value for element in elements} == {
+        'AcquisitionDate': '19800501',
+        'AcquisitionDateTime': '19800501163601',
+        'PatientBirthDate': '19800501',
+        'SeriesDate': '19730825121212.120000',
+        'StudyDate': '20190202'}
+
+
+def test_can_get_date_elements_with_times_and_in_sequences(datetime_dataset):
+    """Test gets elements by VR, also in sequences and without 'date' in the keyword."""
+    item = quick_dataset(StudyDate='20200101', StudyTime='101010')
+    datetime_dataset.ReferencedStudySequence = [item]
+    datetime_dataset.RequestAttributesSequence = [quick_dataset(ScheduledProcedureStepStartDate='20200102')]
+    datetime_dataset.add_new(0x00181202, 'DT', '20200103')  # DateTimeOfLastCalibration
+
+    keywords = [element.keyword for element in DeidentifyDataset.get_date_elements(datetime_dataset)]
+    assert keywords.count('StudyDate') == 2
+    assert 'ScheduledProcedureStepStartDate' in keywords
+    assert 'DateTimeOfLastCalibration' in keywords
+    assert 'StudyTime' not in keywords
+
+    elements = DeidentifyDataset.get_date_elements(datetime_dataset, vrs=('DA', 'DT', 'TM'))
+    assert 'StudyTime' in [element.keyword for element in elements]
+    assert item.data_element('StudyDate') in elements
+
+
+def test_date_elements_return_empty_list(a_dataset):
+    """Test returns empty list if no date element."""
+    assert DeidentifyDataset.get_date_elements(a_dataset) == []
+
+
+def test_deidentify_dates_in_sequences(datetime_dataset):
+    """Test dates in sequences are shifted."""
+    datetime_dataset.ReferencedStudySequence = [quick_dataset(StudyDate='20200101')]
+    deid_ds = DeidentifyDataset(LookupID(time_shift=2)).deidentify_dates(datetime_dataset)
+    assert deid_ds.ReferencedStudySequence[0].StudyDate == '20200103'
+
+
+def test_deidentify_dates_dates_none_with_timeshift_none(datetime_dataset):
+    """Test returns None if no time shift available."""
+    lookup = LookupID()
+    deid_ds = DeidentifyDataset(lookup).deidentify_dates(datetime_dataset)
+    assert deid_ds.data_element('PatientBirthDate').value is None
+    assert deid_ds.data_element('StudyDate').value is None
+    assert deid_ds.SeriesDate is None
+    assert deid_ds.AcquisitionDateTime is None
+    assert deid_ds.AcquisitionTime is not None
+
+
+def test_deidentify_dates_patient_birthdate_none_with_timeshift(datetime_dataset):
+    """Test returns None for Patient Birth Date element (time shift not None)."""
+    lookup = LookupID(time_shift=13)
+    deid_ds = DeidentifyDataset(lookup).deidentify_dates(datetime_dataset)
+    assert deid_ds.data_element('PatientBirthDate').value is None
+    assert deid_ds.PatientBirthDate is None
+    assert deid_ds.data_element('StudyDate').value is not None
+
+    datetime_dataset.PatientBirthDate = "19730825121212.120000"
+    deid_ds = DeidentifyDataset(lookup).deidentify_dates(datetime_dataset)
+    assert deid_ds.PatientBirthDate is None
+
+
+@pytest.mark.parametrize("ds", [quick_dataset(SeriesDate=""),
+                                quick_dataset(SeriesDate=None),
+                                ],
+                         )
+def test_deidentify_dates_where_date_none_with_timeshift(ds):
+    """Test returns None if date is None or empty with time shift."""
+    lookup = LookupID(time_shift=13)
+    deid_ds = DeidentifyDataset(lookup).deidentify_dates(ds)
+    assert deid_ds.SeriesDate is None
+
+
+def test_deidentify_dates_with_positive_timeshift(datetime_dataset):
+    """Test returns date element shifted by time shift."""
+    lookup = LookupID(time_shift=16)
+    deid_ds = DeidentifyDataset(lookup).deidentify_dates(datetime_dataset)
+    assert deid_ds.data_element('SeriesDate').value == '19730910'
+    assert deid_ds.StudyDate == '20190218'
+    assert deid_ds.AcquisitionDateTime == '19800517163601'
+    assert deid_ds.AcquisitionDate == '19800517'
+    assert deid_ds.PatientBirthDate is None
+
+
+def test_deidentify_dates_with_negative_timeshift(datetime_dataset):
+    """Test deidentify dates without date shift. Same string will be returned."""
+    lookup = LookupID(time_shift=-30)
+    deid_ds = DeidentifyDataset(lookup).deidentify_dates(datetime_dataset)
+    assert deid_ds.data_element('SeriesDate').value == '19730726'
+    assert deid_ds.StudyDate == '20190103'
+    assert deid_ds.AcquisitionDateTime == '19800401163601'
+    assert deid_ds.AcquisitionDate == '19800401'
+    assert deid_ds.PatientBirthDate is None
+
+
+@pytest.mark.parametrize("ds", [quick_dataset(SeriesDate="1973082", AcquisitionDateTime="19730825121212120000"),
+                                quick_dataset(SeriesDate="197382", AcquisitionDateTime="1973085121212120000"),
+                                quick_dataset(SeriesDate="19732", AcquisitionDateTime="197308512212120000"),
+                                ],
+                         )
+def test_deidentify_dates_with_wrong_date_length(ds):
+    """Test returns None if wrong date or datetime length."""
+    lookup = LookupID(time_shift=30)
+    deid_ds = DeidentifyDataset(lookup).deidentify_dates(ds)
+    assert deid_ds.data_element('SeriesDate').value is None
+    assert deid_ds.AcquisitionDateTime is None
+
+
+def test_deidentify_dates_with_wrong_time_shift_type(datetime_dataset):
+    """Test returns None if wrong date or datetime length."""
+    lookup = LookupID(time_shift='e')
+    deid_ds = DeidentifyDataset(lookup).deidentify_dates(datetime_dataset)
+    assert deid_ds.data_element('SeriesDate').value is None
+    assert deid_ds.AcquisitionDateTime is None
+
+
+@pytest.mark.parametrize("ds",
+                         [quick_dataset(SOPInstanceUID='1.2.840.10008.5.1.4.1.1.11.1',
+                                        StudyInstanceUID='2.25.22070338010590029158579',
+                                        SeriesInstanceUID='2.25.22070338010590029158579'),
+                          quick_dataset(PatientID=1),
+                          quick_dataset(SeriesDescription="Annotation"),
+                          quick_dataset(SOPInstanceUID="1.2.840.10008.5.1.4.1.1.11.1",
+                                        StudyInstanceUID="not_annotation"),
+                          ],
+                         )
+def test_add_deid_uids(a_lookup, ds):
+    """Test add de-identified uids are ok."""
+    ds.file_meta = Dataset()
+    ds.file_meta.MediaStorageSOPInstanceUID = 'a_UID'
+    ds_uid = DeidentifyDataset(a_lookup).add_deid_uids(ds)
+    assert ds_uid.PatientID == 'a_patient_id'
+    assert ds_uid.StudyInstanceUID == '1.25.220703380105900291585793573'
+    assert ds_uid.SeriesInstanceUID == '2.25.22070338010590029158579357354431'
+    assert ds_uid.SOPInstanceUID != '1.2.840.10008.5.1.4.1.1.11.1'
+    assert ds_uid.SOPInstanceUID == a_lookup.deid_sop_uid
+
+
+@pytest.mark.parametrize("ds",
+                         [quick_dataset(SOPClassUID="1.2.840.10008.5.1.4.1.1.11.1",
+                                        StudyInstanceUID="1.2.33333333333",
+                                        SeriesInstanceUID="1.3.44444444444"),
+                          quick_dataset(PatientID=1),
+                          quick_dataset(SeriesDescription="Annotation"),
+                          quick_dataset(SOPClassUID="1.2.840.10008.5.1.4.1.1.11.1",
+                                        StudyInstanceUID="not_annotation"),
+                          ],
+                         )
+def test_add_deid_uids_with_wrong_types_throw_error(wrong_type_lookup, ds):
+    """Test add de-identified uids are ok."""
+    ds.file_meta = Dataset()
+    ds.file_meta.MediaStorageSOPInstanceUID = 'a_UID'
+
+    with pytest.raises(ValueError):
+        DeidentifyDataset(wrong_type_lookup).add_deid_uids(ds)
+
+
+def test_get_deid_dataset_good(datetime_dataset, a_lookup):
+    """Test get de-identified file data set."""
+    datetime_dataset.file_meta = Dataset()
+    datetime_dataset.preamble = 'b'
+    datetime_dataset.file_meta.MediaStorageSOPInstanceUID = 'a_UID'
+    file_ds, lookup = DeidentifyDataset(a_lookup).get_deid_dataset(datetime_dataset)
+    assert lookup.deid_sop_uid is not None
+    assert file_ds.file_meta.MediaStorageSOPInstanceUID is not None
+    assert file_ds.SOPInstanceUID == lookup.deid_sop_uid
+    assert file_ds.file_meta.MediaStorageSOPInstanceUID == lookup.deid_sop_uid
+    assert file_ds.SeriesDate == '19730826'
+    assert file_ds.AcquisitionTime == '163601'
+
+
+@pytest.mark.parametrize("lookup", [LookupID(time_shift=0, filename='a_filename'),
+                                    LookupID(time_shift=None, filename='a_filename')
+                                    ],
+                         )
+def test_get_deid_dataset_no_timeshift(datetime_dataset, lookup):
+    """Test set file data set deletes all times from data set."""
+    datetime_dataset.file_meta = Dataset()
+    datetime_dataset.preamble = 'b'
+    file_ds, lookup = DeidentifyDataset(lookup).get_deid_dataset(datetime_dataset)
+    assert file_ds.SeriesDate is None
+
+    with pytest.raises(AttributeError):
+        print(file_ds.AcquisitionTime)
+
+
+def test_quick_dataset():
+    test = quick_dataset(PatientID=123, PatientName="Jack", StudyDescription="Test")
+    assert test.PatientID == 123
+    assert test.PatientName == "Jack"
+    assert test.StudyDescription == "Test"
+
+    with pytest.raises(ValueError):
+        quick_dataset(unknown_tag="should fail")
+
+
+def test_set_new_data_element_by_name():
+    """Dataset: set new data_element by name."""
+    ds = Dataset()
+    ds.TreatmentMachineName = "unit #1"
+    data_element = ds[0x300a, 0x00b2]
+    assert "unit #1" == data_element.value
+    assert "SH" == data_element.VR
+
+
+def test_add_deid_uids_with_uid_key():
+    """Test uids are derived from original uids with a uid key."""
+    def a_dataset():
+        ds = quick_dataset(PatientID='12345', StudyInstanceUID='1.2.3', SeriesInstanceUID='1.2.3.4',
+                           SOPInstanceUID='1.2.3.4.5')
+        ds.file_meta = Dataset()
+        return ds
+
+    first = DeidentifyDataset(LookupID(), uid_key=b'secret').add_deid_uids(a_dataset())
+    second = DeidentifyDataset(LookupID(), uid_key=b'secret').add_deid_uids(a_dataset())
+    assert first.PatientID == second.PatientID != '12345'
+    assert first.StudyInstanceUID == second.StudyInstanceUID != '1.2.3'
+    assert first.SeriesInstanceUID == second.SeriesInstanceUID
+    assert first.SOPInstanceUID == second.SOPInstanceUID == first.file_meta.MediaStorageSOPInstanceUID
+
+    random = DeidentifyDataset(LookupID()).add_deid_uids(a_dataset())
+    assert random.StudyInstanceUID != first.StudyInstanceUID
+
+
+def test_get_deid_dataset_without_copy_returns_input(a_dataset_with_transfer_syntax):
+    """Test a file data set is de-identified in place with copy=False, same as with copy."""
+    ds = FileDataset('original.dcm', a_dataset_with_transfer_syntax, preamble=b'\0' * 128,
+                     file_meta=a_dataset_with_transfer_syntax.file_meta)
+    expected, _ = DeidentifyDataset(LookupID(time_shift=1, deid_sop_uid='1.2.3',
+                                             deid_patient_id='patient', deid_study_uid='1.2',
+                                             deid_series_uid='1.2.4'), uid_key=b'key').get_deid_dataset(deepcopy(ds))
+    file_ds, _ = DeidentifyDataset(LookupID(time_shift=1, filename='deid.dcm', deid_sop_uid='1.2.3',
+                                            deid_patient_id='patient', deid_study_uid='1.2',
+                                            deid_series_uid='1.2.4'), uid_key=b'key').get_deid_dataset(ds, copy=False)
+    assert file_ds is ds
+    assert file_ds.filename == 'deid.dcm'
+    assert file_ds.PixelData is a_dataset_with_transfer_syntax.PixelData
+    assert [(e.tag, e.value) for e in file_ds.iterall() if e.VR != 'SQ'] \
+        == [(e.tag, e.value) for e in expected.iterall() if e.VR != 'SQ']
+
+
+def test_get_deid_dataset_without_copy_wraps_dataset(datetime_dataset, a_lookup):
+    """Test a data set is wrapped without copying its elements with copy=False."""
+    datetime_dataset.file_meta = Dataset()
+    datetime_dataset.preamble = b'\0' * 128
+    file_ds, _ = DeidentifyDataset(a_lookup).get_deid_dataset(datetime_dataset, copy=False)
+    assert isinstance(file_ds, FileDataset)
+    assert file_ds['SeriesDate'] is datetime_dataset['SeriesDate']
+    assert file_ds.SeriesDate == '19730826'
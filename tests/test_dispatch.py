@@ -0,0 +1,118 @@
+"""
+Test compiled rule sets (dispatch module)
+"""
+import copy
+import warnings
+
+import pytest
+from dicomgenerator.factory import CTDatasetFactory
+from idiscore.core import Core, Profile
+from idiscore.nema import RuleSet, Rule
+from idiscore.identifiers import SingleTag, RepeatingGroup
+from idiscore.operators import Remove, Keep, Empty
+from pydicom import Dataset
+from pydicom.sequence import Sequence
+
+from src.dicomdeidentifier.core_registry import get_compiled_rules
+from src.dicomdeidentifier.dispatch import (RuleConflictWarning, compile_rule_sets,
+                                            deidentify_compiled)
+from src.dicomdeidentifier.rule_sets import DeclaredRuleSet, timeshift_custom_ruleset, no_times_ruleset
+
+
+def test_compile_rule_sets_later_rule_sets_overrule():
+    """Test single tags are keyed on int and later rule sets win."""
+    first = RuleSet(rules=[Rule(SingleTag("00100010"), Remove()), Rule(SingleTag("00100020"), Keep())])
+    second = RuleSet(rules=[Rule(SingleTag("00100010"), Empty())])
+    compiled = compile_rule_sets(first, second)
+    assert type(compiled.get_operator(0x00100010)) is Empty
+    assert type(compiled.get_operator(0x00100020)) is Keep
+    assert compiled.get_operator(0x00100030) is None
+
+
+def test_compile_rule_sets_repeating_groups_most_specific_first():
+    """Test repeating groups are matched by mask, the most specific first."""
+    rule_set = RuleSet(rules=[Rule(RepeatingGroup("50xx,xxxx"), Remove()),
+                              Rule(RepeatingGroup("5010,xxxx"), Keep())])
+    compiled = compile_rule_sets(rule_set)
+    assert type(compiled.get_operator(0x50103000)) is Keep
+    assert type(compiled.get_operator(0x50203000)) is Remove
+    assert compiled.get_operator(0x60003000) is None
+
+
+def test_compile_rule_sets_keeps_rule_keys():
+    """Test the key of the rule in effect is found like its operator."""
+    first = RuleSet(rules=[Rule(SingleTag("00100010"), Remove()), Rule(RepeatingGroup("50xx,xxxx"), Remove())])
+    second = RuleSet(rules=[Rule(SingleTag("00100010"), Empty()), Rule(RepeatingGroup("5010,xxxx"), Keep())])
+    compiled = compile_rule_sets(first, second)
+    assert set(compiled.rules) == {'00100010', '50xxxxxx', '5010xxxx'}
+    assert type(compiled.rules['00100010'].operation) is Empty
+    assert compiled.get_rule_key(0x00100010) == '00100010'
+    assert compiled.get_rule_key(0x50103000) == '5010xxxx'
+    assert compiled.get_rule_key(0x50203000) == '50xxxxxx'
+    assert compiled.get_rule_key(0x60003000) is None
+
+
+def test_compile_rule_sets_reports_conflicts():
+    """Test duplicate and conflicting tags are reported."""
+    rule_set = DeclaredRuleSet(rules=[Rule(SingleTag("30080056"), Remove()),
+                                      Rule(SingleTag("30080056"), Empty())])
+    with pytest.warns(RuleConflictWarning, match="30080056"):
+        compiled = compile_rule_sets(rule_set)
+    assert [conflict.tag for conflict in compiled.conflicts] == ['30080056']
+    assert compiled.conflicts[0].is_conflicting
+
+    rule_set = DeclaredRuleSet(rules=[Rule(SingleTag("00100010"), Remove()),
+                                      Rule(SingleTag("00100010"), Remove())])
+    with pytest.warns(RuleConflictWarning, match="duplicate"):
+        compiled = compile_rule_sets(rule_set)
+    assert not compiled.conflicts[0].is_conflicting
+
+
+def test_shipped_rule_sets_have_no_conflicts():
+    """Test the rule sets of the package compile without duplicate or conflicting rules."""
+    with warnings.catch_warnings():
+        warnings.simplefilter('error', RuleConflictWarning)
+        compiled = compile_rule_sets(timeshift_custom_ruleset, no_times_ruleset)
+    assert compiled.conflicts == []
+
+
+def test_deidentify_compiled(a_dataset):
+    """Test rules are applied in place."""
+    rule_set = RuleSet(rules=[Rule(SingleTag("PatientName"), Remove()),
+                              Rule(SingleTag("PatientID"), Empty()),
+                              Rule(RepeatingGroup("50xx,xxxx"), Remove())])
+    deid_ds = deidentify_compiled(a_dataset, compile_rule_sets(rule_set))
+    assert deid_ds is a_dataset
+    assert 'PatientName' not in deid_ds
+    assert deid_ds.PatientID is None
+    assert (0x5010, 0x3000) not in deid_ds
+    assert deid_ds.Modality == 'CT'
+
+
+@pytest.mark.parametrize("rule_sets", [(timeshift_custom_ruleset,),
+                                       (timeshift_custom_ruleset, no_times_ruleset)])
+def test_deidentify_compiled_same_as_idiscore(rule_sets):
+    """Test the fast path gives the same tags as idiscore's core, but for the removed sequences."""
+    dataset = CTDatasetFactory()
+    expected = Core(profile=Profile(rule_sets=list(rule_sets))).deidentify(copy.deepcopy(dataset))
+    compiled = get_compiled_rules(*rule_sets)
+    removed_sequences = {element.tag for element in dataset
+                         if element.VR == 'SQ' and type(compiled.get_operator(element.tag)) is Remove}
+    deid_ds = deidentify_compiled(dataset, compiled)
+    assert sorted(deid_ds.keys()) == sorted(set(expected.keys()) - removed_sequences)
+
+
+def test_deidentify_compiled_applies_rules_of_sequences(a_dataset):
+    """Test the items of a removed sequence are not kept, the items of a kept sequence are recursed."""
+    performer = Dataset()
+    performer.PatientName = 'Doe^John'
+    a_dataset.ActualHumanPerformersSequence = Sequence([performer])
+    kept = Dataset()
+    kept.PatientName = 'Doe^John'
+    a_dataset.ReferencedSOPSequence = Sequence([kept])
+    rule_set = RuleSet(rules=[Rule(SingleTag("ActualHumanPerformersSequence"), Remove()),
+                              Rule(SingleTag("ReferencedSOPSequence"), Keep()),
+                              Rule(SingleTag("PatientName"), Remove())])
+    deid_ds = deidentify_compiled(a_dataset, compile_rule_sets(rule_set))
+    assert 'ActualHumanPerformersSequence' not in deid_ds
+    assert 'PatientName' not in deid_ds.ReferencedSOPSequence[0]
@@ -0,0 +1,73 @@
+"""
+Test metadata export module
+"""
+import io
+import json
+import sys
+
+import pytest
+from dicomgenerator.factory import CTDatasetFactory
+
+from src.dicomdeidentifier.export import (MetadataExporter, NDJSONExporter, ParquetExporter, column_value,
+                                          default_columns)
+from tests.factories import quick_dataset
+
+
+def test_default_columns_survive_rule_set():
+    """Test removed, emptied or replaced elements are not in the columns."""
+    columns = default_columns()
+    assert 'SOPInstanceUID' in columns
+    assert 'Modality' in columns
+    assert 'StudyDescription' not in columns  # removed
+    assert 'PatientSex' not in columns  # emptied
+
+
+def test_column_value():
+    """Test values are strings, multiple values joined, sequences and missing values None."""
+    ds = quick_dataset(PixelSpacing=[0.5, 0.5], Rows=512, PatientID='', ReferencedStudySequence=[])
+    assert column_value(ds, 'PixelSpacing') == '0.5\\0.5'
+    assert column_value(ds, 'Rows') == '512'
+    assert column_value(ds, 'PatientID') is None
+    assert column_value(ds, 'ReferencedStudySequence') is None
+    assert column_value(ds, 'Modality') is None
+
+
+def test_ndjson_exporter_writes_rows_in_bulk():
+    """Test one line per data set with all columns, written per row group."""
+    fp = io.StringIO()
+    with NDJSONExporter(fp, columns=['Modality', 'Rows'], row_group_size=2) as exporter:
+        exporter.add(quick_dataset(Modality='CT', Rows=512))
+        assert fp.getvalue() == ''
+        exporter.add_all([quick_dataset(Modality='MR'), quick_dataset(Rows=1)])
+        assert len(fp.getvalue().splitlines()) == 2
+    rows = [json.loads(line) for line in fp.getvalue().splitlines()]
+    assert rows == [{'Modality': 'CT', 'Rows': '512'},
+                    {'Modality': 'MR', 'Rows': None},
+                    {'Modality': None, 'Rows': '1'}]
+    assert exporter.count == 3
+
+
+def test_parquet_exporter(tmp_path):
+    """Test a parquet file with stable schema and row groups."""
+    parquet = pytest.importorskip('pyarrow.parquet')
+    path = str(tmp_path / 'metadata.parquet')
+    with ParquetExporter(path, row_group_size=2) as exporter:
+        exporter.add_all(CTDatasetFactory() for _ in range(3))
+
+    table = parquet.read_table(path)
+    assert table.num_rows == 3
+    assert table.column_names == default_columns()
+    assert parquet.ParquetFile(path).num_row_groups == 2
+
+
+def test_parquet_exporter_names_the_extra(tmp_path, monkeypatch):
+    """Test a missing pyarrow raises an error naming the parquet extra."""
+    monkeypatch.setitem(sys.modules, 'pyarrow', None)
+    with pytest.raises(ImportError, match=r'dicomdeidentifier\[parquet\]'):
+        ParquetExporter(str(tmp_path / 'metadata.parquet'))
+
+
+def test_metadata_exporter_needs_write_rows():
+    """Test the base exporter cannot be used without a writer."""
+    with pytest.raises(TypeError):
+        MetadataExporter()
@@ -0,0 +1,66 @@
+"""
+Test import time of the de-identifier
+"""
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+DEFERRED_MODULES = ('idiscore', 'faker', 'dicomgenerator')
+# self import time of the package modules, in interpreter start-ups (python -c pass)
+IMPORT_TIME_BUDGET = 1.0
+ROUNDS = 5
+
+
+def import_in_new_process(module: str):
+    """The modules loaded by importing the module in a new interpreter."""
+    code = f"import sys, {module}; print(' '.join(sys.modules))"
+    process = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                             cwd=Path(__file__).parent.parent, check=True)
+    return process.stdout.split()
+
+
+def test_import_defers_idiscore():
+    """Test idiscore (and faker, which it imports) is imported on first use, not with the package."""
+    modules = import_in_new_process('src.dicomdeidentifier.deidentify_dicom')
+    assert not [module for module in modules if module.split('.')[0] in DEFERRED_MODULES]
+
+
+def test_rule_sets_are_built_on_first_use():
+    modules = import_in_new_process('src.dicomdeidentifier.rule_sets')
+    assert 'src.dicomdeidentifier.rule_definitions' not in modules
+
+    from src.dicomdeidentifier import rule_definitions, rule_sets
+    assert rule_sets.timeshift_custom_ruleset is rule_definitions.timeshift_custom_ruleset
+
+
+def start_up_seconds() -> float:
+    """Best wall-clock time of starting a new interpreter (python -c pass)."""
+    times = []
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', 'pass'], check=True)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def package_import_seconds(module: str) -> float:
+    """Self import time (-X importtime) of the package modules, importing the module in a new interpreter."""
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], capture_output=True,
+                             text=True, cwd=Path(__file__).parent.parent, check=True)
+    seconds = 0.0
+    for line in process.stderr.splitlines():
+        if line.startswith('import time:') and '|' in line:
+            self_time, _, name = line[len('import time:'):].split('|')
+            if self_time.strip().isdigit() and name.strip().startswith('src.dicomdeidentifier'):
+                seconds += int(self_time) / 1e6
+    return seconds
+
+
+@pytest.mark.slow
+def test_import_time_budget():
+    """Test the package modules import in at most IMPORT_TIME_BUDGET interpreter start-ups (pydicom not counted)."""
+    own = min(package_import_seconds('src.dicomdeidentifier.deidentify_dicom') for _ in range(ROUNDS))
+    assert 0 < own < IMPORT_TIME_BUDGET * start_up_seconds()
@@ -0,0 +1,55 @@
+"""
+Test in-place de-identification module
+"""
+import os
+
+import pytest
+from pydicom import dcmread
+from pydicom.dataset import FileMetaDataset
+from pydicom.uid import ImplicitVRLittleEndian, ExplicitVRLittleEndian
+
+from src.dicomdeidentifier.deidentify_dicom import LookupID
+from src.dicomdeidentifier.inplace import PADDING_CREATOR, PADDING_GROUP, deidentify_file_in_place
+from tests.factories import quick_dataset, write_ct_file
+
+
+@pytest.mark.parametrize("transfer_syntax", [ExplicitVRLittleEndian, ImplicitVRLittleEndian])
+def test_deidentify_file_in_place_patches_header(tmp_path, transfer_syntax):
+    """Test a smaller header is padded and written over the original header."""
+    path = str(tmp_path / 'file.dcm')
+    original = write_ct_file(path, transfer_syntax)
+    size = os.path.getsize(path)
+
+    lookup, patched = deidentify_file_in_place(path, lambda ds: LookupID(time_shift=1))
+
+    assert patched
+    ds = dcmread(path)
+    assert os.path.getsize(path) == size - (16 if transfer_syntax == ExplicitVRLittleEndian else 12)  # padding
+    assert ds.PixelData == original.PixelData
+    assert ds.SOPInstanceUID == lookup.deid_sop_uid
+    assert ds.StudyDate == '20200102'
+    assert ds.PatientName == ''
+    assert 0xFFFCFFFC not in ds
+    assert ds.private_block(PADDING_GROUP, PADDING_CREATOR)
+
+
+def test_deidentify_file_in_place_rewrites_larger_header(tmp_path):
+    """Test the file is rewritten (with its mode) if the de-identified header is larger."""
+    path = str(tmp_path / 'file.dcm')
+    ds = quick_dataset(PatientID='1', SOPInstanceUID='1.2', SOPClassUID='1.2.840.10008.5.1.4.1.1.2',
+                       BitsAllocated=8, PixelData=b'\1\2\3\4')
+    ds.file_meta = FileMetaDataset()
+    ds.file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
+    ds.is_little_endian, ds.is_implicit_VR = True, False
+    ds.save_as(path, write_like_original=False)
+    os.chmod(path, 0o644)
+
+    lookup, patched = deidentify_file_in_place(path)
+
+    assert not patched
+    assert os.stat(path).st_mode & 0o777 == 0o644
+    ds = dcmread(path)
+    assert ds.PixelData == b'\1\2\3\4'
+    assert ds.PatientIdentityRemoved == 'YES'
+    assert ds.SOPInstanceUID == lookup.deid_sop_uid
+    assert [name for name in os.listdir(tmp_path)] == ['file.dcm']
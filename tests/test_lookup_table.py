@@ -0,0 +1,62 @@
+"""
+Test look-up table module
+"""
+import csv
+import io
+import pickle
+import sys
+
+import pytest
+
+from src.dicomdeidentifier.deidentify_dicom import LookupID
+from src.dicomdeidentifier.lookup_table import COLUMNS, LookupTable
+
+
+def some_lookups(size: int):
+    for number in range(size):
+        yield LookupID(filename=f'file{number}.dcm', deid_patient_id='patient',
+                       deid_study_uid=''.join(['2.25.', '1']), deid_series_uid=f'2.25.1.{number % 2}',
+                       deid_sop_uid=f'2.25.1.{number % 2}.{number}', time_shift=-3, private_tags=number == 0,
+                       private_tags_removed=1 if number == 0 else 0)
+
+
+def test_lookup_is_slotted():
+    lookup = LookupID(time_shift=1)
+    assert not hasattr(lookup, '__dict__')
+    with pytest.raises(AttributeError):
+        lookup.unknown = 1
+    assert pickle.loads(pickle.dumps(lookup)) == lookup
+
+
+def test_table_interns_repeated_uids():
+    table = LookupTable(some_lookups(4))
+    assert len(table) == 4
+    studies = table.columns['deid_study_uid']
+    assert studies[0] is studies[3]
+    assert table.columns['deid_series_uid'][0] is table.columns['deid_series_uid'][2]
+    assert list(table) == list(some_lookups(4))
+
+
+def test_table_to_csv():
+    fp = io.StringIO(newline='')
+    LookupTable(some_lookups(2)).to_csv(fp)
+    rows = list(csv.reader(io.StringIO(fp.getvalue())))
+    assert tuple(rows[0]) == COLUMNS
+    assert rows[1] == ['file0.dcm', 'patient', '2.25.1', '2.25.1.0', '2.25.1.0.0', '-3', 'True', '1']
+    assert len(rows) == 3
+
+
+def test_table_to_parquet(tmp_path):
+    parquet = pytest.importorskip('pyarrow.parquet')
+    path = str(tmp_path / 'lookups.parquet')
+    LookupTable(some_lookups(3)).to_parquet(path)
+    table = parquet.read_table(path)
+    assert table.column_names == list(COLUMNS)
+    assert table.column('time_shift').to_pylist() == [-3, -3, -3]
+    assert table.column('deid_sop_uid').to_pylist()[2] == '2.25.1.0.2'
+
+
+def test_table_to_parquet_names_the_extra(tmp_path, monkeypatch):
+    monkeypatch.setitem(sys.modules, 'pyarrow', None)
+    with pytest.raises(ImportError, match=r'dicomdeidentifier\[parquet\]'):
+        LookupTable(some_lookups(1)).to_parquet(str(tmp_path / 'lookups.parquet'))
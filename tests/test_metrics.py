@@ -0,0 +1,58 @@
+"""
+Test metrics module
+"""
+from src.dicomdeidentifier.deidentify_dicom import DeidentifyDataset, LookupID
+from src.dicomdeidentifier.dispatch import CompiledRuleSet
+from src.dicomdeidentifier.metrics import NULL_CONTEXT, InMemoryCollector, PrometheusCollector, timed
+
+STAGES = {'total', 'uids', 'walk', 'file_dataset'}
+
+
+def test_timed_without_collector_is_no_op():
+    assert timed(None, 'rules') is NULL_CONTEXT
+
+
+def test_get_deid_dataset_records_stages_and_counters(a_dataset_with_transfer_syntax):
+    """Test all stages are timed and the removed elements are counted per rule."""
+    private_tags = sum(1 for element in a_dataset_with_transfer_syntax.iterall() if element.tag.is_private)
+    collector = InMemoryCollector()
+    DeidentifyDataset(LookupID(time_shift=1), metrics=collector).get_deid_dataset(a_dataset_with_transfer_syntax)
+
+    assert set(collector.stages) == STAGES
+    assert all(statistics.count == 1 for statistics in collector.stages.values())
+    assert collector.get_count('elements_touched') > 100
+    assert collector.get_count('elements_removed', rule='(0010, 21b0) Remove') == 1
+    assert collector.get_count('elements_removed') > 1
+    assert collector.get_count('private_tags_removed') == private_tags
+
+
+class FailingOperator:
+    """Operator whose de-identification fails."""
+
+    def apply(self, element, dataset):
+        raise ValueError("invalid value")
+
+
+def test_swallowed_errors_are_counted(a_dataset_with_transfer_syntax, monkeypatch):
+    """Test the operator errors, which are ignored (element removed), are counted."""
+    monkeypatch.setattr('src.dicomdeidentifier.deidentify_dicom.get_compiled_rules',
+                        lambda *rule_sets: CompiledRuleSet(single={0x00100010: FailingOperator()}))
+    collector = InMemoryCollector()
+    deid_ds, _ = DeidentifyDataset(LookupID(time_shift=1), metrics=collector)\
+        .get_deid_dataset(a_dataset_with_transfer_syntax)
+    assert collector.get_count('swallowed_errors', error='ValueError') == 1
+    assert collector.get_count('elements_removed') == 0
+    assert 'PatientName' not in deid_ds
+
+
+def test_prometheus_render():
+    collector = PrometheusCollector()
+    collector.observe('rules', 0.5)
+    collector.observe('rules', 0.25)
+    collector.count('elements_removed', 2, rule='(0010, 1000) "Remove"')
+    text = collector.render()
+
+    assert '# TYPE dicom_deidentify_stage_seconds summary' in text
+    assert 'dicom_deidentify_stage_seconds_sum{stage="rules"} 0.75' in text
+    assert 'dicom_deidentify_stage_seconds_count{stage="rules"} 2' in text
+    assert 'dicom_deidentify_elements_removed_total{rule="(0010, 1000) \\"Remove\\""} 2' in text
@@ -0,0 +1,99 @@
+"""
+Test file pipeline module
+"""
+import shutil
+
+import pytest
+from dicomgenerator.factory import CTDatasetFactory
+from pydicom import dcmread
+from pydicom.sequence import Sequence
+
+from src.dicomdeidentifier.batch import deidentify_batch
+from src.dicomdeidentifier.inplace import deidentify_file_in_place
+from src.dicomdeidentifier.pipeline import DerivedLookupFactory, deidentify_directory, deidentify_file, iter_files
+from src.dicomdeidentifier.uids import keyed_uid
+from tests.factories import quick_dataset, write_ct_file
+
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_deidentify_directory(a_dicom_directory, tmp_path, workers):
+    """Test files are written to the same relative path with consistent uids."""
+    dst = tmp_path / 'dst'
+    results = list(deidentify_directory(str(a_dicom_directory), str(dst), workers=workers,
+                                        lookup_factory=DerivedLookupFactory(time_shift=2), chunksize=2))
+
+    assert [result.source for result in results] == list(iter_files(str(a_dicom_directory)))
+    assert [result.error is not None for result in results] == [True] + [False] * 6
+
+    datasets = [dcmread(result.destination) for result in results[1:]]
+    assert len({ds.StudyInstanceUID for ds in datasets}) == 1
+    assert len({ds.SeriesInstanceUID for ds in datasets}) == 2
+    assert len({ds.PatientID for ds in datasets}) == 1
+    assert datasets[0].StudyInstanceUID != '1.2.3'
+    assert datasets[0].StudyDate == '20200103'
+    assert results[1].lookup.deid_sop_uid == datasets[0].SOPInstanceUID
+
+
+def test_deidentify_directory_unordered(a_dicom_directory, tmp_path):
+    """Test unordered results contain all files."""
+    results = deidentify_directory(str(a_dicom_directory), str(tmp_path / 'dst'), workers=2,
+                                   ordered=False, chunksize=1)
+    assert sorted(result.source for result in results) == sorted(iter_files(str(a_dicom_directory)))
+
+
+def test_derived_lookup_factory_is_deterministic():
+    """Test same key gives same ids, another key other ids."""
+    ds = CTDatasetFactory(PatientID='patient', StudyInstanceUID='1.2.3', SeriesInstanceUID='1.2.3.4')
+    lookup = DerivedLookupFactory(key=b'key')(ds)
+    assert lookup == DerivedLookupFactory(key=b'key')(ds)
+    assert lookup.deid_study_uid.startswith('2.25.')
+    assert len(lookup.deid_study_uid) <= 64
+    assert lookup.deid_study_uid != DerivedLookupFactory(key=b'other')(ds).deid_study_uid
+
+    fixed = DerivedLookupFactory(key=b'key', deid_patient_id='patient', deid_study_uid='2.25.1')(ds)
+    assert (fixed.deid_patient_id, fixed.deid_study_uid) == ('patient', '2.25.1')
+    assert fixed.deid_series_uid == lookup.deid_series_uid
+
+
+def test_deidentify_directory_streaming(a_dicom_directory, tmp_path):
+    """Test streaming keeps the pixel data."""
+    results = list(deidentify_directory(str(a_dicom_directory), str(tmp_path / 'dst'), workers=0, streaming=True))
+    assert [result.error is not None for result in results] == [True] + [False] * 6
+    assert dcmread(results[1].destination).PixelData == dcmread(results[1].source).PixelData
+
+
+def a_referencing_file(path):
+    """CT file with a reference to an instance of another study in a nested sequence."""
+    write_ct_file(path)
+    ds = dcmread(str(path))
+    reference = quick_dataset(StudyInstanceUID='9.8.7', SeriesInstanceUID='9.8.7.6')
+    ds.StudiesContainingOtherReferencedInstancesSequence = Sequence([
+        quick_dataset(ReferencedSOPSequence=Sequence([reference]))])
+    ds.save_as(str(path))
+    return str(path)
+
+
+def deidentify_once(mode, source, destination):
+    """De-identify the file with a new factory of the same key, the de-identified data set."""
+    factory = DerivedLookupFactory(key=b'key')
+    if mode == 'batch':
+        return next(deidentify_batch([dcmread(source)], factory))[0]
+    if mode == 'in_place':
+        shutil.copyfile(source, destination)
+        deidentify_file_in_place(destination, factory)
+    else:
+        assert deidentify_file(source, destination, factory, streaming=mode == 'streaming').error is None
+    return dcmread(destination)
+
+
+@pytest.mark.parametrize("mode", ['file', 'streaming', 'in_place', 'batch'])
+def test_nested_references_are_the_same_in_every_run(tmp_path, mode):
+    """Test UIDs in sequences are derived with the key of the factory, so references stay valid across runs."""
+    source = a_referencing_file(tmp_path / 'source.dcm')
+    first, second = (deidentify_once(mode, source, str(tmp_path / f'deid_{run}.dcm')) for run in range(2))
+
+    references = [ds.StudiesContainingOtherReferencedInstancesSequence[0].ReferencedSOPSequence[0]
+                  for ds in (first, second)]
+    assert references[0].StudyInstanceUID == references[1].StudyInstanceUID == keyed_uid('9.8.7', b'key')
+    assert references[0].SeriesInstanceUID == references[1].SeriesInstanceUID == keyed_uid('9.8.7.6', b'key')
+    assert first.SOPInstanceUID == second.SOPInstanceUID
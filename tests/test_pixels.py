@@ -0,0 +1,141 @@
+"""
+Test pixels module
+"""
+import json
+import tracemalloc
+
+import numpy as np
+import pytest
+from pydicom import dcmread
+from pydicom.dataset import Dataset, FileMetaDataset
+from pydicom.uid import ExplicitVRLittleEndian, JPEGBaseline8Bit, RLELossless
+
+from src.dicomdeidentifier.deidentify_dicom import DeidentifyDataset, LookupID
+from src.dicomdeidentifier.pixels import (FrameFormat, PixelLocation, PixelProcessor, PixelScrubError, Region,
+                                          load_pixel_locations)
+from src.dicomdeidentifier.streaming import deidentify_file_streaming
+
+REGIONS = (Region(x=1, y=0, width=3, height=2), Region(x=4, y=3, width=10, height=10))
+
+
+def an_image(frames=3, samples=1, bits=8, photometric='MONOCHROME2', manufacturer='Acme', modality='US'):
+    """Image of 4 x 6 pixels with a file meta, as read from a file."""
+    ds = Dataset()
+    ds.file_meta = FileMetaDataset()
+    ds.file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
+    ds.file_meta.MediaStorageSOPClassUID = '1.2.840.10008.5.1.4.1.1.3.1'
+    ds.preamble = b'\0' * 128
+    ds.is_little_endian, ds.is_implicit_VR = True, False
+    ds.SOPClassUID = ds.file_meta.MediaStorageSOPClassUID
+    ds.SOPInstanceUID = '1.2.3.4.5'
+    ds.PatientID = '12345'
+    ds.Modality = modality
+    ds.Manufacturer = manufacturer
+    ds.Rows, ds.Columns = 4, 6
+    ds.SamplesPerPixel = samples
+    ds.BitsAllocated = ds.BitsStored = bits
+    ds.HighBit = bits - 1
+    ds.PixelRepresentation = 0
+    ds.PhotometricInterpretation = photometric
+    if samples > 1:
+        ds.PlanarConfiguration = 0
+    ds.NumberOfFrames = frames
+    shape = (frames, 4, 6, samples) if samples > 1 else (frames, 4, 6)
+    ds.PixelData = (np.arange(np.prod(shape)) % 200 + 1).astype(f'<u{bits // 8}').reshape(shape).tobytes()
+    return ds
+
+
+def expected_pixels(ds, fill=0):
+    arr = ds.pixel_array.copy()
+    arr[:, 0:2, 1:4] = fill
+    arr[:, 3:, 4:] = fill
+    return arr
+
+
+def a_processor(**criteria):
+    return PixelProcessor([PixelLocation(regions=(Region(0, 0, 6, 4),), modality='CT'),
+                           PixelLocation(regions=REGIONS, **criteria)])
+
+
+@pytest.mark.parametrize("samples, bits, photometric, fill", [(1, 8, 'MONOCHROME2', 0), (1, 16, 'MONOCHROME2', 0),
+                                                              (1, 16, 'MONOCHROME1', 65535), (3, 8, 'RGB', 0)])
+def test_process_native(samples, bits, photometric, fill):
+    """Test the regions of every frame are blanked, the other pixels are kept."""
+    ds = an_image(samples=samples, bits=bits, photometric=photometric)
+    expected = expected_pixels(ds, fill)
+
+    assert a_processor(manufacturer='ACME ').process(ds)
+    assert np.array_equal(ds.pixel_array, expected)
+
+
+def test_blank_native_copies_the_pixel_data_once():
+    """Test blanking allocates about one copy of the pixel data and keeps the padding byte."""
+    frame_format = FrameFormat(rows=256, columns=256, samples=1, bits_allocated=16, bits_stored=12, signed=False,
+                               photometric='MONOCHROME2', planar=False, frames=20, fill=0)
+    data = bytes(frame_format.frame_size * frame_format.frames) + b'\0'
+    tracemalloc.start()
+    try:
+        blanked = PixelProcessor.blank_native(data, frame_format, REGIONS)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert len(blanked) == len(data)
+    assert peak < 1.5 * len(data)
+
+
+def test_process_rle():
+    """Test RLE Lossless pixel data is blanked frame by frame and stays RLE Lossless."""
+    ds = an_image(samples=3, photometric='RGB')
+    expected = expected_pixels(ds)
+    ds.compress(RLELossless)
+
+    assert a_processor(modality='US').process(ds)
+    assert ds.file_meta.TransferSyntaxUID == RLELossless
+    assert np.array_equal(ds.pixel_array, expected)
+
+
+def test_process_no_match_or_lossy():
+    """Test images without a matching location are kept, lossy compressed images raise."""
+    ds = an_image()
+    pixels = ds.PixelData
+    assert not a_processor(manufacturer='Other').process(ds)
+    assert not PixelProcessor([PixelLocation(regions=REGIONS, rows=512)]).process(ds)
+    assert ds.PixelData is pixels
+
+    ds.file_meta.TransferSyntaxUID = JPEGBaseline8Bit
+    with pytest.raises(PixelScrubError):
+        a_processor().process(ds)
+
+
+def test_deidentify_dataset_with_pixel_processor():
+    """Test the pixels of the copy are blanked and the Clean Pixel Data Option is added."""
+    ds = an_image()
+    expected = expected_pixels(ds)
+    original = ds.PixelData
+
+    deid_ds, _ = DeidentifyDataset(LookupID(), pixel_processor=a_processor(manufacturer='Acme')).get_deid_dataset(ds)
+    assert np.array_equal(deid_ds.pixel_array, expected)
+    assert ds.PixelData == original
+    assert '113101' in [code.get('CodeValue') for code in deid_ds.DeidentificationMethodCodeSequence]
+    assert deid_ds.BurnedInAnnotation == 'NO'
+
+
+def test_streaming_with_pixel_processor(tmp_path):
+    """Test native pixel data is blanked while it is copied."""
+    ds = an_image(bits=16)
+    expected = expected_pixels(ds)
+    source, destination = str(tmp_path / 'source.dcm'), str(tmp_path / 'destination.dcm')
+    ds.save_as(source, write_like_original=False)
+
+    deidentify_file_streaming(source, destination, pixel_processor=a_processor(manufacturer='Acme'))
+    deid_ds = dcmread(destination)
+    assert np.array_equal(deid_ds.pixel_array, expected)
+    assert deid_ds.BurnedInAnnotation == 'NO'
+
+
+def test_load_pixel_locations(tmp_path):
+    path = tmp_path / 'locations.json'
+    path.write_text(json.dumps([{'modality': 'US', 'manufacturer': 'Acme', 'rows': 4,
+                                 'regions': [[1, 0, 3, 2], [4, 3, 10, 10]]}]))
+    assert load_pixel_locations(str(path)) == [PixelLocation(regions=REGIONS, modality='US', manufacturer='Acme',
+                                                             rows=4)]
@@ -0,0 +1,109 @@
+"""
+Test precheck module
+"""
+import io
+
+import pytest
+from pydicom import dcmread
+
+from idiscore.identifiers import SingleTag
+from idiscore.operators import Remove
+from idiscore.rules import Rule, RuleSet
+
+from src.dicomdeidentifier.deidentify_dicom import DeidentifyDataset, LookupID
+from src.dicomdeidentifier.inplace import deidentify_file_in_place
+from src.dicomdeidentifier.pipeline import deidentify_directory
+from src.dicomdeidentifier.pixels import PixelLocation, PixelProcessor, Region, has_clean_pixels
+from src.dicomdeidentifier.precheck import (REPROCESS, SKIP, VERIFY, is_deidentified, precheck, read_deid_header,
+                                            verify_header)
+
+
+@pytest.fixture
+def a_deidentified_directory(a_dicom_directory, tmp_path):
+    results = list(deidentify_directory(str(a_dicom_directory), str(tmp_path / 'deid'), workers=0))
+    return [result.destination for result in results if result.error is None]
+
+
+def test_read_deid_header(a_deidentified_directory, a_dicom_directory):
+    """Test only the de-identification elements are read, original files are not de-identified."""
+    ds = read_deid_header(a_deidentified_directory[0])
+    assert ds.PatientIdentityRemoved == 'YES'
+    assert 'PatientID' not in ds and 'PixelData' not in ds
+    assert is_deidentified(ds)
+    original = next(a_dicom_directory.glob('*/*.dcm'))
+    assert not is_deidentified(read_deid_header(str(original)))
+    assert not precheck(str(original), VERIFY)
+
+
+def test_precheck_policies(a_deidentified_directory):
+    """Test de-identified files are skipped (also verified), but never with reprocess."""
+    for path in a_deidentified_directory:
+        assert precheck(path, SKIP)
+        assert precheck(path, VERIFY)
+        assert not precheck(path, REPROCESS)
+    with open(a_deidentified_directory[0], 'rb') as fp:
+        assert precheck(io.BytesIO(fp.read()), VERIFY)
+    with pytest.raises(ValueError):
+        precheck(a_deidentified_directory[0], 'maybe')
+
+
+def test_verify_finds_identifying_elements(a_deidentified_directory, tmp_path):
+    """Test verify fails for a de-identified file with a removed or private element."""
+    ds = dcmread(a_deidentified_directory[0])
+    assert verify_header(ds) == []
+    ds.InstitutionName = 'Hospital'
+    ds.add_new(0x00090010, 'LO', 'Creator')
+    problems = verify_header(ds)
+    assert '(0008, 0080) not removed' in problems
+    assert '(0009, 0010) private' in problems
+    path = str(tmp_path / 'tampered.dcm')
+    ds.save_as(path)
+    assert precheck(path, SKIP)
+    assert not precheck(path, VERIFY)
+    assert not DeidentifyDataset(LookupID()).precheck(path, VERIFY)
+
+
+def test_deidentify_directory_skips_deidentified(a_deidentified_directory, tmp_path):
+    """Test already de-identified files are copied as they are."""
+    src = tmp_path / 'deid'
+    results = list(deidentify_directory(str(src), str(tmp_path / 'again'), workers=0, precheck_policy=VERIFY))
+    assert [result.skipped for result in results] == [True] * 6
+    for result in results:
+        with open(result.source, 'rb') as source, open(result.destination, 'rb') as destination:
+            assert source.read() == destination.read()
+
+
+def test_verify_allows_in_place_padding(a_dicom_directory, tmp_path):
+    """Test the header padding of the in-place de-identification is no identifying private block."""
+    path = str(tmp_path / 'file.dcm')
+    with open(next(a_dicom_directory.glob('*/*.dcm')), 'rb') as source, open(path, 'wb') as destination:
+        destination.write(source.read())
+    deidentify_file_in_place(path)
+    assert (0x7FDF, 0x0010) in dcmread(path)
+    assert DeidentifyDataset(LookupID()).precheck(path, VERIFY)
+
+
+def test_deidentify_directory_verifies_with_rule_sets(a_deidentified_directory, tmp_path):
+    """Test verify uses the rule sets of the run."""
+    remove_modality = RuleSet([Rule(SingleTag('00080060'), Remove())], name='No modality')
+    results = list(deidentify_directory(str(tmp_path / 'deid'), str(tmp_path / 'again'), workers=0,
+                                        precheck_policy=VERIFY, rule_sets=(remove_modality,)))
+    assert not any(result.skipped for result in results)
+    assert 'Modality' not in dcmread(results[0].destination)
+
+
+def test_deidentify_directory_blanks_skipped_files(a_deidentified_directory, tmp_path):
+    """Test skipped files with a matching pixel location are blanked, once."""
+    processor = PixelProcessor([PixelLocation(regions=(Region(0, 0, 2, 2),), modality='CT')])
+    results = list(deidentify_directory(str(tmp_path / 'deid'), str(tmp_path / 'blanked'), workers=0,
+                                        precheck_policy=SKIP, pixel_processor=processor))
+    assert all(result.skipped for result in results)
+    ds = dcmread(results[0].destination)
+    assert has_clean_pixels(ds)
+    assert not ds.pixel_array[0:2, 0:2].any()
+    assert ds.PatientID == dcmread(results[0].source).PatientID
+
+    again = list(deidentify_directory(str(tmp_path / 'blanked'), str(tmp_path / 'again'), workers=0,
+                                      precheck_policy=SKIP, pixel_processor=processor))
+    with open(again[0].source, 'rb') as source, open(again[0].destination, 'rb') as destination:
+        assert source.read() == destination.read()
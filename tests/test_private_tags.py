@@ -0,0 +1,73 @@
+"""
+Test private tag policy module
+"""
+from pydicom import Dataset
+from pydicom.sequence import Sequence
+
+from src.dicomdeidentifier.deidentify_dicom import DeidentifyDataset
+from src.dicomdeidentifier.private_tags import DIFFUSION_SAFE_PRIVATE_TAGS, PrivateTagPolicy
+
+
+def a_dataset_with_private_tags() -> Dataset:
+    ds = Dataset()
+    ds.PatientID = '12345'
+    siemens = ds.private_block(0x0019, 'SIEMENS MR HEADER', create=True)
+    siemens.add_new(0x0C, 'IS', '1000')           # b-value, safe
+    siemens.add_new(0x10, 'LO', 'operator name')  # not safe
+    other = ds.private_block(0x0019, 'OTHER VENDOR', create=True)
+    other.add_new(0x0C, 'LO', 'Doe^John')
+    item = Dataset()
+    item.private_block(0x0043, 'GEMS_PARM_01', create=True).add_new(0x39, 'IS', [1000, 0, 0, 0])
+    item.private_block(0x0045, 'GEMS_HELIOS_01', create=True).add_new(0x01, 'SS', 1)
+    ds.ReferencedSOPSequence = Sequence([item])
+    return ds
+
+
+def test_policy_without_safe_list_removes_all():
+    ds = a_dataset_with_private_tags()
+    assert PrivateTagPolicy().remove_private_tags(ds) == 9
+    assert not [element for element in ds.iterall() if element.tag.is_private]
+    assert ds.PatientID == '12345'
+
+
+def test_policy_keeps_safe_elements_and_their_creators():
+    """Test only the safe elements (and their creators) are kept, also in sequences."""
+    ds = a_dataset_with_private_tags()
+    assert PrivateTagPolicy(DIFFUSION_SAFE_PRIVATE_TAGS).remove_private_tags(ds) == 5
+
+    assert ds.private_block(0x0019, 'SIEMENS MR HEADER')[0x0C].value == '1000'
+    assert (0x0019, 0x1010) not in ds
+    assert (0x0019, 0x0011) not in ds  # creator OTHER VENDOR
+    item = ds.ReferencedSOPSequence[0]
+    assert item.private_block(0x0043, 'GEMS_PARM_01')[0x39].value == [1000, 0, 0, 0]
+    assert (0x0045, 0x0010) not in item
+
+
+def test_policy_keeps_all_elements_of_creator():
+    ds = a_dataset_with_private_tags()
+    policy = PrivateTagPolicy([(0x0019, 'SIEMENS MR HEADER ', None), (0x0019, 'SIEMENS MR HEADER', [0x0C])])
+    assert policy.index == {(0x0019, 'SIEMENS MR HEADER'): None}
+    policy.remove_private_tags(ds)
+    assert (0x0019, 0x1010) in ds
+
+
+def test_get_deid_dataset_reports_removed_private_tags(a_lookup):
+    """Test the look-up has the number of removed private tags."""
+    ds = a_dataset_with_private_tags()
+    ds.file_meta = Dataset()
+    ds.preamble = b'\0' * 128
+    deid_ds, lookup = DeidentifyDataset(a_lookup, private_policy=PrivateTagPolicy(DIFFUSION_SAFE_PRIVATE_TAGS))\
+        .get_deid_dataset(ds)
+    assert lookup.private_tags
+    assert lookup.private_tags_removed == 5
+    assert deid_ds.private_block(0x0019, 'SIEMENS MR HEADER')[0x0C].value == '1000'
+    assert deid_ds.DeidentificationMethodCodeSequence[-1].CodeValue == '113111'
+
+
+def test_get_deid_dataset_without_private_tags(a_lookup):
+    ds = Dataset()
+    ds.file_meta = Dataset()
+    ds.preamble = b'\0' * 128
+    _, lookup = DeidentifyDataset(a_lookup).get_deid_dataset(ds)
+    assert not lookup.private_tags
+    assert lookup.private_tags_removed == 0
@@ -0,0 +1,84 @@
+"""
+Test profiling module
+"""
+from idiscore.identifiers import RepeatingGroup, SingleTag
+from idiscore.operators import Empty, Keep, Remove
+from idiscore.rules import Rule, RuleSet
+from pydicom import Dataset
+
+from src.dicomdeidentifier.deidentify_dicom import INSTANCE_UID_KEYWORDS, DeidentifyDataset, LookupID
+from src.dicomdeidentifier.profiling import NO_RULE, RuleProfiler, profile_rules
+from tests.factories import quick_dataset
+
+
+def a_rule_set():
+    return RuleSet([Rule(SingleTag('00100010'), Remove()),     # Patient's Name
+                    Rule(SingleTag('00100020'), Keep()),       # Patient ID
+                    Rule(SingleTag('00081030'), Empty()),      # Study Description
+                    Rule(SingleTag('00081040'), Remove()),     # Institutional Department Name
+                    Rule(RepeatingGroup('50xx,xxxx'), Remove())], name='Small')
+
+
+def some_datasets():
+    for number in range(3):
+        ds = quick_dataset(PatientName='Doe^John', PatientID=str(number), StudyDescription='CT', Modality='CT')
+        ds.add_new(0x50000010, 'US', 1)
+        ds.file_meta = Dataset()
+        ds.preamble = b'\0' * 128
+        yield ds
+
+
+def test_profile_counts_hits_and_kinds():
+    """Test hits per rule, elements per rule kind, dead rules and tags without a rule."""
+    profile = profile_rules(some_datasets(), rule_sets=(a_rule_set(),))
+
+    assert profile.datasets == 3
+    assert profile.hits['00100010'] == 3
+    assert profile.hits['50xxxxxx'] == 3
+    assert profile.dead_rules == ['00081040']
+    assert profile.kinds['Remove'].elements == 6
+    assert profile.kinds[NO_RULE].elements == 3
+    assert profile.unmatched == {0x00080060: 3}
+
+    report = profile.report()
+    assert '1 dead' in report and '00081040' in report
+    assert profile.to_dict()['hits']['00100020'] == 3
+
+
+def test_tuned_rule_set():
+    """Test the tuned rule set is ordered by hits, pruned, and de-identifies the same on the corpus."""
+    profile = profile_rules(some_datasets(), rule_sets=(a_rule_set(),))
+    tuned = profile.tuned_rule_set(prune=True)
+    assert len(tuned.declared_rules) == 4
+    assert '00081040' not in [rule.identifier.key() for rule in tuned.declared_rules]
+
+    for ds in some_datasets():
+        expected, _ = DeidentifyDataset(LookupID(), uid_key=b'key', rule_sets=(a_rule_set(),)).get_deid_dataset(ds)
+        deid_ds, _ = DeidentifyDataset(LookupID(), uid_key=b'key', rule_sets=(tuned,)).get_deid_dataset(ds)
+        assert 'PatientName' not in deid_ds
+        # instance UIDs are random without original UIDs
+        assert [element for element in deid_ds if element.keyword not in INSTANCE_UID_KEYWORDS] == \
+               [element for element in expected if element.keyword not in INSTANCE_UID_KEYWORDS]
+
+
+def test_profile_default_rule_sets():
+    """Test the default rule sets are the rule sets of the de-identification."""
+    profiler = RuleProfiler(time_shift=10)
+    profiler.add(next(some_datasets()))
+    assert len(profiler.profile.rules) > 400
+    assert profiler.profile.hits['00100010'] == 1
+
+
+def test_profile_counts_sequence_rules():
+    """Test the rule of a sequence is counted (not dead) and the items of a removed sequence are not walked."""
+    ds = next(some_datasets())
+    ds.ActualHumanPerformersSequence = [quick_dataset(HumanPerformerName='Doe^Jane')]
+    ds.ReferencedSOPSequence = [quick_dataset(PatientName='Doe^Jane')]
+    profile = profile_rules([ds], rule_sets=(a_rule_set(),
+                                             RuleSet([Rule(SingleTag('00404035'), Remove())], name='Sequences')))
+
+    assert profile.hits['00404035'] == 1
+    assert '00404035' not in profile.dead_rules
+    assert profile.hits['00100010'] == 2  # also in the item of the sequence without a rule
+    assert '00404035' in [rule.identifier.key() for rule in profile.tuned_rule_set(prune=True).declared_rules]
+    assert 0x00404037 not in profile.unmatched  # HumanPerformerName in the removed sequence
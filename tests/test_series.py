@@ -0,0 +1,92 @@
+"""
+Test series module
+"""
+from copy import deepcopy
+
+import pytest
+from dicomgenerator.factory import CTDatasetFactory
+from pydicom.dataset import FileMetaDataset
+
+from src.dicomdeidentifier.core_registry import get_compiled_rules
+from src.dicomdeidentifier.deidentify_dicom import DeidentifyDataset, get_active_rule_sets
+from src.dicomdeidentifier.pipeline import DerivedLookupFactory
+from src.dicomdeidentifier.series import SeriesDeidentifier, deidentify_series
+
+KEY = b'secret'
+
+
+@pytest.fixture
+def a_series():
+    """Five instances of a CT series which differ in the instance elements and a date."""
+    template = CTDatasetFactory(PatientID='patient', StudyInstanceUID='1.2.3', SeriesInstanceUID='1.2.3.4',
+                                StudyDate='20200101')
+    template.file_meta = FileMetaDataset()
+    template.preamble = b'\0' * 128
+    template.add_new(0x00091010, 'LO', 'private')
+    instances = []
+    for number in range(5):
+        ds = deepcopy(template)
+        ds.SOPInstanceUID = f'1.2.3.4.{number}'
+        ds.InstanceNumber = number
+        ds.ImagePositionPatient = [0, 0, number]
+        ds.AcquisitionDate = f'2020010{number + 1}'
+        instances.append(ds)
+    return instances
+
+
+def test_series_deidentifier_matches_full_path(a_series):
+    """Test instances de-identified with the template equal the full de-identification."""
+    factory = DerivedLookupFactory(time_shift=3, key=KEY)
+    deidentifier = SeriesDeidentifier(factory, uid_key=KEY)
+    results = [deidentifier.deidentify(ds) for ds in a_series]
+    assert (deidentifier.planned, deidentifier.full) == (4, 1)
+
+    compiled = get_compiled_rules(*get_active_rule_sets(3))
+    for ds, (deid_ds, lookup) in zip(a_series, results):
+        expected, expected_lookup = DeidentifyDataset(factory(ds), uid_key=KEY).get_deid_dataset(ds)
+        assert set(deid_ds.keys()) == set(expected.keys())
+        for tag in expected.keys():
+            operator = compiled.get_operator(tag)
+            if type(operator).__name__ in ('Empty', 'Keep', 'Remove') or operator is None:
+                assert deid_ds[tag] == expected[tag]
+        assert lookup == expected_lookup
+        assert deid_ds.file_meta.MediaStorageSOPInstanceUID == lookup.deid_sop_uid
+
+    assert [deid_ds.AcquisitionDate for deid_ds, _ in results] == [f'2020010{n + 4}' for n in range(5)]
+    assert len({deid_ds.SOPInstanceUID for deid_ds, _ in results}) == 5
+    assert a_series[1].SOPInstanceUID == '1.2.3.4.1'
+
+
+def test_series_deidentifier_falls_back(a_series):
+    """Test instances differing in a sequence, a private element or the look-up are de-identified fully."""
+    a_series[1].RequestAttributesSequence[0].RequestedProcedureID = 'other'
+    a_series[2][0x00091010].value = 'other'
+    a_series[3].PatientID = 'other patient'
+
+    deidentifier = SeriesDeidentifier(DerivedLookupFactory(time_shift=3, key=KEY), uid_key=KEY)
+    results = [deidentifier.deidentify(ds) for ds in a_series]
+    assert (deidentifier.planned, deidentifier.full) == (1, 4)
+    assert len({lookup.private_tags_removed for _, lookup in results}) == 1
+    assert results[3][0].PatientID != results[0][0].PatientID
+
+
+def test_deidentify_series_without_factory(a_series):
+    """Test random ids are the same for the instances of the series."""
+    results = list(deidentify_series(a_series))
+    assert len({deid_ds.SeriesInstanceUID for deid_ds, _ in results}) == 1
+    assert len({deid_ds.PatientID for deid_ds, _ in results}) == 1
+    assert all(deid_ds.StudyDate is None for deid_ds, _ in results)
+
+
+def test_series_deidentifier_keeps_max_plans(a_series):
+    """Test only the templates of the most recently used series are kept."""
+    deidentifier = SeriesDeidentifier(DerivedLookupFactory(time_shift=3, key=KEY), uid_key=KEY, max_plans=2)
+    for number, ds in enumerate(a_series):
+        ds.SeriesInstanceUID = f'1.2.3.{number % 3}'
+        deidentifier.deidentify(ds)
+    assert list(deidentifier.plans) == ['1.2.3.0', '1.2.3.1']
+    assert (deidentifier.full, deidentifier.planned) == (5, 0)
+
+    deidentifier.deidentify(a_series[0])
+    assert deidentifier.planned == 1
+    assert list(deidentifier.plans) == ['1.2.3.1', '1.2.3.0']
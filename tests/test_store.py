@@ -0,0 +1,99 @@
+"""
+Test look-up store module
+"""
+import pytest
+from pydicom import Dataset
+
+from src.dicomdeidentifier.deidentify_dicom import DeidentifyDataset, LookupID
+from src.dicomdeidentifier.store import SERIES, STUDY, LookupStore, SQLiteLookupStore
+from src.dicomdeidentifier.uids import keyed_uid
+from tests.factories import quick_dataset
+
+
+class CountingStore(SQLiteLookupStore):
+    """SQLite store which counts the queries and transactions."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.queries = 0
+        self.transactions = 0
+
+    def load_study(self, study, patient):
+        self.queries += 1
+        return super().load_study(study, patient)
+
+    def load(self, kind, original):
+        self.queries += 1
+        return super().load(kind, original)
+
+    def save(self, rows):
+        self.transactions += 1
+        super().save(rows)
+
+
+def an_instance(study_uid='1.2.3', series_uid='1.2.3.4', number=1, patient_id='12345'):
+    ds = quick_dataset(PatientID=patient_id, StudyInstanceUID=study_uid, SeriesInstanceUID=series_uid,
+                       SOPInstanceUID=f'{series_uid}.{number}', StudyDate='20200101')
+    ds.file_meta = Dataset()
+    ds.preamble = b'\0' * 128
+    return ds
+
+
+def test_same_ids_across_stores(tmp_path):
+    """Test the ids and the time shift are persisted."""
+    path = str(tmp_path / 'lookup.db')
+    with SQLiteLookupStore(path) as store:
+        first, lookup = DeidentifyDataset(LookupID(time_shift=5), store=store).get_deid_dataset(an_instance())
+
+    with SQLiteLookupStore(path) as store:
+        second, other = DeidentifyDataset(LookupID(), store=store).get_deid_dataset(an_instance(number=2))
+
+    assert second.PatientID == first.PatientID != '12345'
+    assert second.StudyInstanceUID == first.StudyInstanceUID
+    assert second.SeriesInstanceUID == first.SeriesInstanceUID
+    assert second.SOPInstanceUID != first.SOPInstanceUID
+    assert other.time_shift == 5
+    assert second.StudyDate == '20200106'
+
+
+def test_study_is_loaded_once_and_written_in_batches(tmp_path):
+    path = str(tmp_path / 'lookup.db')
+    with SQLiteLookupStore(path) as store:
+        for series in range(3):
+            DeidentifyDataset(LookupID(time_shift=1), store=store).get_deid_dataset(
+                an_instance(series_uid=f'1.2.3.{series}'))
+
+    store = CountingStore(path, batch_size=10)
+    for number in range(20):
+        DeidentifyDataset(LookupID(), store=store).get_deid_dataset(
+            an_instance(series_uid=f'1.2.3.{number % 3}', number=number))
+    assert store.queries == 1
+    assert store.transactions == 0
+
+    for number in range(20):
+        DeidentifyDataset(LookupID(), store=store).get_deid_dataset(
+            an_instance(study_uid=f'2.{number}', series_uid=f'2.{number}.1'))
+    store.close()
+    assert store.transactions == 4  # 40 new study and series entries, batches of 10
+
+
+def test_stored_ids_win_and_keyed_ids():
+    store = SQLiteLookupStore(':memory:')
+    store.put(STUDY, '1.2.3', '2.25.1')
+    lookup = store.fill(LookupID(deid_study_uid='2.25.2'), an_instance(), uid_key=b'key')
+    assert lookup.deid_study_uid == '2.25.1'
+    assert lookup.deid_series_uid == keyed_uid('1.2.3.4', b'key') == store.get(SERIES, '1.2.3.4')
+
+
+def test_lru_cache_is_bounded():
+    store = SQLiteLookupStore(':memory:', cache_size=2, batch_size=1)
+    for number in range(5):
+        store.put(SERIES, str(number), f'2.25.{number}')
+    assert len(store.cache) == 2
+    assert store.get(SERIES, '0') == '2.25.0'
+
+
+def test_lookup_store_needs_backend():
+    """Test the base store cannot be used without load_study, load and save."""
+    with pytest.raises(TypeError):
+        LookupStore()
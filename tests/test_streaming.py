@@ -0,0 +1,57 @@
+"""
+Test streaming de-identification module
+"""
+import io
+
+import pytest
+from pydicom import dcmread
+from pydicom.encaps import encapsulate
+from pydicom.uid import ExplicitVRLittleEndian, ImplicitVRLittleEndian, ExplicitVRBigEndian, RLELossless
+
+from src.dicomdeidentifier.deidentify_dicom import LookupID
+from src.dicomdeidentifier.streaming import copy_range, deidentify_file_streaming, pixel_data_span
+from tests.factories import write_ct_file
+
+
+@pytest.mark.parametrize("transfer_syntax", [ExplicitVRLittleEndian, ImplicitVRLittleEndian, ExplicitVRBigEndian])
+def test_deidentify_file_streaming(tmp_path, transfer_syntax):
+    """Test header is de-identified and pixel data copied."""
+    original = write_ct_file(tmp_path / 'source.dcm', transfer_syntax)
+    lookup = deidentify_file_streaming(str(tmp_path / 'source.dcm'), str(tmp_path / 'destination.dcm'),
+                                       lambda ds: LookupID(time_shift=1), chunk_size=100)
+
+    ds = dcmread(str(tmp_path / 'destination.dcm'))
+    assert ds.PixelData == original.PixelData
+    assert ds.SOPInstanceUID == lookup.deid_sop_uid
+    assert ds.StudyDate == '20200102'
+    assert ds.PatientIdentityRemoved == 'YES'
+    assert ds.file_meta.TransferSyntaxUID == transfer_syntax
+    assert 0xFFFCFFFC not in ds
+    assert lookup.filename == str(tmp_path / 'destination.dcm')
+
+
+def test_deidentify_file_streaming_encapsulated(tmp_path):
+    """Test encapsulated pixel data is copied."""
+    frames = [b'\1' * 10, b'\2' * 20]
+    write_ct_file(tmp_path / 'source.dcm', RLELossless, encapsulate(frames))
+    deidentify_file_streaming(str(tmp_path / 'source.dcm'), str(tmp_path / 'destination.dcm'))
+
+    ds = dcmread(str(tmp_path / 'destination.dcm'))
+    assert ds.PixelData == encapsulate(frames)
+    assert 0xFFFCFFFC not in ds
+
+
+def test_pixel_data_span_without_pixel_data():
+    """Test empty span at the end of a file."""
+    assert pixel_data_span(io.BytesIO(b'\0' * 4), 4, False, True) == (4, 4)
+
+
+def test_copy_range_without_file_descriptors():
+    """Test copy in chunks for file like objects."""
+    destination = io.BytesIO(b'head')
+    destination.seek(0, io.SEEK_END)
+    copy_range(io.BytesIO(b'0123456789'), destination, 2, 5, chunk_size=2)
+    assert destination.getvalue() == b'head23456'
+
+    with pytest.raises(EOFError):
+        copy_range(io.BytesIO(b'0123'), destination, 2, 5)
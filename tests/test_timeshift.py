@@ -0,0 +1,107 @@
+"""
+Test time shift module
+"""
+import pytest
+from pydicom import Dataset
+
+from src.dicomdeidentifier.batch import deidentify_batch
+from src.dicomdeidentifier.deidentify_dicom import DeidentifyDataset, LookupID
+from src.dicomdeidentifier.store import TIME_SHIFT, SQLiteLookupStore
+from src.dicomdeidentifier.timeshift import KeyedTimeShift, TableTimeShift, TimeShiftProvider
+from src.dicomdeidentifier.uids import keyed_id
+from tests.factories import quick_dataset
+
+KEY = b'secret'
+
+
+class CountingTimeShift(KeyedTimeShift):
+    """Keyed time shift which counts the derived shifts."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.calls = 0
+
+    def shift(self, patient_id):
+        self.calls += 1
+        return super().shift(patient_id)
+
+
+def an_instance(patient_id='12345', study_date='20200101'):
+    ds = quick_dataset(PatientID=patient_id, StudyInstanceUID='1.2.3', SeriesInstanceUID='1.2.3.4',
+                       SOPInstanceUID='1.2.3.4.5', StudyDate=study_date)
+    ds.file_meta = Dataset()
+    ds.preamble = b'\0' * 128
+    return ds
+
+
+def test_keyed_time_shift_is_deterministic_and_never_zero():
+    """Test the same patient and key give the same shift in the range, without 0."""
+    shifts = [KeyedTimeShift(KEY, -2, 2).get(f'patient {number}') for number in range(200)]
+    assert set(shifts) == {-2, -1, 1, 2}
+    assert KeyedTimeShift(KEY).get('12345') == KeyedTimeShift(KEY).get('12345')
+    assert KeyedTimeShift(KEY).get('12345') != KeyedTimeShift(b'other').get('12345')
+    assert KeyedTimeShift(KEY).get('') is None
+
+    with pytest.raises(ValueError):
+        KeyedTimeShift(KEY, 0, 0)
+
+
+def test_keyed_time_shift_cannot_be_computed_from_keyed_id():
+    """Test the shift is not the shift of the digest which is written out as de-identified PatientID."""
+    provider = KeyedTimeShift(KEY)
+    patients = [f'patient {number}' for number in range(50)] + ['MRN001', '12345', 'Doe']
+    from_keyed_id = []
+    for patient_id in patients:
+        value = provider.minimum + int.from_bytes(bytes.fromhex(keyed_id(patient_id, KEY))[:8], 'big') % provider.size
+        from_keyed_id.append(value + (provider.has_zero and value >= 0))
+    shifts = [provider.get(patient_id) for patient_id in patients]
+    assert sum(shift == guess for shift, guess in zip(shifts, from_keyed_id)) < 5
+
+
+def test_time_shift_provider_caches_per_patient():
+    """Test the shift of a patient is derived once and the least recently used patient is evicted."""
+    provider = CountingTimeShift(KEY, cache_size=2)
+    for patient_id in ['a', 'a', 'b', 'a', 'c', 'a']:
+        provider.get(patient_id)
+    assert provider.calls == 3
+    assert list(provider.cache) == ['c', 'a']
+
+    provider.get('b')
+    assert provider.calls == 4
+
+
+def test_table_time_shift(tmp_path):
+    """Test shifts from a CSV table, with the default provider for other patients."""
+    path = tmp_path / 'shifts.csv'
+    path.write_text('patient_id,time_shift\n12345,-30\n')
+    default = KeyedTimeShift(KEY)
+
+    provider = TableTimeShift.from_csv(str(path), default)
+    assert provider.get('12345') == -30
+    assert provider.get('other') == default.get('other')
+    assert TableTimeShift({'12345': -30}).get('other') is None
+
+
+def test_deidentify_dataset_resolves_time_shift():
+    """Test all instances of a patient get the same shift, a given or stored shift wins."""
+    provider = KeyedTimeShift(KEY, 1, 10)
+    results = list(deidentify_batch([an_instance(), an_instance(study_date='20200201')],
+                                    time_shift_provider=provider))
+    shift = provider.get('12345')
+    assert [lookup.time_shift for _, lookup in results] == [shift, shift]
+    assert results[0][0].StudyDate == f'202001{1 + shift:02d}'
+
+    _, lookup = DeidentifyDataset(LookupID(time_shift=3), time_shift_provider=provider).get_deid_dataset(an_instance())
+    assert lookup.time_shift == 3
+
+    with SQLiteLookupStore(':memory:') as store:
+        store.put(TIME_SHIFT, '12345', '7')
+        _, lookup = DeidentifyDataset(LookupID(), store=store,
+                                      time_shift_provider=provider).get_deid_dataset(an_instance())
+        assert lookup.time_shift == 7
+
+
+def test_time_shift_provider_needs_shift():
+    """Test the base provider cannot be used without shift."""
+    with pytest.raises(TypeError):
+        TimeShiftProvider()
@@ -0,0 +1,94 @@
+"""
+Test one walk de-identification module
+"""
+from pydicom import Dataset
+from pydicom.sequence import Sequence
+
+from src.dicomdeidentifier.core_registry import get_compiled_rules
+from src.dicomdeidentifier.deidentify_dicom import DeidentifyDataset, LookupID
+from src.dicomdeidentifier.rule_sets import timeshift_custom_ruleset
+from src.dicomdeidentifier.traversal import Traversal
+from src.dicomdeidentifier.uids import keyed_uid
+from tests.factories import quick_dataset
+
+CT_IMAGE_STORAGE = '1.2.840.10008.5.1.4.1.1.2'
+
+
+def a_referencing_dataset() -> Dataset:
+    """Data set with references to itself and to another study in nested sequences."""
+    ds = quick_dataset(PatientID='12345', StudyInstanceUID='1.2.3', SeriesInstanceUID='1.2.3.4',
+                       SOPInstanceUID='1.2.3.4.5', SOPClassUID=CT_IMAGE_STORAGE, StudyDate='20200101')
+    ds.file_meta = Dataset()
+    ds.preamble = b'\0' * 128
+    inner = quick_dataset(StudyInstanceUID='1.2.3', ReferencedSOPClassUID=CT_IMAGE_STORAGE,
+                          ContentDate='20200105')
+    inner.private_block(0x0009, 'VENDOR', create=True).add_new(0x01, 'LO', 'Doe^John')
+    other = quick_dataset(StudyInstanceUID='9.8.7')
+    ds.StudiesContainingOtherReferencedInstancesSequence = Sequence([
+        quick_dataset(ReferencedSOPSequence=Sequence([inner, other]))])
+    return ds
+
+
+def test_walk_applies_rules_dates_uids_and_private_tags_in_sequences():
+    ds = a_referencing_dataset()
+    traversal = Traversal(get_compiled_rules(timeshift_custom_ruleset), time_shift=2,
+                          uid_map={'1.2.3': '2.25.1'}, uid_key=b'key')
+    traversal.walk(ds)
+
+    inner, other = ds.StudiesContainingOtherReferencedInstancesSequence[0].ReferencedSOPSequence
+    assert ds.StudyInstanceUID == inner.StudyInstanceUID == '2.25.1'
+    assert other.StudyInstanceUID == keyed_uid('9.8.7', b'key')
+    assert inner.ReferencedSOPClassUID == CT_IMAGE_STORAGE
+    assert inner.ContentDate == '20200107'
+    assert ds.StudyDate == '20200103'
+    assert (0x0009, 0x0010) not in inner
+    assert traversal.private_removed == 2
+    assert traversal.elements == 14
+
+
+def test_get_deid_dataset_remaps_references_to_own_uids():
+    """Test references to the data set itself get the de-identified UIDs, also without uid key."""
+    deid_ds, lookup = DeidentifyDataset(LookupID(time_shift=1)).get_deid_dataset(a_referencing_dataset())
+    inner, other = deid_ds.StudiesContainingOtherReferencedInstancesSequence[0].ReferencedSOPSequence
+    assert inner.StudyInstanceUID == deid_ds.StudyInstanceUID != '1.2.3'
+    assert other.StudyInstanceUID not in ('9.8.7', deid_ds.StudyInstanceUID)
+    assert deid_ds.SOPInstanceUID == lookup.deid_sop_uid
+    assert deid_ds.SOPClassUID == CT_IMAGE_STORAGE
+
+
+def test_get_deid_dataset_with_copy_keeps_input():
+    ds = a_referencing_dataset()
+    DeidentifyDataset(LookupID(time_shift=1)).get_deid_dataset(ds)
+    assert ds.StudyInstanceUID == '1.2.3'
+    assert ds.PatientID == '12345'
+
+
+def test_walk_applies_rules_of_sequences():
+    """Test sequences with identifying items are removed, emptied or replaced with their items."""
+    ds = quick_dataset(PatientID='12345')
+    ds.ActualHumanPerformersSequence = Sequence([quick_dataset(HumanPerformerName='Doe^Jane',
+                                                               PatientName='Doe^John')])
+    ds.RequestAttributesSequence = Sequence([quick_dataset(RequestedProcedureID='1234')])
+    ds.ContentSequence = Sequence([quick_dataset(PatientName='Doe^John')])
+    ds.DeidentificationMethodCodeSequence = Sequence([quick_dataset(CodeValue='113100')])
+    traversal = Traversal(get_compiled_rules(timeshift_custom_ruleset))
+    traversal.walk(ds)
+
+    assert 'ActualHumanPerformersSequence' not in ds
+    assert len(ds.RequestAttributesSequence) == 0
+    assert 'PatientName' not in [element.keyword for element in ds.iterall()]
+    assert ds.DeidentificationMethodCodeSequence[0].CodeValue == '113100'
+    assert traversal.removed[0x00404035] == 1
+
+
+def test_walk_keeps_uids_which_are_no_instance_uids():
+    """Test private SOP classes and coding schemes are kept, instance UIDs and own UIDs are remapped."""
+    ds = quick_dataset(SOPClassUID='1.3.12.2.1107.5.9.1', MultiFrameSourceSOPInstanceUID='1.2.9',
+                       SeriesInstanceUID='1.2.3')
+    ds.DerivationCodeSequence = Sequence([quick_dataset(CodingSchemeUID='1.2.840.10008.2.16.4')])
+    Traversal(get_compiled_rules(timeshift_custom_ruleset), uid_map={'1.2.3': '2.25.1'}, uid_key=b'key').walk(ds)
+
+    assert ds.SOPClassUID == '1.3.12.2.1107.5.9.1'
+    assert ds.DerivationCodeSequence[0].CodingSchemeUID == '1.2.840.10008.2.16.4'
+    assert ds.MultiFrameSourceSOPInstanceUID == keyed_uid('1.2.9', b'key')
+    assert ds.SeriesInstanceUID == '2.25.1'
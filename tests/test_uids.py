@@ -0,0 +1,23 @@
+"""
+Test keyed uids module
+"""
+from pydicom.uid import UID
+
+from src.dicomdeidentifier.uids import keyed_id, keyed_uid
+
+
+def test_keyed_uid_is_deterministic_and_valid():
+    """Test same uid and key give same valid uid."""
+    uid = keyed_uid('1.2.840.113619.2.55.3', b'secret')
+    assert uid == keyed_uid('1.2.840.113619.2.55.3', b'secret')
+    assert uid != keyed_uid('1.2.840.113619.2.55.3', b'other secret')
+    assert uid != keyed_uid('1.2.840.113619.2.55.4', b'secret')
+    assert uid.startswith('2.25.')
+    assert UID(uid).is_valid
+
+
+def test_keyed_id():
+    """Test keyed id is deterministic and fits a LO element."""
+    patient_id = keyed_id('12345', b'secret')
+    assert patient_id == keyed_id('12345', b'secret')
+    assert len(patient_id) == 32